@@ -3,10 +3,11 @@ import re
 import io
 import json
 import time
-import tempfile
+import threading
 from pathlib import Path
+from concurrent.futures import TimeoutError as FuturesTimeout
 from datetime import datetime
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify, send_file
+from flask import Flask, Response, g, render_template, request, redirect, url_for, session, jsonify, send_file
 from dotenv import load_dotenv
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
@@ -14,32 +15,22 @@ from werkzeug.utils import secure_filename
 # ✅ Cargar variables de entorno ANTES de leerlas
 load_dotenv()
 
-from backend.qa_engine import answer_question, list_sections, ensure_index
-
-# --- Optional STT (Whisper) ---
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "").strip()
-openai_client = None
-if OPENAI_API_KEY:
-    try:
-        from openai import OpenAI
-        openai_client = OpenAI(api_key=OPENAI_API_KEY)
-    except Exception:
-        openai_client = None
-
-# --- PDF export ---
-from reportlab.lib.pagesizes import LETTER
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import inch
-from reportlab.lib.utils import simpleSplit
+from backend.qa_engine import (SECTIONS_LIST_MAX, answer_question, answer_questions, answer_stream,
+                               index_status, preload_indexes, section_index)
+from backend.refresh import start_refresher
+from backend.history_store import get_history_store
+from backend.user_store import get_user_store
+from backend.pdf_export import get_exporter
+from backend.metrics import METRICS, PROFILER_HOOK
+from backend.stt import SttRejected, get_stt
 
 app = Flask(__name__, static_folder="static", template_folder="templates")
 app.secret_key = os.getenv("FLASK_SECRET_KEY", "dev-secret")
 
-DATA_DIR = Path("data"); DATA_DIR.mkdir(exist_ok=True)
-UPLOAD_FOLDER = Path("uploads"); UPLOAD_FOLDER.mkdir(exist_ok=True)
-CONVO_FOLDER = Path("conversations"); CONVO_FOLDER.mkdir(exist_ok=True)
-HISTORY_DIR = Path("logs/conversations"); HISTORY_DIR.mkdir(parents=True, exist_ok=True)
-USERS_FILE = DATA_DIR / "users.json"
+DATA_DIR = Path("data")
+UPLOAD_FOLDER = Path("uploads")
+CONVO_FOLDER = Path("conversations")
+HISTORY_DIR = Path("logs/conversations")
 
 SLUG_TO_VERSION = {
     "RelativityOne": "RelativityOne",
@@ -60,52 +51,87 @@ DOC_SOURCE = {
 DEFAULT_ADMIN_EMAIL = os.getenv("DEFAULT_ADMIN_EMAIL", "demo@example.com")
 DEFAULT_ADMIN_PASSWORD = os.getenv("DEFAULT_ADMIN_PASSWORD", "demo123")
 
-def _load_users():
-    if not USERS_FILE.exists():
-        USERS_FILE.write_text(json.dumps({}, indent=2), encoding="utf-8")
-    try:
-        return json.loads(USERS_FILE.read_text(encoding="utf-8"))
-    except Exception:
-        return {}
-
-def _save_users(users: dict):
-    USERS_FILE.write_text(json.dumps(users, ensure_ascii=False, indent=2), encoding="utf-8")
-
 def _ensure_default_admin():
-    users = _load_users()
+    users = get_user_store()
     if DEFAULT_ADMIN_EMAIL not in users:
-        users[DEFAULT_ADMIN_EMAIL] = {
+        users.create(DEFAULT_ADMIN_EMAIL, {
             "display_name": DEFAULT_ADMIN_EMAIL.split("@")[0],
             "password_hash": generate_password_hash(DEFAULT_ADMIN_PASSWORD)
-        }
-        _save_users(users)
-
-_ensure_default_admin()
-
-# -------- Warmup --------
-_warmed_up = False
-def _do_warmup():
-    global _warmed_up
-    if _warmed_up: return
-    try:
-        ensure_index("Server2023", force=True)      # reindex con tus links
-        ensure_index("RelativityOne", force=False)
-        ensure_index("Server2024", force=False)
-    except Exception as e:
-        print("Warmup failed:", e)
-    finally:
-        _warmed_up = True
+        })
+
+# -------- Índices: se sirve lo que hay en disco; el refresco va en segundo plano --------
+INDEX_REFRESH_ENABLED = os.getenv("INDEX_REFRESH_ENABLED", "true").lower() == "true"
+INDEX_REFRESH_SECONDS = float(os.getenv("INDEX_REFRESH_SECONDS", str(24 * 3600)))
+# precargar todos los índices al crear la app (en gunicorn con preload: una vez, en el maestro)
+APP_PRELOAD = os.getenv("APP_PRELOAD", "false").lower() == "true"
+
+refresher = None
+_configured = False
+_background = False
+_setup_lock = threading.Lock()
+
+def start_background_tasks():
+    """
+    Hilos de la app (hoy: refresco de índices). Un fork no hereda hilos, así que con gunicorn
+    se llama en cada worker (post_fork) y nunca en el maestro; solo un worker toma el lock de refresco.
+    """
+    global refresher, _background
+    if _background:
+        return
+    _background = True
+    if INDEX_REFRESH_ENABLED:
+        refresher = start_refresher(list(SLUG_TO_VERSION.values()), interval=INDEX_REFRESH_SECONDS)
+
+def create_app(preload=None, start_background=True):
+    """
+    Deja la app lista para servir: carpetas, admin por defecto y, si preload, todos los índices en memoria.
+    Idempotente. Con gunicorn (gunicorn.conf.py) corre en el maestro antes del fork con
+    preload=True, start_background=False: los workers comparten los índices copy-on-write.
+    """
+    global _configured
+    with _setup_lock:
+        if not _configured:
+            for d in (DATA_DIR, UPLOAD_FOLDER, CONVO_FOLDER, HISTORY_DIR):
+                d.mkdir(parents=True, exist_ok=True)
+            _ensure_default_admin()
+            if APP_PRELOAD if preload is None else preload:
+                info = preload_indexes(list(SLUG_TO_VERSION.values()))
+                print(f"[app] preloaded {info['versions']} unified={info['unified']} in {info['seconds']}s")
+            _configured = True
+    if start_background:
+        start_background_tasks()
+    return app
+
+# -------- métricas por request (/metrics) y perfilado opcional --------
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "").strip()
 
 @app.before_request
-def _warmup_once_middleware():
-    if not _warmed_up:
-        _do_warmup()
+def _ensure_configured():
+    # `gunicorn app:app` / `flask run` no pasan por create_app: se configura en el primer request
+    if not _configured:
+        create_app()
 
-with app.app_context():
-    try:
-        _do_warmup()
-    except Exception as e:
-        print("Startup warmup failed:", e)
+@app.before_request
+def _start_timer():
+    g.t0 = time.perf_counter()
+    g.profile = PROFILER_HOOK.start(forced=request.headers.get("X-Profile") == "1")
+
+@app.after_request
+def _record_request(resp):
+    endpoint = request.endpoint or "unknown"
+    if hasattr(g, "t0"):
+        METRICS.observe("http_request_seconds", time.perf_counter() - g.t0, endpoint=endpoint)
+    METRICS.inc("http_requests_total", endpoint=endpoint, status=str(resp.status_code))
+    path = PROFILER_HOOK.stop(g.pop("profile", None), endpoint)
+    if path is not None:
+        print(f"[metrics] slow request profile: {path}")
+    return resp
+
+@app.get("/metrics")
+def metrics():
+    if METRICS_TOKEN and request.headers.get("Authorization", "") != f"Bearer {METRICS_TOKEN}":
+        return "unauthorized", 401
+    return Response(METRICS.render(), mimetype="text/plain; version=0.0.4")
 
 # ----------------- helpers -----------------
 def is_logged_in():
@@ -117,20 +143,41 @@ def _now_iso():
 def _safe(s: str) -> str:
     return re.sub(r"[^a-zA-Z0-9_.-]+", "_", s)
 
-def _history_path(email: str, version_key: str) -> Path:
-    return HISTORY_DIR / f"{_safe(email)}_{_safe(version_key)}.jsonl"
-
 def _history_append(email: str, version_key: str, role: str, content: str, citations=None, confidence=None):
+    # va al buffer del historial; se escribe en SQLite en lote desde otro hilo
     try:
-        p = _history_path(email, version_key)
-        rec = {"ts": _now_iso(), "version": version_key, "role": role, "content": content}
-        if citations is not None: rec["citations"] = citations
-        if confidence is not None: rec["confidence"] = confidence
-        with open(p, "a", encoding="utf-8") as f:
-            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        with METRICS.time("history"):
+            get_history_store().append(email, version_key, _now_iso(), role, content,
+                                       citations=citations, confidence=confidence)
     except Exception:
         pass
 
+def _version_param(raw):
+    """
+    "version" de /api/ask: una versión, "*" (todas) o una lista de versiones.
+    Devuelve (versión para el motor, clave del historial); (None, None) si no es válida.
+    """
+    if raw is None or raw == "":
+        return "RelativityOne", "RelativityOne"
+    if isinstance(raw, str):
+        raw = raw.strip()
+        return raw, ("all" if raw == "*" else raw)
+    if isinstance(raw, list) and raw and all(isinstance(v, str) and v.strip() for v in raw):
+        versions = sorted({v.strip() for v in raw})
+        return versions, ("all" if "*" in versions else "+".join(versions))
+    return None, None
+
+def _boosts_param(raw):
+    """Parámetro "boost" opcional: {versión: factor}. None si no es válido."""
+    if raw is None:
+        return {}
+    if not isinstance(raw, dict):
+        return None
+    try:
+        return {str(k): float(v) for k, v in raw.items()}
+    except (TypeError, ValueError):
+        return None
+
 # ----------------- routes: auth -----------------
 @app.get("/login")
 def login():
@@ -142,8 +189,7 @@ def login():
 def do_login():
     email = (request.form.get("email") or "").strip().lower()
     password = (request.form.get("password") or "").strip()
-    users = _load_users()
-    u = users.get(email)
+    u = get_user_store().get(email)
     if not u or not check_password_hash(u.get("password_hash",""), password):
         return render_template("login.html", error="Invalid email or password.")
     session["user"] = {"email": email, "display_name": u.get("display_name") or email.split("@")[0]}
@@ -171,12 +217,12 @@ def do_register():
     if password != confirm:
         return render_template("register.html", error="Passwords do not match.", email=email, display_name=display)
 
-    users = _load_users()
+    users = get_user_store()
     if email in users:
         return render_template("register.html", error="This email is already registered.", email=email, display_name=display)
-
-    users[email] = {"display_name": display, "password_hash": generate_password_hash(password)}
-    _save_users(users)
+    # create() vuelve a comprobar dentro del lock: dos registros simultáneos del mismo email no se pisan
+    if not users.create(email, {"display_name": display, "password_hash": generate_password_hash(password)}):
+        return render_template("register.html", error="This email is already registered.", email=email, display_name=display)
 
     session["user"] = {"email": email, "display_name": display}
     return redirect(url_for("version_page", slug="RelativityOne"))
@@ -215,12 +261,15 @@ def api_ask():
         return jsonify({"error":"unauthorized"}), 401
     data = request.get_json(force=True)
     msg = data.get("message","").strip()
-    version_key = data.get("version","RelativityOne").strip()
+    version, version_key = _version_param(data.get("version"))
+    boosts = _boosts_param(data.get("boost"))
     if not msg:
         return jsonify({"error":"empty message"}), 400
+    if version is None or boosts is None:
+        return jsonify({"error":"invalid version"}), 400
 
     _history_append(session["user"]["email"], version_key, "user", msg)
-    result = answer_question(msg, version=version_key, top_k=5)
+    result = answer_question(msg, version=version, top_k=5, boosts=boosts)
     _history_append(session["user"]["email"], version_key, "assistant", result["answer"],
                     citations=result.get("citations"), confidence=result.get("confidence"))
 
@@ -228,31 +277,156 @@ def api_ask():
         "answer": result["answer"],
         "citations": result["citations"],
         "confidence": result["confidence"],
-        "should_collect_contact": result.get("should_collect_contact", False)
+        "should_collect_contact": result.get("should_collect_contact", False),
+        "warming_up": result.get("warming_up", False)
     })
 
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/api/ask/stream")
+def api_ask_stream():
+    """
+    Igual que /api/ask pero como Server-Sent Events: "meta" (citas, confianza) al terminar
+    la búsqueda, un "chunk" por fragmento de texto y "done" con la respuesta completa.
+    El historial se escribe cuando la respuesta ya se envió.
+    """
+    if not is_logged_in():
+        return jsonify({"error":"unauthorized"}), 401
+    data = request.get_json(force=True)
+    msg = data.get("message","").strip()
+    version, version_key = _version_param(data.get("version"))
+    boosts = _boosts_param(data.get("boost"))
+    if not msg:
+        return jsonify({"error":"empty message"}), 400
+    if version is None or boosts is None:
+        return jsonify({"error":"invalid version"}), 400
+    email = session["user"]["email"]
+    final = {}
+
+    def events():
+        for event, payload in answer_stream(msg, version=version, top_k=5, boosts=boosts):
+            if event == "done":
+                final.update(payload)
+                payload = {
+                    "answer": payload["answer"],
+                    "citations": payload["citations"],
+                    "confidence": payload["confidence"],
+                    "should_collect_contact": payload.get("should_collect_contact", False),
+                    "warming_up": payload.get("warming_up", False)
+                }
+            yield _sse(event, payload)
+
+    def persist():
+        _history_append(email, version_key, "user", msg)
+        if final:
+            _history_append(email, version_key, "assistant", final["answer"],
+                            citations=final.get("citations"), confidence=final.get("confidence"))
+
+    resp = Response(events(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    resp.call_on_close(persist)
+    return resp
+
+ASK_BATCH_MAX = int(os.getenv("ASK_BATCH_MAX", "500"))
+
+@app.post("/api/ask_batch")
+def api_ask_batch():
+    if not is_logged_in():
+        return jsonify({"error":"unauthorized"}), 401
+    data = request.get_json(force=True)
+    messages = data.get("messages") or []
+    version, _ = _version_param(data.get("version"))
+    boosts = _boosts_param(data.get("boost"))
+    if version is None or boosts is None:
+        return jsonify({"error":"invalid version"}), 400
+    if not isinstance(messages, list) or not messages:
+        return jsonify({"error":"messages must be a non-empty list"}), 400
+    if len(messages) > ASK_BATCH_MAX:
+        return jsonify({"error":f"at most {ASK_BATCH_MAX} messages per batch"}), 400
+    queries = [str(m or "").strip() for m in messages]
+
+    results = answer_questions(queries, version=version, top_k=5, boosts=boosts)
+    return jsonify({"results": [{
+        "answer": r["answer"],
+        "citations": r["citations"],
+        "confidence": r["confidence"],
+        "should_collect_contact": r.get("should_collect_contact", False),
+        "warming_up": r.get("warming_up", False)
+    } for r in results]})
+
+SUGGEST_LIMIT_MAX = 100
+
+def _section_index(version_key: str):
+    try:
+        return section_index(version_key)
+    except Exception:
+        return None, None
+
+def _not_modified(etag):
+    """304 si el cliente ya tiene esta generación del índice; None si hay que responder."""
+    if etag and request.if_none_match.contains(etag):
+        resp = Response(status=304)
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = "no-cache"
+        return resp
+    return None
+
+def _with_etag(resp, etag):
+    if etag:
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = "no-cache"  # el navegador revalida y recibe 304 mientras no cambie
+    return resp
+
 @app.get("/api/sections")
 def api_sections():
     version_key = request.args.get("version","RelativityOne")
-    try:
-        sections = list_sections(version_key)
-    except Exception:
-        sections = []
-    return jsonify({"sections": sections})
+    hx, etag = _section_index(version_key)
+    cached = _not_modified(etag)
+    if cached is not None:
+        return cached
+    sections = hx.top(SECTIONS_LIST_MAX) if hx is not None else []
+    return _with_etag(jsonify({"sections": sections}), etag)
+
+@app.get("/api/sections/suggest")
+def api_sections_suggest():
+    version_key = request.args.get("version","RelativityOne")
+    q = (request.args.get("q") or "").strip()
+    limit = max(1, min(request.args.get("limit", 10, type=int), SUGGEST_LIMIT_MAX))
+    hx, etag = _section_index(version_key)
+    cached = _not_modified(etag)
+    if cached is not None:
+        return cached
+    suggestions = []
+    if hx is not None:
+        with METRICS.time("suggest"):
+            suggestions = hx.suggest(q, limit)
+    return _with_etag(jsonify({"q": q, "suggestions": suggestions}), etag)
+
+@app.get("/api/ready")
+def api_ready():
+    if refresher is not None:
+        info = refresher.readiness()
+    else:
+        versions = {v: index_status(v) for v in SLUG_TO_VERSION.values()}
+        info = {"ready": all(i["on_disk"] for i in versions.values()), "refresher": False, "versions": versions}
+    return jsonify(info), (200 if info["ready"] else 503)
+
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "100"))
+HISTORY_PAGE_MAX = 1000
 
 @app.get("/api/history")
 def api_history():
     if not is_logged_in():
         return jsonify({"error":"unauthorized"}), 401
     version_key = request.args.get("version","RelativityOne").strip()
-    p = _history_path(session["user"]["email"], version_key)
-    items = []
-    if p.exists():
-        with open(p, "r", encoding="utf-8") as f:
-            for line in f:
-                try: items.append(json.loads(line))
-                except: pass
-    return jsonify({"items": items})
+    try:
+        limit = max(1, min(HISTORY_PAGE_MAX, int(request.args.get("limit", HISTORY_PAGE_SIZE))))
+        before = int(request.args["before"]) if request.args.get("before") else None
+    except ValueError:
+        return jsonify({"error":"invalid limit/before"}), 400
+    items, next_before = get_history_store().recent(session["user"]["email"], version_key, limit=limit, before=before)
+    return jsonify({"items": items, "next_before": next_before})
 
 @app.post("/api/clear_history")
 def api_clear_history():
@@ -260,9 +434,7 @@ def api_clear_history():
         return jsonify({"error":"unauthorized"}), 401
     data = request.get_json(force=True)
     version_key = (data.get("version") or "RelativityOne").strip()
-    p = _history_path(session["user"]["email"], version_key)
-    if p.exists():
-        p.unlink()
+    get_history_store().clear(session["user"]["email"], version_key)
     return jsonify({"ok": True})
 
 @app.post("/api/delete_account")
@@ -270,13 +442,8 @@ def api_delete_account():
     if not is_logged_in():
         return jsonify({"error":"unauthorized"}), 401
     email = session["user"]["email"]
-    users = _load_users()
-    if email in users:
-        del users[email]
-        _save_users(users)
-    for f in HISTORY_DIR.glob(f"{_safe(email)}_*.jsonl"):
-        try: f.unlink()
-        except: pass
+    get_user_store().delete(email)
+    get_history_store().delete_user(email)
     session.pop("user", None)
     return jsonify({"ok": True})
 
@@ -294,64 +461,63 @@ def api_save_conversation():
     return jsonify({"ok": True, "path": str(filename)})
 
 # -------- PDF export --------
-from reportlab.lib.pagesizes import LETTER
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import inch
-from reportlab.lib.utils import simpleSplit
+# el render va a un pool en segundo plano (backend/pdf_export); los archivos quedan en data/exports
+EXPORT_WAIT_SECONDS = float(os.getenv("EXPORT_WAIT_SECONDS", "60"))
+
+def _pdf_download_name(version_key: str) -> str:
+    return f"conversation_{_safe(version_key)}_{datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')}.pdf"
+
+@app.post("/api/export_pdf")
+def api_export_pdf():
+    if not is_logged_in():
+        return jsonify({"error":"unauthorized"}), 401
+    data = request.get_json(force=True)
+    convo = data.get("conversation", [])
+    version_key = data.get("version", "RelativityOne")
+    if not isinstance(convo, list):
+        return jsonify({"error":"conversation must be a list"}), 400
+    job = get_exporter().submit(session["user"]["email"], convo, version_key)
+    info = job.info()
+    info["download_url"] = url_for("api_export_pdf_download", job_id=job.id)
+    return jsonify(info), (200 if info["status"] == "done" else 202)
+
+@app.get("/api/export_pdf/<job_id>")
+def api_export_pdf_status(job_id: str):
+    if not is_logged_in():
+        return jsonify({"error":"unauthorized"}), 401
+    job = get_exporter().get(job_id, session["user"]["email"])
+    if job is None:
+        return jsonify({"error":"unknown job"}), 404
+    return jsonify({**job.info(), "download_url": url_for("api_export_pdf_download", job_id=job.id)})
+
+@app.get("/api/export_pdf/<job_id>/download")
+def api_export_pdf_download(job_id: str):
+    if not is_logged_in():
+        return jsonify({"error":"unauthorized"}), 401
+    job = get_exporter().get(job_id, session["user"]["email"])
+    if job is None or (job.status == "done" and not job.path.exists()):
+        return jsonify({"error":"unknown job"}), 404
+    if job.status != "done":
+        return jsonify(job.info()), (409 if job.status == "running" else 500)
+    return send_file(job.path, mimetype="application/pdf", as_attachment=True,
+                     download_name=_pdf_download_name(job.version_key))
 
 @app.post("/api/save_conversation_pdf")
 def api_save_conversation_pdf():
+    # compatibilidad: mismo job y mismo cache, pero espera el render y devuelve el archivo
     if not is_logged_in():
         return jsonify({"error":"unauthorized"}), 401
     data = request.get_json(force=True)
     convo = data.get("conversation", [])
     version_key = data.get("version", "RelativityOne")
-
-    buf = io.BytesIO()
-    c = canvas.Canvas(buf, pagesize=LETTER)
-    width, height = LETTER
-
-    margin = 0.75 * inch
-    x = margin
-    y = height - margin
-    line_h = 14
-    max_w = width - 2*margin
-
-    def draw_wrapped(text, font="Helvetica", size=11):
-        nonlocal y
-        c.setFont(font, size)
-        for line in simpleSplit(text, font, size, max_w):
-            if y < margin + line_h:
-                c.showPage()
-                y = height - margin
-                c.setFont(font, size)
-            c.drawString(x, y, line)
-            y -= line_h
-
-    c.setTitle(f"Conversation - {version_key}")
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(x, y, f"Chatbot — {version_key}")
-    y -= 20
-    c.setFont("Helvetica", 10)
-    c.drawString(x, y, f"Exported: {datetime.utcnow().isoformat(timespec='seconds')}Z")
-    y -= 18
-    c.line(margin, y, width - margin, y); y -= 10
-
-    for turn in convo:
-        role = "User" if turn.get("role") == "user" else "Bot"
-        content = re.sub(r"<[^>]+>", "", turn.get("content",""))
-        c.setFont("Helvetica-Bold", 11); draw_wrapped(f"{role}:")
-        c.setFont("Helvetica", 11); draw_wrapped(content)
-        cites = turn.get("citations") or []
-        for ci in cites:
-            url = ci.get("url","")
-            if url: draw_wrapped(f"Source: {url}", size=9)
-        y -= 6
-
-    c.showPage(); c.save()
-    buf.seek(0)
-    filename = f"conversation_{_safe(version_key)}_{datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')}.pdf"
-    return send_file(buf, mimetype="application/pdf", as_attachment=True, download_name=filename)
+    exporter = get_exporter()
+    job = exporter.submit(session["user"]["email"], convo, version_key)
+    try:
+        path = exporter.wait(job, timeout=EXPORT_WAIT_SECONDS)
+    except Exception as e:
+        return jsonify({"error": f"PDF export failed: {e}", "job_id": job.id}), 500
+    return send_file(path, mimetype="application/pdf", as_attachment=True,
+                     download_name=_pdf_download_name(version_key))
 
 @app.post("/api/upload_avatar")
 def api_upload_avatar():
@@ -374,29 +540,70 @@ def get_upload(name):
         return "Not found", 404
     return send_file(p, as_attachment=False)
 
-# -------- STT (server) --------
+# -------- STT (server): transcripción en segundo plano (backend/stt.py) --------
+# máximo que espera el endpoint sincrónico (legacy); el cliente usa /api/stt/jobs y consulta el estado
+STT_WAIT_SECONDS = float(os.getenv("STT_WAIT_SECONDS", "30"))
+_STT_EXT = (("ogg", "ogg"), ("wav", "wav"), ("mp4", "m4a"), ("mpeg", "mp3"))
+
+def _stt_error(message, status):
+    resp = jsonify({"ok": False, "error": message})
+    if status == 503:
+        resp.headers["Retry-After"] = "2"
+    return resp, status
+
+def _stt_submit():
+    """(job, None) o (None, respuesta de error)."""
+    stt = get_stt()
+    # antes de leer el cuerpo: una subida enorme se corta sin parsear el multipart
+    if request.content_length and request.content_length > stt.max_bytes + 64 * 1024:
+        return None, _stt_error(f"Audio is larger than {stt.max_bytes // (1024 * 1024)} MB.", 413)
+    if "audio" not in request.files:
+        return None, _stt_error("No audio uploaded.", 400)
+    f = request.files["audio"]
+    mimetype = f.mimetype or "audio/webm"
+    ext = next((e for k, e in _STT_EXT if k in mimetype), "webm")
+    # el job se queda con el archivo de la subida (lo cierra al terminar); al request le queda uno vacío
+    stream, f.stream = f.stream, io.BytesIO()
+    try:
+        return stt.submit(session["user"]["email"], stream, f"audio.{ext}", mimetype), None
+    except SttRejected as e:
+        return None, _stt_error(str(e), e.status)
+
+@app.post("/api/stt/jobs")
+def api_stt_submit():
+    if not is_logged_in():
+        return jsonify({"error":"unauthorized"}), 401
+    job, error = _stt_submit()
+    if error is not None:
+        return error
+    return jsonify({"ok": True, **job.info(), "status_url": url_for("api_stt_status", job_id=job.id)}), 202
+
+@app.get("/api/stt/jobs/<job_id>")
+def api_stt_status(job_id: str):
+    if not is_logged_in():
+        return jsonify({"error":"unauthorized"}), 401
+    job = get_stt().get(job_id, session["user"]["email"])
+    if job is None:
+        return jsonify({"error":"unknown job"}), 404
+    info = job.info()
+    return jsonify({"ok": info["status"] != "failed", **info, "status_url": url_for("api_stt_status", job_id=job.id)})
+
 @app.post("/api/stt")
 def api_stt():
+    # compatibilidad: mismo pool y mismos límites, pero espera el resultado (hasta STT_WAIT_SECONDS)
     if not is_logged_in():
         return jsonify({"error":"unauthorized"}), 401
-    if openai_client is None:
-        return jsonify({"ok": False, "error": "Speech-to-text requires OPENAI_API_KEY configured on the server."}), 400
-    if "audio" not in request.files:
-        return jsonify({"ok": False, "error": "No audio uploaded."}), 400
-    f = request.files["audio"]
-    suffix = ".webm"
-    if f.mimetype and "ogg" in f.mimetype: suffix = ".ogg"
-    elif f.mimetype and "wav" in f.mimetype: suffix = ".wav"
+    job, error = _stt_submit()
+    if error is not None:
+        return error
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            f.save(tmp.name)
-            tmp_path = tmp.name
-        with open(tmp_path, "rb") as af:
-            resp = openai_client.audio.transcriptions.create(model="whisper-1", file=af)
-        text = (getattr(resp, "text", None) or "").strip()
-        return jsonify({"ok": True, "text": text})
+        text = get_stt().wait(job, timeout=STT_WAIT_SECONDS)
+    except FuturesTimeout:
+        return jsonify({"ok": False, "error": "Transcription is taking longer than expected.",
+                        **job.info(), "status_url": url_for("api_stt_status", job_id=job.id)}), 202
     except Exception as e:
         return jsonify({"ok": False, "error": f"STT failed: {e}"}), 400
+    return jsonify({"ok": True, "text": text})
 
 # --- Redirect any 404 to root (evita pantallas Not Found) ---
 @app.errorhandler(404)
@@ -404,4 +611,4 @@ def not_found(_e):
     return redirect(url_for("root"))
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5055, debug=True)
+    create_app().run(host="0.0.0.0", port=5055, debug=True)
@@ -0,0 +1,272 @@
+"""
+Almacén de contenido compartido entre versiones, direccionado por hash.
+Cada texto de sección único se guarda una vez; los índices de cada versión guardan solo su id.
+
+    data/index/_content/CURRENT          -> generación activa (cambia solo al compactar)
+    data/index/_content/g<ns>/content.bin     textos únicos en utf-8 (solo se agrega al final)
+                              minhash.bin     firma MinHash (NUM_PERM x uint32) por texto, mismo orden
+                              entries.jsonl   {"cid", "off", "len", "dup_of"} por texto; se escribe al final,
+                                              así un lector nunca ve una entrada sin su contenido
+
+Casi duplicados: shingles de SHINGLE palabras + MinHash con LSH (BANDS x ROWS). Si un texto nuevo
+se parece a uno existente (Jaccard estimado >= NEAR_DUP_THRESHOLD) se registra dup_of con el id canónico;
+el texto propio se conserva igual, solo queda enlazado.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+CONTENT_DIR = Path("data/index/_content")
+NUM_PERM = 64
+BANDS, ROWS = 16, 4
+SHINGLE = 5
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.9"))
+
+_MERSENNE = np.uint64((1 << 61) - 1)
+_rng = np.random.RandomState(20240501)
+_A = _rng.randint(1, 2 ** 31 - 1, NUM_PERM).astype(np.uint64)
+_B = _rng.randint(0, 2 ** 31 - 1, NUM_PERM).astype(np.uint64)
+
+def content_id(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+def minhash(text: str) -> np.ndarray:
+    words = re.findall(r"\w+", text.lower())
+    shingles = {" ".join(words[i:i + SHINGLE]) for i in range(max(1, len(words) - SHINGLE + 1))}
+    h = np.fromiter((int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+                     for s in shingles), dtype=np.uint64, count=len(shingles))
+    return (((np.outer(_A, h) + _B[:, None]) % _MERSENNE) & np.uint64(0xFFFFFFFF)).min(axis=1).astype(np.uint32)
+
+def _band_keys(sig: np.ndarray) -> List[tuple]:
+    return [(b, sig[b * ROWS:(b + 1) * ROWS].tobytes()) for b in range(BANDS)]
+
+class ContentStore:
+    def __init__(self, root: Path = CONTENT_DIR):
+        self.root = root
+        self._lock = threading.RLock()
+        self._gen: Optional[str] = None
+        self._seen_size = -1
+        self._entries: Dict[str, tuple] = {}   # cid -> (off, len, dup_of, fila)
+        self._order: List[str] = []
+        self._blob = None
+        self._buckets: Optional[Dict[tuple, List[int]]] = None
+        self._sigs: List[np.ndarray] = []
+        self.exact_hits = 0
+        self.near_dups = 0
+
+    # ---- lectura ----
+    def _gen_dir(self) -> Optional[Path]:
+        try:
+            name = (self.root / "CURRENT").read_text(encoding="utf-8").strip()
+        except OSError:
+            return None
+        return self.root / name
+
+    def _refresh(self):
+        gdir = self._gen_dir()
+        if gdir is None:
+            return
+        try:
+            size = (gdir / "entries.jsonl").stat().st_size
+        except OSError:
+            size = 0
+        if gdir.name == self._gen and size == self._seen_size:
+            return
+        entries, order = {}, []
+        if size:
+            with open(gdir / "entries.jsonl", "r", encoding="utf-8") as f:
+                for row, line in enumerate(f):
+                    e = json.loads(line)
+                    entries[e["cid"]] = (e["off"], e["len"], e.get("dup_of"), row)
+                    order.append(e["cid"])
+        blob_size = (gdir / "content.bin").stat().st_size if (gdir / "content.bin").exists() else 0
+        self._blob = np.memmap(gdir / "content.bin", dtype=np.uint8, mode="r") if blob_size else None
+        self._entries, self._order = entries, order
+        self._gen, self._seen_size = gdir.name, size
+        self._buckets = None
+
+    def get(self, cid: str) -> str:
+        with self._lock:
+            e = self._entries.get(cid)
+            if e is None:
+                self._refresh()
+                e = self._entries[cid]
+            off, n = e[0], e[1]
+            return bytes(self._blob[off:off + n]).decode("utf-8") if n else ""
+
+    def near_duplicate_of(self, cid: str) -> Optional[str]:
+        """Id canónico si este texto es casi duplicado de otro ya guardado; None si es propio."""
+        with self._lock:
+            if cid not in self._entries:
+                self._refresh()
+            e = self._entries.get(cid)
+            return e[2] if e else None
+
+    def canonical(self, cid: str) -> str:
+        return self.near_duplicate_of(cid) or cid
+
+    # ---- escritura (un solo proceso escritor: el que reindexa) ----
+    def _ensure_gen(self) -> Path:
+        gdir = self._gen_dir()
+        if gdir is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            gdir = self.root / f"g{time.time_ns()}"
+            gdir.mkdir()
+            for name in ("content.bin", "minhash.bin", "entries.jsonl"):
+                (gdir / name).touch()
+            ptmp = self.root / f"CURRENT.tmp{os.getpid()}"
+            ptmp.write_text(gdir.name, encoding="utf-8")
+            os.replace(ptmp, self.root / "CURRENT")
+        return gdir
+
+    def _load_buckets(self, gdir: Path):
+        if self._buckets is not None:
+            return
+        self._buckets = {}
+        sigs = np.fromfile(gdir / "minhash.bin", dtype=np.uint32).reshape(-1, NUM_PERM)
+        self._sigs = list(sigs)
+        for row, sig in enumerate(self._sigs):
+            for key in _band_keys(sig):
+                self._buckets.setdefault(key, []).append(row)
+
+    def _find_near(self, sig: np.ndarray) -> Optional[str]:
+        best, best_j = None, NEAR_DUP_THRESHOLD
+        seen = set()
+        for key in _band_keys(sig):
+            for row in self._buckets.get(key, ()):
+                if row in seen:
+                    continue
+                seen.add(row)
+                j = float(np.mean(self._sigs[row] == sig))
+                if j >= best_j:
+                    best, best_j = row, j
+        if best is None:
+            return None
+        cid = self._order[best]
+        return self._entries[cid][2] or cid
+
+    def put_many(self, texts: Iterable[str]) -> List[str]:
+        """Guarda los textos que no existan todavía y devuelve sus ids (en el mismo orden)."""
+        texts = list(texts)
+        cids = [content_id(t) for t in texts]
+        with self._lock:
+            gdir = self._ensure_gen()
+            self._refresh()
+            new = {}
+            for cid, t in zip(cids, texts):
+                if cid in self._entries or cid in new:
+                    self.exact_hits += 1
+                else:
+                    new[cid] = t
+            if not new:
+                return cids
+            self._load_buckets(gdir)
+            lines = []
+            with open(gdir / "content.bin", "ab") as cf, open(gdir / "minhash.bin", "ab") as mf:
+                off = cf.seek(0, os.SEEK_END)
+                for cid, t in new.items():
+                    data = t.encode("utf-8")
+                    cf.write(data)
+                    sig = minhash(t)
+                    mf.write(sig.tobytes())
+                    dup_of = self._find_near(sig)
+                    if dup_of:
+                        self.near_dups += 1
+                    row = len(self._order)
+                    self._entries[cid] = (off, len(data), dup_of, row)
+                    self._order.append(cid)
+                    self._sigs.append(sig)
+                    for key in _band_keys(sig):
+                        self._buckets.setdefault(key, []).append(row)
+                    lines.append(json.dumps({"cid": cid, "off": off, "len": len(data), "dup_of": dup_of}))
+                    off += len(data)
+            with open(gdir / "entries.jsonl", "a", encoding="utf-8") as ef:
+                ef.write("\n".join(lines) + "\n")
+            self._seen_size = -1  # fuerza remapear content.bin en el próximo get
+            self._refresh()
+            return cids
+
+    def generation(self) -> Optional[str]:
+        """Nombre de la generación activa (los manifiestos de índice la registran)."""
+        gdir = self._gen_dir()
+        return gdir.name if gdir else None
+
+    def _sweep(self, pinned: Optional[set]):
+        """Borra las generaciones viejas que ya no referencia ningún índice conservado (None: ninguna)."""
+        if pinned is None:
+            return
+        current = self.generation()
+        for p in self.root.iterdir():
+            if p.is_dir() and p.name.startswith("g") and p.name != current and p.name not in pinned:
+                shutil.rmtree(p, ignore_errors=True)
+
+    def gc(self, live: Iterable[str], min_garbage: float = 0.5, pinned: Optional[Iterable[str]] = ()) -> bool:
+        """
+        Compacta en una generación nueva si más de `min_garbage` del contenido ya no lo usa
+        ninguna versión. `live` debe incluir los ids de todas las generaciones de índice conservadas,
+        no solo las activas. Una generación vieja se borra recién cuando no está en `pinned`
+        (las que todavía nombra algún manifiesto); con pinned=None no se borra ninguna.
+        """
+        live = set(live)
+        pinned = None if pinned is None else set(pinned)
+        with self._lock:
+            old = self._gen_dir()
+            if old is None:
+                return False
+            self._refresh()
+            total = sum(e[1] for e in self._entries.values())
+            dead = sum(e[1] for c, e in self._entries.items() if c not in live)
+            if not total or dead / total < min_garbage:
+                self._sweep(pinned)
+                return False
+            sigs = np.fromfile(old / "minhash.bin", dtype=np.uint32).reshape(-1, NUM_PERM)
+            gdir = self.root / f"g{time.time_ns()}"
+            tmp = self.root / f".{gdir.name}.tmp"
+            tmp.mkdir()
+            off, lines = 0, []
+            with open(tmp / "content.bin", "wb") as cf, open(tmp / "minhash.bin", "wb") as mf:
+                for cid in self._order:
+                    if cid not in live:
+                        continue
+                    o, n, dup_of, row = self._entries[cid]
+                    cf.write(bytes(self._blob[o:o + n]) if n else b"")
+                    mf.write(sigs[row].tobytes())
+                    dup_of = dup_of if dup_of in live else None
+                    lines.append(json.dumps({"cid": cid, "off": off, "len": n, "dup_of": dup_of}))
+                    off += n
+            (tmp / "entries.jsonl").write_text("".join(l + "\n" for l in lines), encoding="utf-8")
+            os.rename(tmp, gdir)
+            ptmp = self.root / f"CURRENT.tmp{os.getpid()}"
+            ptmp.write_text(gdir.name, encoding="utf-8")
+            os.replace(ptmp, self.root / "CURRENT")
+            self._refresh()
+            self._sweep(pinned)
+            return True
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._refresh()
+            return {
+                "texts": len(self._entries),
+                "bytes": sum(e[1] for e in self._entries.values()),
+                "near_duplicates": sum(1 for e in self._entries.values() if e[2]),
+                "exact_hits": self.exact_hits,
+            }
+
+_store: Optional[ContentStore] = None
+_store_lock = threading.Lock()
+
+def get_store() -> ContentStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ContentStore()
+        return _store
@@ -0,0 +1,135 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+HEADERS = {
+    "User-Agent": "Relativity-Releases-FAQ/1.0 (+https://localhost)"
+}
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+class HostRateLimiter:
+    """
+    Espacia las peticiones a un mismo host (reemplaza el sleep fijo tras cada descarga).
+    Hosts distintos no se bloquean entre sí.
+    """
+    def __init__(self, min_interval: float = 0.5):
+        self.min_interval = min_interval
+        self._next: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host: str):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next.get(host, 0.0))
+            self._next[host] = slot + self.min_interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+class Crawler:
+    """
+    Descargas concurrentes y educadas: una requests.Session con pool de conexiones,
+    un número acotado de workers, límite por host y reintentos con backoff.
+    """
+    def __init__(self, max_workers: int = 6, per_host_interval: float = 0.5,
+                 retries: int = 3, backoff: float = 0.5, timeout: float = 25,
+                 headers: Optional[Dict[str, str]] = None):
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.limiter = HostRateLimiter(per_host_interval)
+        self.session = requests.Session()
+        self.session.headers.update(headers or HEADERS)
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.stats: Dict[str, Dict[str, Any]] = {}
+        self._stats_lock = threading.Lock()
+
+    def _record(self, url: str, **info):
+        with self._stats_lock:
+            self.stats[url] = info
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None) -> requests.Response:
+        """GET con límite por host y reintentos; lanza la última excepción si todos fallan."""
+        host = urlsplit(url).netloc
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            attempt += 1
+            self.limiter.wait(host)
+            try:
+                r = self.session.get(url, headers=headers, timeout=self.timeout)
+                if r.status_code in RETRY_STATUS and attempt <= self.retries:
+                    self._sleep_backoff(attempt, r.headers.get("Retry-After"))
+                    continue
+                r.raise_for_status()
+                self._record(url, status=r.status_code, attempts=attempt,
+                             seconds=round(time.perf_counter() - start, 4), bytes=len(r.content))
+                return r
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt <= self.retries:
+                    self._sleep_backoff(attempt)
+                    continue
+                self._record(url, status=None, attempts=attempt,
+                             seconds=round(time.perf_counter() - start, 4), error=str(e))
+                raise
+            except requests.HTTPError as e:
+                self._record(url, status=e.response.status_code if e.response is not None else None,
+                             attempts=attempt, seconds=round(time.perf_counter() - start, 4), error=str(e))
+                raise
+
+    def _sleep_backoff(self, attempt: int, retry_after: Optional[str] = None):
+        delay = self.backoff * (2 ** (attempt - 1))
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        time.sleep(delay)
+
+    def map(self, fn: Callable[[str], Any], urls: List[str]) -> List[Any]:
+        """
+        Ejecuta fn(url) en el pool y devuelve resultados en el mismo orden que `urls`.
+        Las excepciones se devuelven en su posición en lugar de propagarse.
+        """
+        def run(u):
+            try:
+                return fn(u)
+            except Exception as e:
+                return e
+        if not urls:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(urls))) as pool:
+            return list(pool.map(run, urls))
+
+    def timing_summary(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            rows = list(self.stats.values())
+        secs = [r["seconds"] for r in rows]
+        return {
+            "urls": len(rows),
+            "errors": sum(1 for r in rows if r.get("error")),
+            "total_seconds": round(sum(secs), 4),
+            "max_seconds": max(secs) if secs else 0.0,
+        }
+
+_default: Optional[Crawler] = None
+_default_lock = threading.Lock()
+
+def get_crawler() -> Crawler:
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Crawler()
+        return _default
+
+def set_crawler(crawler: Optional[Crawler]):
+    """Permite inyectar otro Crawler (p. ej. apuntando a un servidor HTTP local)."""
+    global _default
+    with _default_lock:
+        _default = crawler
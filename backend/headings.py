@@ -0,0 +1,98 @@
+"""
+Índice de encabezados para el autocompletado del modo guiado.
+
+Se arma una vez por generación del índice: los encabezados sin repetir, el vocabulario de sus
+palabras ordenado y, por palabra, las filas (encabezado, posición) donde aparece. Un prefijo es
+un rango contiguo del vocabulario (dos búsquedas binarias), así que sugerir no recorre secciones.
+"""
+import re
+from bisect import bisect_left
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_MAX_CHAR = "\U0010ffff"
+
+def tokenize(text: str) -> List[str]:
+    return _WORD.findall((text or "").lower())
+
+class HeadingIndex:
+    """
+    headings: registros {"heading", "url"} en el orden del índice (el de la documentación).
+    terms[j] tiene sus apariciones en ids/pos[ptr[j]:ptr[j+1]]; todo puede venir de un mmap.
+    """
+    def __init__(self, headings: Sequence, terms: Sequence, ptr: np.ndarray, ids: np.ndarray,
+                 pos: np.ndarray, lengths: np.ndarray):
+        self.headings = headings
+        self.terms = terms
+        self.ptr = ptr
+        self.ids = ids
+        self.pos = pos
+        self.lengths = lengths
+
+    @classmethod
+    def build(cls, sections) -> "HeadingIndex":
+        headings: List[Dict[str, Any]] = []
+        seen = set()
+        for s in sections:
+            h = (s.get("heading") or "").strip()
+            if h and h not in seen:
+                headings.append({"heading": h, "url": s.get("url", "")})
+                seen.add(h)
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for i, rec in enumerate(headings):
+            for p, word in enumerate(tokenize(rec["heading"])):
+                postings.setdefault(word, []).append((i, p))
+        terms = sorted(postings)
+        ptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        flat: List[Tuple[int, int]] = []
+        for j, t in enumerate(terms):
+            flat.extend(postings[t])
+            ptr[j + 1] = len(flat)
+        pairs = np.asarray(flat, dtype=np.int32).reshape(-1, 2)
+        lengths = np.asarray([len(h["heading"]) for h in headings], dtype=np.int32)
+        return cls(headings, terms, ptr, pairs[:, 0].copy(), pairs[:, 1].copy(), lengths)
+
+    def __len__(self) -> int:
+        return len(self.headings)
+
+    def top(self, limit: int) -> List[Dict[str, Any]]:
+        return [self.headings[i] for i in range(min(limit, len(self.headings)))]
+
+    def _matches(self, prefix: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Encabezados con alguna palabra que empieza con `prefix` (ids únicos ordenados, posición mínima)."""
+        lo = bisect_left(self.terms, prefix)
+        hi = bisect_left(self.terms, prefix + _MAX_CHAR, lo)
+        a, b = int(self.ptr[lo]), int(self.ptr[hi])
+        if a == b:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        # (id, posición) empaquetados en un int64: un solo sort deja la menor posición primero
+        keys = np.sort((np.asarray(self.ids[a:b], dtype=np.int64) << 32) | np.asarray(self.pos[a:b]))
+        ids = keys >> 32
+        first = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+        return ids[first], keys[first] & 0xFFFFFFFF
+
+    def suggest(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Cada palabra de la consulta debe ser prefijo de alguna palabra del encabezado.
+        Orden: coincidencias más cerca del inicio, luego encabezados más cortos, luego orden del índice.
+        """
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words:
+            return self.top(limit)
+        ids, score = None, None
+        for w in words:
+            m_ids, m_pos = self._matches(w)
+            if ids is None:
+                ids, score = m_ids, m_pos.astype(np.int64)
+            else:
+                ids, ia, ib = np.intersect1d(ids, m_ids, assume_unique=True, return_indices=True)
+                score = score[ia] + m_pos[ib]
+            if ids.size == 0:
+                return []
+        lengths = np.minimum(np.asarray(self.lengths, dtype=np.int64)[ids], (1 << 18) - 1)
+        rank = (score << 42) | (lengths << 24) | ids  # orden (puntaje, largo, id) en una sola clave
+        if rank.size > limit:
+            rank = rank[np.argpartition(rank, limit - 1)[:limit]]
+        return [self.headings[int(r & 0xFFFFFF)] for r in np.sort(rank)]
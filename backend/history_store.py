@@ -0,0 +1,207 @@
+"""
+Historial de conversaciones en SQLite (WAL) con buffer de escritura.
+
+Los turnos se acumulan en memoria y un hilo los inserta en lote cada HISTORY_FLUSH_SECONDS
+(o antes si el buffer llega a HISTORY_FLUSH_MAX). Las lecturas vacían el buffer primero,
+así nunca se pierde un turno recién escrito. El índice (email, version, id) hace que
+"los últimos N turnos", borrar una versión o borrar una cuenta no dependan del tamaño del historial.
+
+Los .jsonl del formato anterior (logs/conversations/<email>_<version>.jsonl) se importan
+la primera vez que se usa esa conversación y se borran.
+"""
+import atexit
+import json
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .metrics import METRICS
+
+HISTORY_DB = Path(os.getenv("HISTORY_DB", "logs/history.sqlite3"))
+LEGACY_DIR = Path("logs/conversations")
+HISTORY_FLUSH_SECONDS = float(os.getenv("HISTORY_FLUSH_SECONDS", "1.0"))
+HISTORY_FLUSH_MAX = int(os.getenv("HISTORY_FLUSH_MAX", "200"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    email TEXT NOT NULL,
+    version TEXT NOT NULL,
+    ts TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    citations TEXT,
+    confidence REAL
+);
+CREATE INDEX IF NOT EXISTS turns_conversation ON turns (email, version, id);
+"""
+
+def _safe(s: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_.-]+", "_", s)
+
+class HistoryStore:
+    def __init__(self, path: Path = HISTORY_DB, legacy_dir: Optional[Path] = LEGACY_DIR,
+                 flush_seconds: float = HISTORY_FLUSH_SECONDS, flush_max: int = HISTORY_FLUSH_MAX):
+        self.path = path
+        self.legacy_dir = legacy_dir
+        self.flush_seconds = flush_seconds
+        self.flush_max = flush_max
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._pending: List[tuple] = []
+        self._lock = threading.Lock()       # protege _pending
+        self._write_lock = threading.Lock()  # una escritura a la vez por proceso
+        self._migrated = set()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        with self._conn() as db:
+            db.executescript(_SCHEMA)
+        self._flusher = threading.Thread(target=self._run, name="history-flush", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def _conn(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    # ---- escritura ----
+    def append(self, email: str, version: str, ts: str, role: str, content: str,
+               citations=None, confidence=None):
+        row = (email, version, ts, role, content,
+               json.dumps(citations, ensure_ascii=False) if citations is not None else None, confidence)
+        with self._lock:
+            self._pending.append(row)
+            full = len(self._pending) >= self.flush_max
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        with self._write_lock:
+            with self._lock:
+                rows, self._pending = self._pending, []
+            if not rows:
+                return
+            for email, version in {(r[0], r[1]) for r in rows}:
+                self._migrate(email, version)
+            with METRICS.time("history_flush"), self._conn() as db:
+                db.executemany("INSERT INTO turns (email, version, ts, role, content, citations, confidence) "
+                               "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[history] flush failed: {e}")
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"[history] final flush failed: {e}")
+
+    # ---- formato anterior ----
+    def _legacy_path(self, email: str, version: str) -> Optional[Path]:
+        if self.legacy_dir is None:
+            return None
+        return self.legacy_dir / f"{_safe(email)}_{_safe(version)}.jsonl"
+
+    def _migrate(self, email: str, version: str):
+        """Importa el .jsonl viejo de esta conversación (una vez) antes de escribir o leer."""
+        if (email, version) in self._migrated:
+            return
+        p = self._legacy_path(email, version)
+        if p is not None and p.exists():
+            rows = []
+            with open(p, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        r = json.loads(line)
+                    except ValueError:
+                        continue
+                    rows.append((email, version, r.get("ts", ""), r.get("role", ""), r.get("content", ""),
+                                 json.dumps(r["citations"], ensure_ascii=False) if "citations" in r else None,
+                                 r.get("confidence")))
+            with self._conn() as db:
+                # los turnos viejos quedan antes que cualquier turno nuevo de la conversación
+                existing = db.execute("SELECT id, ts, role, content, citations, confidence FROM turns "
+                                      "WHERE email = ? AND version = ? ORDER BY id", (email, version)).fetchall()
+                db.execute("DELETE FROM turns WHERE email = ? AND version = ?", (email, version))
+                db.executemany("INSERT INTO turns (email, version, ts, role, content, citations, confidence) "
+                               "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                               rows + [(email, version) + tuple(e[1:]) for e in existing])
+            try: p.unlink()
+            except OSError: pass
+        self._migrated.add((email, version))
+
+    # ---- lectura ----
+    def recent(self, email: str, version: str, limit: int = 100,
+               before: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        Los últimos `limit` turnos (en orden cronológico) anteriores al id `before`.
+        Devuelve también el cursor para la página anterior, o None si no hay más.
+        """
+        self.flush()
+        with self._write_lock:
+            self._migrate(email, version)
+        db = self._conn()
+        sql = "SELECT id, ts, version, role, content, citations, confidence FROM turns WHERE email = ? AND version = ?"
+        args: list = [email, version]
+        if before is not None:
+            sql += " AND id < ?"
+            args.append(before)
+        rows = db.execute(sql + " ORDER BY id DESC LIMIT ?", args + [limit + 1]).fetchall()
+        more = len(rows) > limit
+        rows = rows[:limit][::-1]
+        items = []
+        for id_, ts, ver, role, content, citations, confidence in rows:
+            rec = {"id": id_, "ts": ts, "version": ver, "role": role, "content": content}
+            if citations is not None: rec["citations"] = json.loads(citations)
+            if confidence is not None: rec["confidence"] = confidence
+            items.append(rec)
+        return items, (rows[0][0] if more and rows else None)
+
+    # ---- borrado ----
+    def clear(self, email: str, version: str):
+        with self._write_lock:
+            with self._lock:
+                self._pending = [r for r in self._pending if (r[0], r[1]) != (email, version)]
+            p = self._legacy_path(email, version)
+            if p is not None and p.exists():
+                p.unlink()
+            self._migrated.add((email, version))
+            with self._conn() as db:
+                db.execute("DELETE FROM turns WHERE email = ? AND version = ?", (email, version))
+
+    def delete_user(self, email: str):
+        with self._write_lock:
+            with self._lock:
+                self._pending = [r for r in self._pending if r[0] != email]
+            if self.legacy_dir is not None:
+                for f in self.legacy_dir.glob(f"{_safe(email)}_*.jsonl"):
+                    try: f.unlink()
+                    except OSError: pass
+            with self._conn() as db:
+                db.execute("DELETE FROM turns WHERE email = ?", (email,))
+
+_store: Optional[HistoryStore] = None
+_store_lock = threading.Lock()
+
+def get_history_store() -> HistoryStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = HistoryStore()
+        return _store
@@ -0,0 +1,169 @@
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+N_FEATURES = 2 ** 20
+MAX_DF = 0.9
+BM25_K1 = 1.2
+BM25_B = 0.75
+COUNTS_CACHE_MAX = 50000
+
+# filas de frecuencias por id de contenido: el mismo texto en varias versiones se tokeniza una vez
+_counts_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_counts_lock = threading.Lock()
+
+class HashingTfidf:
+    """
+    TF-IDF sobre HashingVectorizer para índices incrementales.
+    No hay vocabulario que reajustar: solo se guardan las frecuencias de documento (df),
+    así que agregar o quitar páginas cuesta lo que miden esas páginas.
+    Reproduce TfidfVectorizer(ngram_range=(1,2), max_df=0.9, stop_words="english")
+    salvo colisiones de hash.
+    """
+    ranker = "tfidf"
+
+    def __init__(self, n_features: int = N_FEATURES, max_df: float = MAX_DF):
+        self.n_features = n_features
+        self.max_df = max_df
+        self.hasher = HashingVectorizer(ngram_range=(1, 2), stop_words="english", n_features=n_features,
+                                        alternate_sign=False, norm=None)
+        self.df = np.zeros(n_features, dtype=np.int32)
+        self.n_docs = 0
+        self.idf_ = np.zeros(n_features, dtype=np.float64)
+
+    def counts(self, texts: List[str], keys: Optional[List[str]] = None) -> sp.csr_matrix:
+        """
+        Frecuencias de término crudas (una fila por texto). Con `keys` (ids de contenido)
+        se reutilizan las filas ya calculadas y solo se tokenizan los textos nuevos.
+        """
+        if keys is None:
+            X = self.hasher.transform(texts).tocsr()
+            X.sum_duplicates()
+            return X
+        rows: List[Optional[tuple]] = []
+        with _counts_lock:
+            for k in keys:
+                hit = _counts_cache.get((self.n_features, k))
+                if hit is not None:
+                    _counts_cache.move_to_end((self.n_features, k))
+                rows.append(hit)
+        missing = [i for i, r in enumerate(rows) if r is None]
+        if missing:
+            X = self.counts([texts[i] for i in missing])
+            with _counts_lock:
+                for j, i in enumerate(missing):
+                    lo, hi = X.indptr[j], X.indptr[j + 1]
+                    rows[i] = (X.indices[lo:hi].copy(), X.data[lo:hi].copy())
+                    _counts_cache[(self.n_features, keys[i])] = rows[i]
+                while len(_counts_cache) > COUNTS_CACHE_MAX:
+                    _counts_cache.popitem(last=False)
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(r[0]) for r in rows])
+        indices = np.concatenate([r[0] for r in rows]) if rows else np.zeros(0, dtype=np.int32)
+        data = np.concatenate([r[1] for r in rows]) if rows else np.zeros(0)
+        return sp.csr_matrix((data, indices, indptr), shape=(len(rows), self.n_features))
+
+    def add_docs(self, counts: sp.csr_matrix):
+        self.df = self.df + np.bincount(counts.indices, minlength=self.n_features).astype(np.int32)
+        self.n_docs += counts.shape[0]
+        self._refresh_idf()
+
+    def remove_docs(self, counts: sp.csr_matrix):
+        self.df = self.df - np.bincount(counts.indices, minlength=self.n_features).astype(np.int32)
+        self.n_docs -= counts.shape[0]
+        self._refresh_idf()
+
+    def _refresh_idf(self):
+        n = self.n_docs
+        idf = np.log((1.0 + n) / (1.0 + self.df)) + 1.0
+        # como TfidfVectorizer: términos ausentes del corpus o por encima de max_df no cuentan
+        idf[self.df == 0] = 0.0
+        idf[self.df > self.max_df * n] = 0.0
+        self.idf_ = idf
+
+    def weight(self, counts: sp.csr_matrix) -> sp.csr_matrix:
+        X = counts.astype(np.float64)
+        X.data *= self.idf_[X.indices]
+        X.eliminate_zeros()
+        return normalize(X, norm="l2", copy=False)
+
+    def transform(self, texts: List[str]) -> sp.csr_matrix:
+        return self.weight(self.counts(texts))
+
+    def params(self) -> dict:
+        """Lo que hay que guardar (además de df e idf) para reconstruir el vectorizador."""
+        return {"n_features": self.n_features, "max_df": self.max_df, "n_docs": int(self.n_docs)}
+
+    @classmethod
+    def from_params(cls, params: dict) -> "HashingTfidf":
+        vec = cls(n_features=params["n_features"], max_df=params["max_df"])
+        vec.n_docs = params["n_docs"]
+        return vec
+
+class HashingBm25(HashingTfidf):
+    """
+    BM25 con la misma tokenización y el mismo contrato que HashingTfidf.
+    weight() deja en la matriz el aporte BM25 ya resuelto de cada (documento, término):
+        idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * largo / largo_promedio))
+    y la consulta es binaria, así que puntuar sigue siendo un solo producto disperso.
+    La consulta se divide por el máximo alcanzable (sum idf * (k1 + 1)): el puntaje queda en [0, 1).
+    """
+    ranker = "bm25"
+
+    def __init__(self, n_features: int = N_FEATURES, k1: float = BM25_K1, b: float = BM25_B):
+        super().__init__(n_features=n_features, max_df=1.0)
+        self.k1 = k1
+        self.b = b
+        self.total_len = 0.0  # suma de frecuencias de todos los documentos, para el largo promedio
+
+    def add_docs(self, counts: sp.csr_matrix):
+        self.total_len += float(counts.sum())
+        super().add_docs(counts)
+
+    def remove_docs(self, counts: sp.csr_matrix):
+        self.total_len -= float(counts.sum())
+        super().remove_docs(counts)
+
+    def _refresh_idf(self):
+        n, df = self.n_docs, self.df
+        idf = np.log1p((n - df + 0.5) / (df + 0.5))
+        idf[df == 0] = 0.0
+        self.idf_ = idf
+
+    def weight(self, counts: sp.csr_matrix) -> sp.csr_matrix:
+        X = counts.astype(np.float64)
+        lengths = np.asarray(X.sum(axis=1)).ravel()
+        avgdl = self.total_len / self.n_docs if self.n_docs else 1.0
+        norm = self.k1 * (1.0 - self.b + self.b * lengths / max(avgdl, 1e-9))
+        tf = X.data
+        X.data = self.idf_[X.indices] * tf * (self.k1 + 1.0) / (tf + np.repeat(norm, np.diff(X.indptr)))
+        X.eliminate_zeros()
+        return X
+
+    def transform(self, texts: List[str]) -> sp.csr_matrix:
+        Q = self.counts(texts).astype(np.float64)
+        Q.data[:] = 1.0
+        # un término que ningún documento tiene cuenta en el máximo con el idf más alto:
+        # una consulta fuera de tema con una sola palabra común no llega a un puntaje alto
+        idf = np.asarray(self.idf_)[Q.indices]
+        unseen = np.log1p((self.n_docs + 0.5) / 0.5)
+        best = np.bincount(np.repeat(np.arange(Q.shape[0]), np.diff(Q.indptr)),
+                           weights=np.where(idf > 0, idf, unseen) * (self.k1 + 1.0), minlength=Q.shape[0])
+        Q.data = np.where(idf > 0, 1.0 / np.repeat(np.where(best > 0, best, 1.0), np.diff(Q.indptr)), 0.0)
+        Q.eliminate_zeros()
+        return Q
+
+    def params(self) -> dict:
+        return {**super().params(), "ranker": self.ranker, "k1": self.k1, "b": self.b, "total_len": self.total_len}
+
+    @classmethod
+    def from_params(cls, params: dict) -> "HashingBm25":
+        vec = cls(n_features=params["n_features"], k1=params["k1"], b=params["b"])
+        vec.n_docs = params["n_docs"]
+        vec.total_len = params["total_len"]
+        return vec
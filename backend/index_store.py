@@ -0,0 +1,281 @@
+"""
+Formato en disco del índice (versión 2): un directorio por generación con arreglos .npy
+que se abren con mmap_mode="r", así varios procesos comparten las mismas páginas del cache del SO.
+
+    data/index/<version>/CURRENT          -> nombre de la generación activa (se reemplaza atómicamente)
+    data/index/<version>/g<ns>/manifest.json
+                               postings.{data,indices,indptr}.npy   (término x sección, CSR)
+                               counts.{data,indices,indptr}.npy     (solo modo incremental)
+                               df.npy, idf.npy                      (modo incremental: tfidf o bm25)
+                               idf.npy, terms.bin, terms.idx.npy    (modo full: vocabulario ordenado)
+                               sections.bin, sections.idx.npy       (un registro JSON por sección)
+                               passages.npy                         (sección, inicio, fin) por fila
+                               headings.bin, hterms.bin, hterms.*.npy (autocompletado de encabezados)
+
+El texto de cada sección vive en el almacén compartido (content_store); el registro guarda su "cid".
+"""
+import json
+import os
+import shutil
+import time
+from bisect import bisect_left
+from functools import partial
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import normalize
+
+from .content_store import ContentStore, get_store
+from .headings import HeadingIndex
+from .incremental import HashingBm25, HashingTfidf
+
+FORMAT_VERSION = 2
+KEEP_GENERATIONS = 2
+TFIDF_PARAMS = {"ngram_range": (1, 2), "stop_words": "english"}
+
+# ---------- blobs con offsets ----------
+def _write_blob(dirpath: Path, name: str, items: List[bytes]):
+    offsets = np.zeros(len(items) + 1, dtype=np.int64)
+    with open(dirpath / f"{name}.bin", "wb") as f:
+        for i, b in enumerate(items):
+            f.write(b)
+            offsets[i + 1] = offsets[i] + len(b)
+    np.save(dirpath / f"{name}.idx.npy", offsets)
+
+def _open_blob(dirpath: Path, name: str):
+    offsets = np.load(dirpath / f"{name}.idx.npy", mmap_mode="r")
+    path = dirpath / f"{name}.bin"
+    if path.stat().st_size == 0:
+        return b"", offsets
+    return np.memmap(path, dtype=np.uint8, mode="r"), offsets
+
+class SectionStore(Sequence):
+    """
+    Lista de secciones de solo lectura respaldada por un blob mmap; decodifica bajo demanda.
+    El contenido se resuelve en el almacén compartido, así que versiones con el mismo texto
+    comparten las mismas páginas en memoria.
+    """
+    def __init__(self, dirpath: Path, content: Optional[ContentStore] = None):
+        self._blob, self._offsets = _open_blob(dirpath, "sections")
+        self._content = content or get_store()
+
+    def _record(self, i: int) -> Dict[str, Any]:
+        lo, hi = int(self._offsets[i]), int(self._offsets[i + 1])
+        return json.loads(bytes(self._blob[lo:hi]).decode("utf-8"))
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        rec = self._record(i)
+        if "cid" in rec and "content" not in rec:
+            rec["content"] = self._content.get(rec["cid"])
+        return rec
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def cids(self) -> List[str]:
+        """Ids de contenido de todas las secciones, sin decodificar el texto."""
+        return [c for c in (self._record(i).get("cid") for i in range(len(self))) if c]
+
+class _TermArray(Sequence):
+    def __init__(self, dirpath: Path, name: str = "terms"):
+        self._blob, self._offsets = _open_blob(dirpath, name)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        lo, hi = int(self._offsets[i]), int(self._offsets[i + 1])
+        return bytes(self._blob[lo:hi]).decode("utf-8")
+
+class _RecordArray(_TermArray):
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        return json.loads(super().__getitem__(i))
+
+class SortedVocabTfidf:
+    """
+    Vectorizador de consultas para índices en modo full: mismo análisis que TfidfVectorizer
+    pero con el vocabulario como arreglo ordenado (búsqueda binaria) en lugar de un dict en memoria.
+    """
+    def __init__(self, terms: Sequence, idf: np.ndarray):
+        self.terms = terms
+        self.idf_ = idf
+        self._analyzer = TfidfVectorizer(**TFIDF_PARAMS).build_analyzer()
+
+    @classmethod
+    def from_fitted(cls, vec: TfidfVectorizer) -> "SortedVocabTfidf":
+        # CountVectorizer ya ordena las columnas por término
+        return cls(list(vec.get_feature_names_out()), np.asarray(vec.idf_, dtype=np.float64))
+
+    def _lookup(self, term: str) -> int:
+        i = bisect_left(self.terms, term)
+        return i if i < len(self.terms) and self.terms[i] == term else -1
+
+    def transform(self, texts: List[str]) -> sp.csr_matrix:
+        indptr, indices, data = [0], [], []
+        for t in texts:
+            row = {}
+            for term, tf in Counter(self._analyzer(t)).items():
+                j = self._lookup(term)
+                if j >= 0:
+                    row[j] = tf * self.idf_[j]
+            for j in sorted(row):
+                indices.append(j); data.append(row[j])
+            indptr.append(len(indices))
+        X = sp.csr_matrix((np.asarray(data, dtype=np.float64), np.asarray(indices, dtype=np.int32),
+                           np.asarray(indptr, dtype=np.int32)), shape=(len(texts), len(self.terms)))
+        return normalize(X, norm="l2", copy=False)
+
+# ---------- CSR ----------
+def _save_csr(dirpath: Path, name: str, m: sp.csr_matrix):
+    m = m.tocsr()
+    np.save(dirpath / f"{name}.data.npy", np.ascontiguousarray(m.data))
+    np.save(dirpath / f"{name}.indices.npy", np.ascontiguousarray(m.indices))
+    np.save(dirpath / f"{name}.indptr.npy", np.ascontiguousarray(m.indptr))
+
+def _load_csr(dirpath: Path, name: str, shape) -> sp.csr_matrix:
+    arrays = [np.load(dirpath / f"{name}.{part}.npy", mmap_mode="r") for part in ("data", "indices", "indptr")]
+    m = sp.csr_matrix(tuple(arrays), shape=tuple(shape), copy=False)
+    return m
+
+# ---------- encabezados ----------
+def _save_headings(dirpath: Path, hx: HeadingIndex):
+    _write_blob(dirpath, "headings", [json.dumps(h, ensure_ascii=False).encode("utf-8") for h in hx.headings])
+    _write_blob(dirpath, "hterms", [t.encode("utf-8") for t in hx.terms])
+    for name in ("ptr", "ids", "pos", "lengths"):
+        np.save(dirpath / f"hterms.{name}.npy", np.ascontiguousarray(getattr(hx, name)))
+
+def _load_headings(dirpath: Path) -> Optional[HeadingIndex]:
+    if not (dirpath / "hterms.lengths.npy").exists():
+        return None  # generación anterior a este formato: se arma en memoria al pedirlo
+    # vocabulario y filas son chicos: en memoria, sin el costo de cortar un memmap en cada tecla;
+    # los registros (lo más grande) quedan en el mmap y solo se decodifican los sugeridos
+    arrays = {name: np.load(dirpath / f"hterms.{name}.npy") for name in ("ptr", "ids", "pos", "lengths")}
+    return HeadingIndex(_RecordArray(dirpath, "headings"), list(_TermArray(dirpath, "hterms")), **arrays)
+
+# ---------- lectura / escritura ----------
+def current_path(version_dir: Path) -> Path:
+    return version_dir / "CURRENT"
+
+def write_index(version_dir: Path, *, version: str, sections: List[Dict[str, Any]], postings: sp.csr_matrix,
+                vectorizer, counts: Optional[sp.csr_matrix], page_hashes: Dict[str, str],
+                headings: Optional[HeadingIndex] = None, passages: Optional[np.ndarray] = None,
+                content: Optional[ContentStore] = None) -> Path:
+    """Escribe una generación nueva y la publica reemplazando CURRENT. Devuelve la ruta de CURRENT."""
+    version_dir.mkdir(parents=True, exist_ok=True)
+    # el texto va al almacén compartido (solo se escribe si es nuevo); aquí queda el id
+    content = content or get_store()
+    cids = content.put_many([s["content"] for s in sections])
+    records = [{**{k: v for k, v in s.items() if k != "content"}, "cid": cid} for s, cid in zip(sections, cids)]
+    name = f"g{time.time_ns()}"
+    tmp = version_dir / f".{name}.tmp"
+    tmp.mkdir()
+
+    manifest: Dict[str, Any] = {
+        "format": FORMAT_VERSION,
+        "version": version,
+        "n_sections": len(sections),
+        "postings_shape": list(postings.shape),
+        "page_hashes": page_hashes,
+        # generación del almacén de contenido donde están estos cids (el gc no la borra mientras exista)
+        "content_gen": content.generation(),
+    }
+    _save_csr(tmp, "postings", postings)
+    if isinstance(vectorizer, HashingTfidf):
+        manifest["mode"] = "incremental"
+        manifest["vectorizer"] = vectorizer.params()
+        np.save(tmp / "df.npy", np.asarray(vectorizer.df))
+        np.save(tmp / "idf.npy", np.asarray(vectorizer.idf_))
+        if counts is not None:
+            _save_csr(tmp, "counts", counts)
+            manifest["counts_shape"] = list(counts.shape)
+    else:
+        if isinstance(vectorizer, TfidfVectorizer):
+            vectorizer = SortedVocabTfidf.from_fitted(vectorizer)
+        manifest["mode"] = "full"
+        np.save(tmp / "idf.npy", np.asarray(vectorizer.idf_))
+        _write_blob(tmp, "terms", [vectorizer.terms[i].encode("utf-8") for i in range(len(vectorizer.terms))])
+    _write_blob(tmp, "sections", [json.dumps(r, ensure_ascii=False).encode("utf-8") for r in records])
+    _save_headings(tmp, headings if headings is not None else HeadingIndex.build(sections))
+    if passages is not None:
+        np.save(tmp / "passages.npy", np.ascontiguousarray(passages, dtype=np.int64))
+    (tmp / "manifest.json").write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+
+    os.rename(tmp, version_dir / name)
+    pointer = current_path(version_dir)
+    ptmp = version_dir / f"CURRENT.tmp{os.getpid()}"
+    ptmp.write_text(name, encoding="utf-8")
+    os.replace(ptmp, pointer)
+    _prune(version_dir, keep=name)
+    return pointer
+
+def _prune(version_dir: Path, keep: str):
+    gens = sorted(p for p in version_dir.iterdir() if p.is_dir() and p.name.startswith("g") and p.name != keep)
+    for p in gens[:len(gens) - (KEEP_GENERATIONS - 1)]:
+        # en POSIX los procesos que aún tienen mmap de estos archivos siguen funcionando
+        shutil.rmtree(p, ignore_errors=True)
+
+def generation_refs(version_dir: Path) -> Tuple[Set[str], Set[Optional[str]]]:
+    """
+    Ids de contenido y generaciones del almacén que referencian todas las generaciones conservadas
+    (la activa y las que _prune deja para los procesos que aún no recargaron). None en el segundo
+    conjunto: alguna generación no registra content_gen (formato anterior).
+    """
+    cids: Set[str] = set()
+    gens: Set[Optional[str]] = set()
+    for p in version_dir.iterdir():
+        if not (p.is_dir() and p.name.startswith("g") and (p / "manifest.json").exists()):
+            continue
+        try:
+            manifest = json.loads((p / "manifest.json").read_text(encoding="utf-8"))
+            cids.update(SectionStore(p).cids())
+        except (OSError, ValueError):
+            continue  # _prune la borró mientras la leíamos
+        gens.add(manifest.get("content_gen"))
+    return cids, gens
+
+def read_index(version_dir: Path) -> Optional[Dict[str, Any]]:
+    pointer = current_path(version_dir)
+    try:
+        name = pointer.read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+    gdir = version_dir / name
+    manifest = json.loads((gdir / "manifest.json").read_text(encoding="utf-8"))
+    if manifest.get("format") != FORMAT_VERSION:
+        return None
+    postings = _load_csr(gdir, "postings", manifest["postings_shape"])
+    counts = None
+    if manifest["mode"] == "incremental":
+        params = manifest["vectorizer"]
+        cls = HashingBm25 if params.get("ranker") == HashingBm25.ranker else HashingTfidf
+        vectorizer = cls.from_params(params)
+        vectorizer.df = np.load(gdir / "df.npy", mmap_mode="r")
+        vectorizer.idf_ = np.load(gdir / "idf.npy", mmap_mode="r")
+        if "counts_shape" in manifest:
+            counts = _load_csr(gdir, "counts", manifest["counts_shape"])
+    else:
+        vectorizer = SortedVocabTfidf(_TermArray(gdir), np.load(gdir / "idf.npy", mmap_mode="r"))
+    return {
+        "version": manifest["version"],
+        "sections": SectionStore(gdir),
+        "postings": postings,
+        "vectorizer": vectorizer,
+        "counts": counts,
+        "page_hashes": manifest.get("page_hashes", {}),
+        "headings": partial(_load_headings, gdir),  # se lee recién cuando se usa el autocompletado
+        "passages": np.load(gdir / "passages.npy", mmap_mode="r") if (gdir / "passages.npy").exists() else None,
+    }
@@ -0,0 +1,236 @@
+"""
+Métricas en proceso, expuestas en formato de texto de Prometheus (sin dependencias).
+
+    with METRICS.time("transform"): ...        # qa_stage_seconds{stage="transform"}
+    METRICS.inc("qa_answers_total", source="cache")
+
+Cada etapa alimenta un histograma de buckets fijos (para agregar en Prometheus) y una ventana
+de las últimas WINDOW observaciones, de la que salen p50/p95/p99 (qa_stage_latency_seconds).
+Los contadores de otros módulos (registro de índices, cache de respuestas) se leen al exportar
+mediante collectors. Las métricas son por proceso: con varios workers, Prometheus suma por instancia.
+
+Perfilado opcional de requests lentos: ver RequestProfiler.
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+WINDOW = 2048
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    body = ",".join(f'{k}="{esc(v)}"' for k, v in sorted(labels.items()))
+    return "{" + body + "}"
+
+class _Series:
+    __slots__ = ("counts", "sum", "count", "window")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.window = deque(maxlen=WINDOW)
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hist: Dict[Tuple[str, tuple], _Series] = {}
+        self._counters: Dict[Tuple[str, tuple], float] = {}
+        self._help: Dict[str, str] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, Dict[str, str], float]]]] = []
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    # ---- registro ----
+    def observe(self, name: str, seconds: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        i = 0
+        while i < len(BUCKETS) and seconds > BUCKETS[i]:
+            i += 1
+        with self._lock:
+            s = self._hist.get(key)
+            if s is None:
+                s = self._hist[key] = _Series()
+            s.counts[i] += 1
+            s.sum += seconds
+            s.count += 1
+            s.window.append(seconds)
+
+    @contextmanager
+    def time(self, stage: str, name: str = "qa_stage_seconds"):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, stage=stage)
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def add_collector(self, fn: Callable[[], Iterable[Tuple[str, str, Dict[str, str], float]]]):
+        """fn() -> [(nombre, tipo, labels, valor)] leído en cada exportación."""
+        self._collectors.append(fn)
+
+    # ---- lectura ----
+    def quantiles(self, name: str = "qa_stage_seconds") -> Dict[str, Dict[str, float]]:
+        """{"stage=transform": {"p50": ..., "p95": ..., "p99": ..., "count": ...}} para inspección rápida."""
+        out = {}
+        with self._lock:
+            items = [(k, sorted(s.window), s.count) for k, s in self._hist.items() if k[0] == name]
+        for (_, labels), window, count in items:
+            key = ",".join(f"{k}={v}" for k, v in labels)
+            out[key] = {f"p{int(q * 100)}": _quantile(window, q) for q in QUANTILES}
+            out[key]["count"] = count
+        return out
+
+    def render(self) -> str:
+        """Texto en formato de exposición de Prometheus 0.0.4."""
+        lines: List[str] = []
+        with self._lock:
+            hist = [(k, list(s.counts), s.sum, s.count, sorted(s.window)) for k, s in self._hist.items()]
+            counters = list(self._counters.items())
+        by_name: Dict[str, list] = {}
+        for (name, labels), counts, total, count, window in sorted(hist, key=lambda h: h[0]):
+            by_name.setdefault(name, []).append((dict(labels), counts, total, count, window))
+        for name, series in by_name.items():
+            lines.append(f"# HELP {name} {self._help.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, counts, total, count, _ in series:
+                acc = 0
+                for le, c in zip(list(BUCKETS) + ["+Inf"], counts):
+                    acc += c
+                    lines.append(f"{name}_bucket{_labels({**labels, 'le': le})} {acc}")
+                lines.append(f"{name}_sum{_labels(labels)} {total:.6f}")
+                lines.append(f"{name}_count{_labels(labels)} {count}")
+            summary = name.replace("_seconds", "_latency_seconds")
+            lines.append(f"# HELP {summary} Quantiles over the last {WINDOW} observations of {name}")
+            lines.append(f"# TYPE {summary} summary")
+            for labels, _, total, count, window in series:
+                for q in QUANTILES:
+                    lines.append(f"{summary}{_labels({**labels, 'quantile': q})} {_quantile(window, q):.6f}")
+                lines.append(f"{summary}_sum{_labels(labels)} {total:.6f}")
+                lines.append(f"{summary}_count{_labels(labels)} {count}")
+
+        samples: Dict[str, list] = {}
+        types: Dict[str, str] = {}
+        for (name, labels), value in sorted(counters):
+            samples.setdefault(name, []).append((dict(labels), value))
+            types[name] = "counter"
+        for fn in self._collectors:
+            try:
+                for name, kind, labels, value in fn():
+                    samples.setdefault(name, []).append((labels, value))
+                    types[name] = kind
+            except Exception as e:
+                print(f"[metrics] collector failed: {e}")
+        for name, items in samples.items():
+            lines.append(f"# HELP {name} {self._help.get(name, name)}")
+            lines.append(f"# TYPE {name} {types[name]}")
+            for labels, value in items:
+                lines.append(f"{name}{_labels(labels)} {float(value):g}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._hist.clear()
+            self._counters.clear()
+
+def _quantile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+METRICS = Metrics()
+METRICS.describe("qa_stage_seconds", "Time spent in each stage of the QA path")
+METRICS.describe("http_request_seconds", "Request latency by endpoint (time to first byte for streams)")
+METRICS.describe("http_requests_total", "Requests by endpoint and status")
+METRICS.describe("profiles_written_total", "Slow-request profiles written to PROFILE_DIR")
+
+# ---------- perfilado opcional ----------
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "500"))
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "logs/profiles"))
+PROFILER = os.getenv("PROFILER", "cprofile").strip().lower()  # cprofile | pyinstrument
+
+class RequestProfiler:
+    """
+    Perfila una fracción de requests (PROFILE_SAMPLE_RATE, o los que pidan X-Profile: 1 cuando
+    el perfilado está habilitado) y guarda el perfil solo si el request tardó más de PROFILE_SLOW_MS.
+    cProfile (.prof, abrir con snakeviz/pstats) o pyinstrument (.html) si está instalado.
+    Un request perfilado a la vez: dos perfiles simultáneos se mezclan.
+    """
+    def __init__(self, sample_rate: float = PROFILE_SAMPLE_RATE, slow_ms: float = PROFILE_SLOW_MS,
+                 out_dir: Path = PROFILE_DIR, kind: str = PROFILER):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.out_dir = out_dir
+        self.kind = kind
+        self._busy = threading.Lock()
+        if kind == "pyinstrument":
+            try:
+                import pyinstrument  # noqa: F401
+            except ImportError:
+                print("[metrics] pyinstrument not installed; using cProfile")
+                self.kind = "cprofile"
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0
+
+    def start(self, forced: bool = False):
+        if not self.enabled or not (forced or random.random() < self.sample_rate):
+            return None
+        if not self._busy.acquire(blocking=False):
+            return None
+        try:
+            if self.kind == "pyinstrument":
+                from pyinstrument import Profiler
+                prof = Profiler()
+                prof.start()
+            else:
+                import cProfile
+                prof = cProfile.Profile()
+                prof.enable()
+        except Exception:
+            self._busy.release()
+            return None
+        return (prof, time.perf_counter())
+
+    def stop(self, handle, label: str) -> Optional[Path]:
+        if handle is None:
+            return None
+        prof, start = handle
+        try:
+            if self.kind == "pyinstrument":
+                prof.stop()
+            else:
+                prof.disable()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if elapsed_ms < self.slow_ms:
+                return None
+            self.out_dir.mkdir(parents=True, exist_ok=True)
+            stem = f"{time.strftime('%Y%m%dT%H%M%S')}_{label}_{int(elapsed_ms)}ms"
+            if self.kind == "pyinstrument":
+                path = self.out_dir / f"{stem}.html"
+                path.write_text(prof.output_html(), encoding="utf-8")
+            else:
+                path = self.out_dir / f"{stem}.prof"
+                prof.dump_stats(str(path))
+            METRICS.inc("profiles_written_total", endpoint=label)
+            return path
+        finally:
+            self._busy.release()
+
+PROFILER_HOOK = RequestProfiler()
@@ -0,0 +1,90 @@
+"""
+Pasajes: cada sección se corta en fragmentos alineados a oraciones de hasta PASSAGE_CHARS.
+
+Se indexan los pasajes (todo el texto de la sección, no solo el principio) y cada fila del índice
+guarda (sección, inicio, fin). El fragmento que se muestra en la respuesta es el pasaje mismo,
+así que responder es cortar el contenido con esos offsets, sin recorrer el texto.
+"""
+import os
+import re
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+# mismo tope que el recorte que se hacía al responder: una sección corta sigue siendo un solo pasaje
+PASSAGE_CHARS = int(os.getenv("QA_PASSAGE_CHARS", "1400"))
+PASSAGE_MIN_CHARS = 200  # un resto más corto se suma al pasaje anterior
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_SPACE = re.compile(r"\s")
+
+def _sentences(text: str, max_chars: int) -> Iterator[Tuple[int, int]]:
+    """(inicio, fin) de cada oración sin espacios en los bordes; las muy largas se parten en un espacio."""
+    pos = 0
+    bounds = [(m.start(), m.end()) for m in _SENTENCE_END.finditer(text)] + [(len(text), len(text))]
+    for end, nxt in bounds:
+        start = pos
+        pos = nxt
+        while start < end and text[start].isspace(): start += 1
+        while end > start and text[end - 1].isspace(): end -= 1
+        while end - start > max_chars:
+            cut = max((m.start() for m in _SPACE.finditer(text, start + max_chars // 2, start + max_chars)),
+                      default=start + max_chars)
+            yield start, cut
+            start = cut
+            while start < end and text[start].isspace(): start += 1
+        if end > start:
+            yield start, end
+
+def split_passages(text: str, max_chars: int = PASSAGE_CHARS) -> List[Tuple[int, int]]:
+    """Agrupa oraciones consecutivas mientras el pasaje no pase de max_chars."""
+    spans: List[Tuple[int, int]] = []
+    for s, e in _sentences(text, max_chars):
+        if spans and e - spans[-1][0] <= max_chars:
+            spans[-1] = (spans[-1][0], e)
+        else:
+            spans.append((s, e))
+    if len(spans) > 1 and spans[-1][1] - spans[-1][0] < PASSAGE_MIN_CHARS:
+        last = spans.pop()
+        spans[-1] = (spans[-1][0], last[1])
+    return spans
+
+def chunk_sections(sections: List[Dict[str, Any]], max_chars: int = PASSAGE_CHARS) -> Tuple[List[str], np.ndarray]:
+    """Textos de los pasajes y sus filas (sección, inicio, fin), en el orden de las secciones."""
+    texts: List[str] = []
+    rows: List[Tuple[int, int, int]] = []
+    for i, sec in enumerate(sections):
+        content = sec["content"]
+        for s, e in split_passages(content, max_chars):
+            texts.append(content[s:e])
+            rows.append((i, s, e))
+    return texts, np.asarray(rows, dtype=np.int64).reshape(-1, 3)
+
+def best_per_group(groups: np.ndarray, vals: np.ndarray, k: int) -> np.ndarray:
+    """
+    Posiciones (en vals) del mejor pasaje de cada grupo (sección), de los k mejores grupos
+    ordenados de mayor a menor puntaje.
+    """
+    if not vals.size or k <= 0:
+        return np.empty(0, dtype=np.intp)
+    # casi siempre alcanza con los m mejores pasajes: si ahí ya hay k secciones distintas,
+    # son las k mejores, en el orden de su primera aparición
+    m = 4 * k
+    cand = np.argpartition(-vals, m - 1)[:m] if vals.size > m else np.arange(vals.size)
+    cand = cand[np.argsort(-vals[cand], kind="stable")]
+    seen, out = set(), []
+    for i, g in zip(cand.tolist(), groups[cand].tolist()):
+        if g not in seen:
+            seen.add(g)
+            out.append(i)
+            if len(out) == k:
+                break
+    if len(out) == k or cand.size == vals.size:
+        return np.asarray(out, dtype=np.intp)
+    order = np.lexsort((-vals, groups))
+    g = groups[order]
+    first = order[np.r_[True, g[1:] != g[:-1]]]
+    k = min(k, first.size)
+    if k < first.size:
+        first = first[np.argpartition(-vals[first], k - 1)[:k]]
+    return first[np.argsort(-vals[first], kind="stable")]
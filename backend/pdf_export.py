@@ -0,0 +1,195 @@
+"""
+Exportación de conversaciones a PDF en segundo plano.
+
+submit() devuelve un job; el render corre en un pool de procesos (reportlab es Python puro
+y no suelta el GIL) y escribe directo a data/exports/<hash>.pdf (tmp + os.replace), sin BytesIO.
+El nombre del archivo es el hash del contenido de la conversación: exportar lo mismo otra vez
+no vuelve a renderizar, y dos pedidos iguales en curso comparten el mismo render.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+EXPORT_DIR = Path("data/exports")
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))
+EXPORT_TTL_SECONDS = float(os.getenv("EXPORT_TTL_SECONDS", str(24 * 3600)))
+RENDER_FORMAT = 1  # subir si cambia el diseño del PDF: invalida los renders guardados
+
+def conversation_key(convo: List[Dict[str, Any]], version_key: str) -> str:
+    payload = json.dumps({"f": RENDER_FORMAT, "v": version_key, "c": convo}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def render_pdf(convo: List[Dict[str, Any]], version_key: str, out_path: str) -> str:
+    """Dibuja la conversación en `out_path` (se publica con os.replace al terminar)."""
+    tmp = f"{out_path}.tmp{os.getpid()}"
+    try:
+        _draw(convo, version_key, tmp)
+    except BaseException:
+        try: os.unlink(tmp)
+        except OSError: pass
+        raise
+    os.replace(tmp, out_path)
+    return out_path
+
+def _draw(convo: List[Dict[str, Any]], version_key: str, path: str):
+    from reportlab.lib.pagesizes import LETTER
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.units import inch
+    from reportlab.lib.utils import simpleSplit
+
+    c = canvas.Canvas(path, pagesize=LETTER)
+    width, height = LETTER
+
+    margin = 0.75 * inch
+    x = margin
+    y = height - margin
+    line_h = 14
+    max_w = width - 2*margin
+
+    def draw_wrapped(text, font="Helvetica", size=11):
+        nonlocal y
+        c.setFont(font, size)
+        for line in simpleSplit(text, font, size, max_w):
+            if y < margin + line_h:
+                c.showPage()
+                y = height - margin
+                c.setFont(font, size)
+            c.drawString(x, y, line)
+            y -= line_h
+
+    c.setTitle(f"Conversation - {version_key}")
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(x, y, f"Chatbot — {version_key}")
+    y -= 20
+    c.setFont("Helvetica", 10)
+    c.drawString(x, y, f"Exported: {datetime.utcnow().isoformat(timespec='seconds')}Z")
+    y -= 18
+    c.line(margin, y, width - margin, y); y -= 10
+
+    for turn in convo:
+        role = "User" if turn.get("role") == "user" else "Bot"
+        content = re.sub(r"<[^>]+>", "", turn.get("content",""))
+        c.setFont("Helvetica-Bold", 11); draw_wrapped(f"{role}:")
+        c.setFont("Helvetica", 11); draw_wrapped(content)
+        cites = turn.get("citations") or []
+        for ci in cites:
+            url = ci.get("url","")
+            if url: draw_wrapped(f"Source: {url}", size=9)
+        y -= 6
+
+    c.showPage(); c.save()
+
+class ExportJob:
+    def __init__(self, owner: str, key: str, version_key: str):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.key = key
+        self.version_key = version_key
+        self.created = time.time()
+        self.future: Optional[Future] = None
+        self.cached = False
+
+    @property
+    def path(self) -> Path:
+        return (EXPORT_DIR / f"{self.key}.pdf").absolute()  # send_file resuelve rutas relativas contra la app
+
+    @property
+    def status(self) -> str:
+        if self.future is None or not self.future.done():
+            return "running" if self.future is not None else "done"
+        return "failed" if self.future.exception() is not None else "done"
+
+    def info(self) -> Dict[str, Any]:
+        out = {"job_id": self.id, "status": self.status, "cached": self.cached}
+        if out["status"] == "failed":
+            out["error"] = str(self.future.exception())
+        return out
+
+class PdfExporter:
+    def __init__(self, workers: int = EXPORT_WORKERS, ttl: float = EXPORT_TTL_SECONDS):
+        self.workers = workers
+        self.ttl = ttl
+        self._pool = None
+        self._jobs: Dict[str, ExportJob] = {}
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.RLock()  # el callback corre en este hilo si el future ya terminó
+        self._last_cleanup = 0.0
+        EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+
+    def _executor(self):
+        if self._pool is None:
+            # spawn, no fork: el pool se crea durante un request, con otros hilos vivos (requests,
+            # historial, refresco) que podrían tener un lock tomado en el momento del fork.
+            # Con 0 workers se renderiza en un hilo.
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")) \
+                if self.workers > 0 else ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf-export")
+        return self._pool
+
+    def submit(self, owner: str, convo: List[Dict[str, Any]], version_key: str) -> ExportJob:
+        key = conversation_key(convo, version_key)
+        job = ExportJob(owner, key, version_key)
+        with self._lock:
+            self._cleanup()
+            if job.path.exists():
+                job.cached = True
+                os.utime(job.path, None)  # el TTL cuenta desde el último uso
+            else:
+                fut = self._inflight.get(key)
+                if fut is None:
+                    fut = self._executor().submit(render_pdf, convo, version_key, str(job.path))
+                    self._inflight[key] = fut
+                    fut.add_done_callback(lambda _f, k=key: self._done(k))
+                job.future = fut
+            self._jobs[job.id] = job
+        return job
+
+    def _done(self, key: str):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def get(self, job_id: str, owner: str) -> Optional[ExportJob]:
+        job = self._jobs.get(job_id)
+        return job if job is not None and job.owner == owner else None
+
+    def wait(self, job: ExportJob, timeout: Optional[float] = None) -> Path:
+        if job.future is not None:
+            job.future.result(timeout=timeout)
+        return job.path
+
+    def _cleanup(self):
+        now = time.time()
+        if now - self._last_cleanup < 60:
+            return
+        self._last_cleanup = now
+        for jid in [j for j, job in self._jobs.items() if now - job.created > self.ttl]:
+            del self._jobs[jid]
+        for p in EXPORT_DIR.glob("*.pdf"):
+            try:
+                if now - p.stat().st_mtime > self.ttl:
+                    p.unlink()
+            except OSError:
+                pass
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+_exporter: Optional[PdfExporter] = None
+_exporter_lock = threading.Lock()
+
+def get_exporter() -> PdfExporter:
+    global _exporter
+    with _exporter_lock:
+        if _exporter is None:
+            _exporter = PdfExporter()
+        return _exporter
@@ -1,16 +1,44 @@
 import os
-from typing import List, Dict, Any, Tuple
+import re
+import copy
+import gc
+import time
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Iterator, Tuple, Optional, Union
 from pathlib import Path
 
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import linear_kernel
+import numpy as np
+import scipy.sparse as sp
 import joblib
 
-from .scraper import build_index_for_version
+from .content_store import content_id, get_store
+from .headings import HeadingIndex
+from .incremental import HashingTfidf
+from .index_store import current_path, generation_refs, read_index, write_index
+from .metrics import METRICS
+from .passages import best_per_group, chunk_sections
+from .rankers import Ranker, get_ranker, ranker_of
+from .scraper import all_versions, build_index_for_version
 
 INDEX_DIR = Path("data/index")
 INDEX_DIR.mkdir(parents=True, exist_ok=True)
 
+# "incremental": HashingTfidf, re-vectoriza solo páginas cambiadas; "full": TfidfVectorizer completo
+INDEX_MODE = os.getenv("QA_INDEX_MODE", "incremental").strip().lower()
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Índices de los k mayores puntajes, de mayor a menor, sin ordenar todo el arreglo."""
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if k < scores.shape[0]:
+        idx = np.argpartition(-scores, k - 1)[:k]
+    else:
+        idx = np.arange(scores.shape[0])
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
 def _trim_complete(text: str, limit: int = 1200) -> str:
     """
     Recorta cerca del límite pero respetando el final de oración.
@@ -30,97 +58,786 @@ class QAIndex:
         self.sections: List[Dict[str,Any]] = []
         self.vectorizer = None
         self.matrix = None
+        self.generation = 0  # mtime_ns del archivo en disco
+        self.page_hashes: Dict[str, str] = {}  # url -> sha256 del HTML indexado
+        self.counts = None  # frecuencias crudas por fila (solo modo incremental)
+        # una fila de la matriz por pasaje: (sección, inicio, fin); None = índice viejo, una fila por sección
+        self.passages: Optional[np.ndarray] = None
+        self._row_sections: Optional[np.ndarray] = None
+        self._headings: Optional[HeadingIndex] = None
+        self._headings_loader = None  # lee los encabezados de la generación en disco al primer uso
+
+    @property
+    def headings(self) -> HeadingIndex:
+        """Autocompletado de encabezados; viene del disco o se arma una vez por generación."""
+        if self._headings is None:
+            loaded = self._headings_loader() if self._headings_loader is not None else None
+            self._headings = loaded if loaded is not None else HeadingIndex.build(self.sections)
+        return self._headings
+
+    @property
+    def matrix(self):
+        if self._matrix is None and self._postings is not None:
+            self._matrix = self._postings.T.tocsr()
+        return self._matrix
+
+    @matrix.setter
+    def matrix(self, value):
+        self._matrix = value
+        self._postings = None  # se recalcula en la próxima búsqueda
+
+    @property
+    def postings(self) -> sp.csr_matrix:
+        """Matriz transpuesta (término x sección) en CSR: un índice invertido."""
+        if self._postings is None:
+            self._postings = self._matrix.T.tocsr()
+        return self._postings
+
+    def _has_matrix(self) -> bool:
+        return self._matrix is not None or self._postings is not None
 
-    def fit(self, sections: List[Dict[str,Any]]):
+    @property
+    def incremental(self) -> bool:
+        return isinstance(self.vectorizer, HashingTfidf) and self.counts is not None
+
+    @property
+    def ranker(self) -> Ranker:
+        return ranker_of(self.vectorizer)
+
+    def fit(self, sections: List[Dict[str,Any]], mode: Optional[str] = None, ranker: Optional[str] = None):
         self.sections = [s for s in sections if s.get("content")]
-        corpus = [s["content"][:20000] for s in self.sections]  # corpus más grande
+        self._headings = self._headings_loader = None
+        corpus, self.passages = chunk_sections(self.sections)
+        self._row_sections = None
+        rk = get_ranker(ranker)
+        # el modo full (vocabulario exacto) solo existe para tfidf; bm25 siempre trabaja sobre frecuencias
+        if (mode or INDEX_MODE) == "incremental" or rk.name != "tfidf":
+            self.vectorizer = rk.vectorizer()
+            self.counts = self.vectorizer.counts(corpus, keys=[content_id(t) for t in corpus])
+            self.vectorizer.add_docs(self.counts)
+            self.matrix = self.vectorizer.weight(self.counts)
+            return
         self.vectorizer = TfidfVectorizer(ngram_range=(1,2), max_df=0.9, min_df=1, stop_words="english")
         self.matrix = self.vectorizer.fit_transform(corpus)
+        self.counts = None
+
+    def update_pages(self, sections: List[Dict[str,Any]], changed: List[str], removed: List[str]):
+        """
+        Actualiza un índice incremental: quita las filas de las páginas cambiadas o eliminadas
+        y vectoriza solo `sections` (las de las páginas cambiadas/nuevas).
+        """
+        drop = set(changed) | set(removed)
+        keep = [i for i, s in enumerate(self.sections) if s["url"] not in drop]
+        new_sections = [s for s in sections if s.get("content")]
+        kept = np.isin(self.passages[:, 0], keep)
+        keep_rows, gone_rows = np.flatnonzero(kept), np.flatnonzero(~kept)
+        if gone_rows.size:
+            self.vectorizer.remove_docs(self.counts[gone_rows])
+        corpus, new_passages = chunk_sections(new_sections)
+        new_counts = self.vectorizer.counts(corpus, keys=[content_id(t) for t in corpus])
+        self.vectorizer.add_docs(new_counts)
+        self.counts = sp.vstack([self.counts[keep_rows], new_counts], format="csr")
+        # las secciones que quedan se renumeran 0..len(keep)-1 y las nuevas van detrás
+        renumber = np.full(len(self.sections), -1, dtype=np.int64)
+        renumber[keep] = np.arange(len(keep))
+        old = np.array(self.passages[keep_rows])
+        old[:, 0] = renumber[old[:, 0]]
+        new_passages[:, 0] += len(keep)
+        self.passages = np.vstack([old, new_passages])
+        self._row_sections = None
+        self.sections = [self.sections[i] for i in keep] + new_sections
+        self._headings = self._headings_loader = None
+        # el idf cambió: re-ponderar es una pasada lineal sobre nnz, sin tokenizar nada
+        self.matrix = self.vectorizer.weight(self.counts)
+
+    def row_sections(self) -> np.ndarray:
+        """Sección de cada fila de la matriz (en memoria: se indexa en cada consulta)."""
+        if self.passages is None:
+            return np.arange(len(self.sections))
+        if self._row_sections is None:
+            self._row_sections = np.array(self.passages[:, 0])
+        return self._row_sections
+
+    def hit(self, row: int) -> Dict[str,Any]:
+        """La sección de una fila, con el pasaje como fragmento listo para mostrar."""
+        if self.passages is None:
+            return self.sections[row]
+        p = self.passages
+        sec = self.sections[p.item(row, 0)]
+        start, end = p.item(row, 1), p.item(row, 2)
+        return {**sec, "snippet": sec["content"][start:end]}
+
+    def _rank(self, rows: np.ndarray, vals: np.ndarray, top_k: int) -> List[Tuple[float, Dict[str,Any]]]:
+        """Las top_k secciones por su mejor pasaje."""
+        if self.passages is None:
+            order = top_k_indices(vals, top_k)
+        else:
+            order = best_per_group(self.row_sections()[rows], vals, top_k)
+        return [(float(vals[i]), self.hit(int(rows[i]))) for i in order]
 
     def search(self, query: str, top_k: int = 5) -> List[Tuple[float, Dict[str,Any]]]:
-        if not self.sections or self.matrix is None:
+        if not self.sections or not self._has_matrix():
+            return []
+        with METRICS.time("transform"):
+            qvec = self.vectorizer.transform([query]).tocsr()
+        with METRICS.time("score"):
+            sims = self.scores(qvec)
+        with METRICS.time("topk"):
+            rows = np.flatnonzero(sims)
+            return self._rank(rows, sims[rows], top_k)
+
+    def search_many(self, queries: List[str], top_k: int = 5) -> List[List[Tuple[float, Dict[str,Any]]]]:
+        if not queries:
             return []
-        qvec = self.vectorizer.transform([query])
-        sims = linear_kernel(qvec, self.matrix).flatten()
-        ranked_idx = sims.argsort()[::-1][:top_k]
-        return [(float(sims[i]), self.sections[i]) for i in ranked_idx]
+        if not self.sections or not self._has_matrix():
+            return [[] for _ in queries]
+        with METRICS.time("transform"):
+            qmat = self.vectorizer.transform(queries).tocsr()
+        # (consultas x términos) @ (términos x secciones): un solo producto para todo el lote
+        with METRICS.time("score"):
+            sims = (qmat @ self.postings).tocsr()
+        out = []
+        with METRICS.time("topk"):
+            for r in range(sims.shape[0]):
+                lo, hi = sims.indptr[r], sims.indptr[r + 1]
+                # solo los pasajes con puntaje > 0; el resto nunca supera el umbral
+                out.append(self._rank(sims.indices[lo:hi], sims.data[lo:hi], top_k))
+        return out
+
+    def scores(self, qvec: sp.csr_matrix) -> np.ndarray:
+        """
+        Producto punto con el índice invertido: solo se leen las filas de `postings`
+        de los términos presentes en la consulta (equivale a linear_kernel con la matriz completa).
+        """
+        if qvec.nnz == 0:
+            return np.zeros(self.postings.shape[1])
+        return self.postings[qvec.indices].T.dot(qvec.data)
+
+    def copy(self) -> "QAIndex":
+        """Copia independiente para actualizar sin tocar el índice que están leyendo otros hilos."""
+        clone = copy.copy(self)
+        clone.vectorizer = copy.deepcopy(self.vectorizer)
+        return clone
 
     def save(self):
-        joblib.dump({
-            "version": self.version,
-            "sections": self.sections,
-            "vectorizer": self.vectorizer,
-            "matrix": self.matrix
-        }, INDEX_DIR / f"{self.version}.joblib")
+        # nueva generación en un directorio aparte; CURRENT se reemplaza atómicamente,
+        # así otros procesos ven el índice viejo o el nuevo, nunca uno a medias
+        pointer = write_index(INDEX_DIR / self.version, version=self.version, sections=list(self.sections),
+                              postings=self.postings, vectorizer=self.vectorizer, counts=self.counts,
+                              page_hashes=self.page_hashes, headings=self.headings, passages=self.passages)
+        self.generation = pointer.stat().st_mtime_ns
+        legacy = _legacy_path(self.version)
+        if legacy.exists():
+            try: legacy.unlink()
+            except OSError: pass
 
     @staticmethod
     def load(version: str):
-        path = INDEX_DIR / f"{version}.joblib"
+        path = index_path(version)
         if not path.exists():
             return None
+        generation = path.stat().st_mtime_ns
+        if path.suffix == ".joblib":
+            return QAIndex._load_legacy(version, path, generation)
+        obj = read_index(INDEX_DIR / version)
+        if obj is None:
+            return None
+        qi = QAIndex(version=obj["version"])
+        qi.sections = obj["sections"]  # SectionStore: se decodifica bajo demanda desde el mmap
+        qi.vectorizer = obj["vectorizer"]
+        qi._postings = obj["postings"]
+        qi.page_hashes = obj["page_hashes"]
+        qi.counts = obj["counts"]
+        qi._headings_loader = obj["headings"]
+        qi.passages = obj["passages"]
+        qi.generation = generation
+        return qi
+
+    @staticmethod
+    def _load_legacy(version: str, path: Path, generation: int):
+        """Índices guardados con joblib antes del formato en directorio."""
         obj = joblib.load(path)
         qi = QAIndex(version=obj["version"])
         qi.sections = obj["sections"]
         qi.vectorizer = obj["vectorizer"]
         qi.matrix = obj["matrix"]
+        qi.page_hashes = obj.get("page_hashes", {})
+        qi.counts = obj.get("counts")
+        qi.generation = generation
         return qi
 
-def ensure_index(version: str, force: bool=False) -> QAIndex:
-    qi = None if force else QAIndex.load(version)
-    if qi is not None and not force:
+def _legacy_path(version: str) -> Path:
+    return INDEX_DIR / f"{version}.joblib"
+
+def index_path(version: str) -> Path:
+    """Archivo cuya mtime marca la generación del índice: CURRENT, o el .joblib heredado."""
+    current = current_path(INDEX_DIR / version)
+    legacy = _legacy_path(version)
+    if not current.exists() and legacy.exists():
+        return legacy
+    return current
+
+def _disk_generation(version: str) -> Optional[int]:
+    try:
+        return index_path(version).stat().st_mtime_ns
+    except OSError:
+        return None
+
+class IndexRegistry:
+    """
+    Mantiene un QAIndex cargado por versión para todo el proceso.
+    Solo vuelve a leer el .joblib cuando cambia su mtime en disco.
+    """
+    def __init__(self):
+        self._indexes: Dict[str, QAIndex] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    def _lock_for(self, version: str) -> threading.Lock:
+        with self._guard:
+            lock = self._locks.get(version)
+            if lock is None:
+                lock = self._locks[version] = threading.Lock()
+            return lock
+
+    def _count(self, counter: str):
+        # += no es atómico entre hilos: varios requests cuentan hits a la vez
+        with self._guard:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _current(self, version: str) -> Optional[QAIndex]:
+        qi = self._indexes.get(version)
+        if qi is not None and qi.generation == _disk_generation(version):
+            return qi
+        return None
+
+    def get(self, version: str, build=None, force: bool = False, block: bool = True) -> Optional[QAIndex]:
+        """
+        Devuelve el índice residente. Si no está o cambió en disco se recarga;
+        `build` (opcional) construye uno nuevo cuando no hay archivo o force=True.
+        Con block=False, si otro hilo está cargando/construyendo se devuelve el índice
+        que haya en memoria (aunque esté viejo) o None, sin esperar.
+        """
+        qi = None if force else self._current(version)
+        if qi is not None:
+            self._count("hits")
+            return qi
+        lock = self._lock_for(version)
+        if not lock.acquire(blocking=block):
+            return self._indexes.get(version)
+        # un solo hilo carga/construye cada versión; los demás esperan y reutilizan
+        try:
+            qi = None if force else self._current(version)
+            if qi is not None:
+                self._count("hits")
+                return qi
+            self._count("misses")
+            stale = version in self._indexes
+            qi = None if force else QAIndex.load(version)
+            if qi is None and build is not None:
+                qi = build(version, force, self._indexes.get(version))
+            if qi is None:
+                self._indexes.pop(version, None)
+                return None
+            if stale:
+                self._count("reloads")
+            self._indexes[version] = qi
+            return qi
+        finally:
+            lock.release()
+
+    def peek(self, version: str) -> Optional[QAIndex]:
+        return self._indexes.get(version)
+
+    def evict(self, version: Optional[str] = None):
+        with self._guard:
+            if version is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(version, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._guard:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+                "loaded": {v: qi.generation for v, qi in self._indexes.items()},
+            }
+
+REGISTRY = IndexRegistry()
+
+def _build_index(version: str, force: bool, previous: Optional[QAIndex] = None) -> QAIndex:
+    if previous is None and force:
+        previous = QAIndex.load(version)
+    if previous is not None and (previous.passages is None or previous.ranker is not get_ranker()):
+        previous = None  # índice de antes de los pasajes o de otro ranker: se rearma completo una vez
+    incremental = previous is not None and previous.incremental and INDEX_MODE == "incremental"
+    data = build_index_for_version(version, force=force,
+                                   known_hashes=previous.page_hashes if incremental else None)
+    hashes = data.get("hashes", {})
+    # revalidación sin cambios (todo 304 / mismo hash): no hace falta re-vectorizar
+    if previous is not None and hashes and previous.page_hashes == hashes:
+        return previous
+    if incremental:
+        # páginas que fallaron al descargar se conservan tal cual
+        kept = {u: h for u, h in previous.page_hashes.items() if u in data.get("failed", [])}
+        page_hashes = {**kept, **hashes}
+        changed = [u for u, h in hashes.items() if previous.page_hashes.get(u) != h]
+        removed = [u for u in previous.page_hashes if u not in page_hashes]
+        if not changed and not removed:
+            return previous
+        qi = previous.copy()
+        qi.update_pages(data["sections"], changed=changed, removed=removed)
+        qi.page_hashes = page_hashes
+        qi.save()
         return qi
-    data = build_index_for_version(version, force=force)
     qi = QAIndex(version)
     qi.fit(data["sections"])
+    qi.page_hashes = hashes
     qi.save()
     return qi
 
-def answer_question(query: str, version: str, top_k: int = 5) -> Dict[str, Any]:
-    qi = ensure_index(version, force=False)
-    matches = qi.search(query, top_k=top_k)
-    if not matches:
-        return {
-            "answer": "I couldn’t find this in the official Relativity release notes. Please provide your contact information so our team can follow up.",
-            "citations": [],
-            "confidence": 0.0,
-            "should_collect_contact": True
-        }
+def ensure_index(version: str, force: bool=False) -> QAIndex:
+    return REGISTRY.get(version, build=_build_index, force=force)
+
+def get_index(version: str) -> Optional[QAIndex]:
+    """
+    Para requests: nunca espera a un warmup/reindex en curso.
+    Sirve el índice en memoria o en disco; None si la versión aún no tiene índice.
+    """
+    with METRICS.time("index"):
+        if not index_path(version).exists():
+            return REGISTRY.peek(version)
+        return REGISTRY.get(version, block=False)
+
+def index_status(version: str) -> Dict[str, Any]:
+    qi = REGISTRY.peek(version)
+    gen = _disk_generation(version)
+    return {
+        "on_disk": gen is not None,
+        "loaded": qi is not None,
+        "age_seconds": round(time.time() - gen / 1e9, 1) if gen is not None else None,
+        "sections": len(qi.sections) if qi is not None else None,
+    }
+
+def registry_stats() -> Dict[str, Any]:
+    return REGISTRY.stats()
+
+def indexed_versions() -> List[str]:
+    """Versiones con índice en disco (formato en directorio o .joblib heredado)."""
+    dirs = [p.name for p in INDEX_DIR.iterdir()
+            if p.is_dir() and not p.name.startswith("_") and (p / "CURRENT").exists()]
+    legacy = [p.stem for p in INDEX_DIR.glob("*.joblib")]
+    return sorted(set(dirs + legacy))
+
+def gc_content() -> bool:
+    """
+    Compacta el almacén de contenido compartido con los ids que usan todas las generaciones de índice
+    conservadas en disco (otro worker puede seguir en la anterior).
+    """
+    live, pinned = set(), set()
+    for v in indexed_versions():
+        vdir = INDEX_DIR / v
+        if vdir.is_dir():
+            cids, gens = generation_refs(vdir)
+            live |= cids
+            pinned |= gens
+    return get_store().gc(live, pinned=None if None in pinned else pinned)
+
+class UnifiedIndex:
+    """
+    Todas las versiones en una sola matriz (espacio HashingTfidf común) con una faceta de versión
+    por fila. Filtrar o dar peso a una versión es multiplicar los puntajes por un vector indexado
+    por la faceta: una consulta sigue siendo un solo producto disperso, no uno por versión.
+    """
+    def __init__(self, parts: List[QAIndex]):
+        self.parts = parts
+        self.versions = [qi.version for qi in parts]
+        self.generation = tuple((qi.version, qi.generation) for qi in parts)
+        self.vectorizer = get_ranker().vectorizer()
+        self.ranker = ranker_of(self.vectorizer)
+        blocks = [self._counts(qi) for qi in parts]
+        self.offsets = np.cumsum([0] + [b.shape[0] for b in blocks])
+        self.facet = np.concatenate([np.full(b.shape[0], i, dtype=np.int32) for i, b in enumerate(blocks)]) \
+            if blocks else np.zeros(0, dtype=np.int32)
+        # (versión, sección) de cada fila en un int64, para quedarse con el mejor pasaje de cada sección
+        self.row_group = np.concatenate([(np.int64(i) << 32) | qi.row_sections() for i, qi in enumerate(parts)]) \
+            if parts else np.zeros(0, dtype=np.int64)
+        counts = sp.vstack(blocks, format="csr") if blocks else sp.csr_matrix((0, self.vectorizer.n_features))
+        # idf global: un término común en una sola versión no pesa igual que uno común en todas
+        self.vectorizer.add_docs(counts)
+        self.postings = self.vectorizer.weight(counts).T.tocsr()
+
+    def _counts(self, qi: QAIndex) -> sp.csr_matrix:
+        if qi.incremental and qi.vectorizer.n_features == self.vectorizer.n_features:
+            return qi.counts
+        # índices en modo full tienen su propio vocabulario: se re-cuentan (cache por id de contenido)
+        if qi.passages is None:
+            corpus = [s["content"][:20000] for s in qi.sections]
+        else:
+            contents = [s["content"] for s in qi.sections]
+            corpus = [contents[int(i)][int(a):int(b)] for i, a, b in qi.passages]
+        return self.vectorizer.counts(corpus, keys=[content_id(t) for t in corpus])
 
+    def _section(self, row: int) -> Tuple[str, Dict[str, Any]]:
+        vi = int(self.facet[row])
+        return self.versions[vi], self.parts[vi].hit(row - int(self.offsets[vi]))
+
+    def _weights(self, versions: Optional[List[str]], boosts: Optional[Dict[str, float]]) -> np.ndarray:
+        w = np.array([1.0 if versions is None or v in versions else 0.0 for v in self.versions])
+        for v, b in (boosts or {}).items():
+            if v in self.versions:
+                w[self.versions.index(v)] *= float(b)
+        return w
+
+    def search_many(self, queries: List[str], top_k: int = 5, versions: Optional[List[str]] = None,
+                    boosts: Optional[Dict[str, float]] = None) -> List[List[Tuple[float, Dict[str, Any]]]]:
+        if not queries:
+            return []
+        if not self.facet.size:
+            return [[] for _ in queries]
+        with METRICS.time("transform"):
+            qmat = self.vectorizer.transform(queries).tocsr()
+        with METRICS.time("score"):
+            sims = (qmat @ self.postings).tocsr()
+            sims.data *= self._weights(versions, boosts)[self.facet[sims.indices]]
+        out = []
+        with METRICS.time("topk"):
+            for r in range(sims.shape[0]):
+                lo, hi = sims.indptr[r], sims.indptr[r + 1]
+                cols, vals = sims.indices[lo:hi], sims.data[lo:hi]
+                # candidatos de sobra: la misma sección en varias versiones se junta en un solo resultado
+                best = best_per_group(self.row_group[cols], vals, top_k * len(self.versions))
+                order = [i for i in best if vals[i] > 0]
+                out.append(self._collapse([(float(vals[i]), int(cols[i])) for i in order], top_k))
+        return out
+
+    def search(self, query: str, top_k: int = 5, versions: Optional[List[str]] = None,
+               boosts: Optional[Dict[str, float]] = None) -> List[Tuple[float, Dict[str, Any]]]:
+        return self.search_many([query], top_k=top_k, versions=versions, boosts=boosts)[0]
+
+    def _collapse(self, ranked: List[Tuple[float, int]], top_k: int) -> List[Tuple[float, Dict[str, Any]]]:
+        """Agrupa por contenido canónico (igual o casi igual): queda el mejor puntaje y la lista de versiones."""
+        store = get_store()
+        groups: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        for score, row in ranked:
+            version, sec = self._section(row)
+            cid = sec.get("cid")
+            key = store.canonical(cid) if cid else content_id(sec["content"])
+            if key in groups:
+                if version not in groups[key][1]["versions"]:
+                    groups[key][1]["versions"].append(version)
+            elif len(groups) < top_k:
+                groups[key] = (score, {**sec, "version": version, "versions": [version]})
+        return list(groups.values())
+
+_UNIFIED: Optional[UnifiedIndex] = None
+_UNIFIED_LOCK = threading.Lock()
+
+def get_unified_index(block: bool = False) -> Optional[UnifiedIndex]:
+    """
+    Índice combinado de todas las versiones cargadas; se reconstruye cuando cambia la generación
+    de alguna. Como get_index, sin block no espera a otro hilo que lo esté reconstruyendo.
+    """
+    global _UNIFIED
+    parts = [qi for qi in (get_index(v) for v in all_versions()) if qi is not None and len(qi.sections)]
+    if not parts:
+        return None
+    generation = tuple((qi.version, qi.generation) for qi in parts)
+    if _UNIFIED is not None and _UNIFIED.generation == generation:
+        return _UNIFIED
+    if not _UNIFIED_LOCK.acquire(blocking=block):
+        return _UNIFIED
+    try:
+        if _UNIFIED is None or _UNIFIED.generation != generation:
+            with METRICS.time("unified_build"):
+                _UNIFIED = UnifiedIndex(parts)
+        return _UNIFIED
+    finally:
+        _UNIFIED_LOCK.release()
+
+def preload_indexes(versions: List[str]) -> Dict[str, Any]:
+    """
+    Carga en este proceso todo lo que leen los requests: índices en disco, sus encabezados y el
+    índice combinado, con una búsqueda de prueba para tocar lo que se arma en la primera consulta.
+    Pensado para el maestro de gunicorn antes del fork (los workers heredan las páginas); no
+    construye índices que falten ni arranca hilos.
+    """
+    t0 = time.perf_counter()
+    loaded = {}
+    for v in versions:
+        if not index_path(v).exists():
+            continue
+        qi = REGISTRY.get(v)
+        if qi is None:
+            continue
+        qi.search("warmup", 1)  # postings, filas por sección, vectorizador
+        qi.headings  # se lee del disco al primer acceso
+        loaded[v] = len(qi.sections)
+    unified = get_unified_index(block=True) if loaded else None
+    if unified is not None:
+        unified.search("warmup", 1)
+    # lo cargado vive todo el proceso: fuera del GC, que si no lo recorre y en cada worker
+    # escribe los encabezados de los objetos (copy-on-write de páginas que eran compartidas)
+    gc.collect()
+    gc.freeze()
+    return {"versions": loaded, "unified": unified is not None, "seconds": round(time.perf_counter() - t0, 2)}
+
+def _version_scope(version: Union[str, List[str]]) -> Optional[List[str]]:
+    """None si es una sola versión; "*" -> todas (lista vacía = sin filtro); lista -> esas versiones."""
+    if isinstance(version, str):
+        return [] if version.strip() == "*" else None
+    return [v for v in version if v != "*"] if "*" not in version else []
+
+_WARMING_UP = {
+    "answer": "The release notes for this version are still being indexed. Please try again in a moment.",
+    "citations": [],
+    "confidence": 0.0,
+    "should_collect_contact": False,
+    "warming_up": True
+}
+
+_NOT_FOUND = "I couldn’t find this in the official Relativity release notes. Please provide your contact information so our team can follow up."
+_ANSWER_HEADER = "Here’s what the Relativity release notes say:\n\n"
+def _answer_meta(matches: List[Tuple[float, Dict[str,Any]]], ranker: Ranker) -> Dict[str, Any]:
+    """Todo lo que no depende del texto: citas, confianza y si hay que pedir contacto (umbrales del ranker)."""
+    if not matches:
+        return {"citations": [], "confidence": 0.0, "should_collect_contact": True}
     best_score = matches[0][0]
-    snippets = []
     citations = []
     for score, sec in matches:
-        if score < 0.08:
+        if score < ranker.min_snippet_score:
             continue
-        short = _trim_complete(sec["content"], limit=1400)  # ✅ sin '...'
-        # poner cada sección en viñeta
-        snippets.append(f"— {short}")
-        citations.append({"title": f'{sec.get("title","")}: {sec.get("heading","")}', "url": sec["url"], "score": score})
-
-    if not snippets:
-        return {
-            "answer": "I couldn’t find this in the official Relativity release notes. Please provide your contact information so our team can follow up.",
-            "citations": [],
-            "confidence": float(best_score),
-            "should_collect_contact": True
-        }
-
-    answer_text = "Here’s what the Relativity release notes say:\n\n" + "\n\n".join(snippets)
-    should_collect = best_score < 0.18
+        cite = {"title": f'{sec.get("title","")}: {sec.get("heading","")}', "url": sec["url"], "score": score}
+        if "versions" in sec:
+            cite["versions"] = sec["versions"]
+        citations.append(cite)
     return {
-        "answer": answer_text,
         "citations": citations[:3],
         "confidence": float(best_score),
-        "should_collect_contact": should_collect
+        "should_collect_contact": not citations or best_score < ranker.collect_contact_below
     }
 
+def _iter_answer(matches: List[Tuple[float, Dict[str,Any]]], ranker: Ranker) -> Iterator[str]:
+    """Texto de la respuesta en fragmentos: el encabezado y luego cada sección ya recortada."""
+    first = True
+    for score, sec in matches:
+        if score < ranker.min_snippet_score:
+            continue
+        # pasaje precalculado; índices viejos (sin pasajes) recortan al vuelo
+        short = sec.get("snippet") or _trim_complete(sec["content"], limit=1400)  # ✅ sin '...'
+        # poner cada sección en viñeta
+        yield (_ANSWER_HEADER if first else "\n\n") + f"— {short}"
+        first = False
+    if first:
+        yield _NOT_FOUND
+
+def _compose_answer(matches: List[Tuple[float, Dict[str,Any]]], ranker: Ranker) -> Dict[str, Any]:
+    with METRICS.time("compose"):
+        return {"answer": "".join(_iter_answer(matches, ranker)), **_answer_meta(matches, ranker)}
+
+def normalize_query(query: str) -> str:
+    """
+    Minúsculas, sin puntuación y con espacios colapsados. El vectorizador ignora
+    esas diferencias, así que consultas con la misma forma normalizada dan la misma respuesta.
+    """
+    return " ".join(re.sub(r"[^\w]+", " ", query.lower()).split())
+
+def _answer_size(result: Dict[str, Any]) -> int:
+    return len(result["answer"]) + sum(len(c["title"]) + len(c["url"]) + 16 for c in result["citations"])
+
+class AnswerCache:
+    """
+    Cache LRU con TTL de respuestas. La clave incluye la generación del índice,
+    así que un reindex deja las entradas viejas inalcanzables (y el LRU las expulsa).
+    El tamaño se limita por número de entradas y por bytes aproximados de texto.
+    """
+    def __init__(self, max_entries: int = 2048, ttl: float = 3600, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[tuple, tuple]" = OrderedDict()  # key -> (expira, bytes, resultado)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(query: str, version: Any, top_k: int, generation: Any) -> tuple:
+        return (normalize_query(query), version, top_k, generation)
+
+    def get(self, key: tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return dict(item[2])
+
+    def put(self, key: tuple, result: Dict[str, Any]):
+        if self.max_entries <= 0:
+            return
+        size = _answer_size(result)
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (time.monotonic() + self.ttl, size, dict(result))
+            self._bytes += size
+            while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+                self._drop(next(iter(self._data)))
+
+    def _drop(self, key: tuple):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._data), "bytes": self._bytes,
+                "max_entries": self.max_entries, "max_bytes": self.max_bytes, "ttl": self.ttl}
+
+ANSWER_CACHE = AnswerCache(
+    max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("ANSWER_CACHE_TTL", "3600")),
+    max_bytes=int(os.getenv("ANSWER_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+)
+
+def answer_cache_stats() -> Dict[str, Any]:
+    return ANSWER_CACHE.stats()
+
+def _scope_key(scope: List[str], boosts: Optional[Dict[str, float]]) -> tuple:
+    return ("*", tuple(sorted(scope)), tuple(sorted((boosts or {}).items())))
+
+def answer_question(query: str, version: Union[str, List[str]], top_k: int = 5,
+                    boosts: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """`version` puede ser una versión, "*" (todas) o una lista; `boosts` pondera versiones en modo combinado."""
+    scope = _version_scope(version)
+    if scope is not None:
+        return answer_questions([query], version, top_k=top_k, boosts=boosts)[0]
+    qi = get_index(version)
+    if qi is None:
+        METRICS.inc("qa_answers_total", source="warming_up")
+        return dict(_WARMING_UP)
+    key = AnswerCache.key(query, version, top_k, qi.generation)
+    result = ANSWER_CACHE.get(key)
+    source = "cache"
+    if result is None:
+        source = "search"
+        result = _compose_answer(qi.search(query, top_k=top_k), qi.ranker)
+        ANSWER_CACHE.put(key, result)
+    METRICS.inc("qa_answers_total", source=source)
+    return result
+
+def _resolve(version: Union[str, List[str]], boosts: Optional[Dict[str, float]]):
+    """(índice, versión para la clave del cache, alcance) para una versión, "*" o una lista."""
+    scope = _version_scope(version)
+    if scope is None:
+        return get_index(version), version, None
+    return get_unified_index(), _scope_key(scope, boosts), scope
+
+def _search_many(qi, queries: List[str], top_k: int, scope: Optional[List[str]],
+                 boosts: Optional[Dict[str, float]]) -> List[List[Tuple[float, Dict[str, Any]]]]:
+    if scope is None:
+        return qi.search_many(queries, top_k=top_k)
+    return qi.search_many(queries, top_k=top_k, versions=scope or None, boosts=boosts)
+
+def answer_questions(queries: List[str], version: Union[str, List[str]], top_k: int = 5,
+                     boosts: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+    """
+    Igual que answer_question para muchas consultas a la vez: un solo transform
+    y un solo producto disperso para las que no están en cache.
+    """
+    qi, cache_version, scope = _resolve(version, boosts)
+    if qi is None:
+        METRICS.inc("qa_answers_total", len(queries), source="warming_up")
+        return [dict(_WARMING_UP) for _ in queries]
+    keys = [AnswerCache.key(q, cache_version, top_k, qi.generation) for q in queries]
+    results = [ANSWER_CACHE.get(k) for k in keys]
+    pending = [i for i, r in enumerate(results) if r is None]
+    METRICS.inc("qa_answers_total", len(queries) - len(pending), source="cache")
+    METRICS.inc("qa_answers_total", len(pending), source="search")
+    if pending:
+        matches = _search_many(qi, [queries[i] for i in pending], top_k, scope, boosts)
+        for i, m in zip(pending, matches):
+            results[i] = _compose_answer(m, qi.ranker)
+            ANSWER_CACHE.put(keys[i], results[i])
+    return results
+
+def answer_stream(query: str, version: Union[str, List[str]], top_k: int = 5,
+                  boosts: Optional[Dict[str, float]] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Versión incremental de answer_question. Produce eventos (tipo, datos):
+    "meta" con citas y confianza apenas termina la búsqueda, "chunk" por cada fragmento
+    del texto a medida que se recorta, y "done" con la respuesta completa (igual a answer_question).
+    """
+    qi, cache_version, scope = _resolve(version, boosts)
+    if qi is None:
+        METRICS.inc("qa_answers_total", source="warming_up")
+        result = dict(_WARMING_UP)
+        yield "meta", {k: v for k, v in result.items() if k != "answer"}
+        yield "chunk", {"text": result["answer"]}
+        yield "done", result
+        return
+    key = AnswerCache.key(query, cache_version, top_k, qi.generation)
+    result = ANSWER_CACHE.get(key)
+    if result is not None:
+        METRICS.inc("qa_answers_total", source="cache")
+        yield "meta", {k: v for k, v in result.items() if k != "answer"}
+        yield "chunk", {"text": result["answer"]}
+        yield "done", result
+        return
+    METRICS.inc("qa_answers_total", source="search")
+    matches = _search_many(qi, [query], top_k, scope, boosts)[0]
+    yield "meta", _answer_meta(matches, qi.ranker)
+    parts = []
+    for text in _iter_answer(matches, qi.ranker):
+        parts.append(text)
+        yield "chunk", {"text": text}
+    result = {"answer": "".join(parts), **_answer_meta(matches, qi.ranker)}
+    ANSWER_CACHE.put(key, result)
+    yield "done", result
+
+SECTIONS_LIST_MAX = 500
+
+def section_index(version: str) -> Tuple[Optional[HeadingIndex], Optional[str]]:
+    """Índice de encabezados de la versión y su ETag (cambia con la generación del índice)."""
+    qi = get_index(version)
+    if qi is None:
+        return None, None
+    return qi.headings, f"{qi.version}-{qi.generation}"
+
 def list_sections(version: str) -> List[Dict[str,Any]]:
-    qi = ensure_index(version, force=False)
-    seen = set()
-    out = []
-    for s in qi.sections:
-        h = s.get("heading","").strip()
-        if h and h not in seen:
-            out.append({"heading": h, "url": s["url"]})
-            seen.add(h)
-    return out[:500]
+    hx, _ = section_index(version)
+    return hx.top(SECTIONS_LIST_MAX) if hx is not None else []
+
+def _metrics_collector():
+    reg = REGISTRY.stats()
+    yield "qa_index_registry_total", "counter", {"result": "hit"}, reg["hits"]
+    yield "qa_index_registry_total", "counter", {"result": "miss"}, reg["misses"]
+    yield "qa_index_reloads_total", "counter", {}, reg["reloads"]
+    yield "qa_indexes_loaded", "gauge", {}, len(reg["loaded"])
+    cache = ANSWER_CACHE.stats()
+    yield "qa_answer_cache_total", "counter", {"result": "hit"}, cache["hits"]
+    yield "qa_answer_cache_total", "counter", {"result": "miss"}, cache["misses"]
+    yield "qa_answer_cache_entries", "gauge", {}, cache["entries"]
+    yield "qa_answer_cache_bytes", "gauge", {}, cache["bytes"]
+
+METRICS.add_collector(_metrics_collector)
+METRICS.describe("qa_answers_total", "Answers by source: cache, search or warming_up")
+METRICS.describe("qa_index_registry_total", "Index registry lookups (miss = load or build)")
+METRICS.describe("qa_index_reloads_total", "Indexes reloaded after a newer generation appeared on disk")
+METRICS.describe("qa_indexes_loaded", "Versions with an index resident in this process")
+METRICS.describe("qa_answer_cache_total", "Answer cache lookups")
+METRICS.describe("qa_answer_cache_entries", "Entries in the answer cache")
+METRICS.describe("qa_answer_cache_bytes", "Approximate bytes held by the answer cache")
@@ -0,0 +1,57 @@
+"""
+Rankers: cómo se pesan las filas del índice y qué umbrales de confianza corresponden a sus puntajes.
+
+Todos usan el mismo contrato de vectorizador (counts / add_docs / remove_docs / weight / transform),
+así que QAIndex, las actualizaciones incrementales y el índice combinado no cambian: puntuar es
+siempre un producto disperso consulta x postings.
+
+    tfidf   coseno TF-IDF (HashingTfidf; TfidfVectorizer si QA_INDEX_MODE=full)
+    bm25    pesos BM25 precalculados por (pasaje, término); puntaje normalizado a [0, 1)
+
+Los umbrales de cada ranker salen de benchmarks/eval_rankers.py y se pueden ajustar con
+QA_THRESHOLDS_<RANKER>="min_snippet,collect_below" (p. ej. QA_THRESHOLDS_BM25=0.2,0.35).
+"""
+import os
+from typing import Callable, Dict, Optional
+
+from .incremental import HashingBm25, HashingTfidf
+
+QA_RANKER = os.getenv("QA_RANKER", "tfidf").strip().lower()
+
+class Ranker:
+    """
+    min_snippet_score: por debajo, la sección no entra en la respuesta ni en las citas.
+    collect_contact_below: si el mejor puntaje no llega, se pide el contacto del usuario.
+    """
+    def __init__(self, name: str, factory: Callable[[], HashingTfidf],
+                 min_snippet_score: float, collect_contact_below: float):
+        self.name = name
+        self.factory = factory
+        override = os.getenv(f"QA_THRESHOLDS_{name.upper()}", "").strip()
+        if override:
+            min_snippet_score, collect_contact_below = (float(x) for x in override.split(","))
+        self.min_snippet_score = min_snippet_score
+        self.collect_contact_below = collect_contact_below
+
+    def vectorizer(self) -> HashingTfidf:
+        return self.factory()
+
+    def __repr__(self) -> str:
+        return f"Ranker({self.name!r}, min={self.min_snippet_score}, collect<{self.collect_contact_below})"
+
+RANKERS: Dict[str, Ranker] = {
+    "tfidf": Ranker("tfidf", HashingTfidf, min_snippet_score=0.08, collect_contact_below=0.18),
+    # salida "calibrated" de benchmarks/eval_rankers.py (--sections 1000/3000/5000: collect_below
+    # 0.100-0.124, exactitud balanceada 0.975-0.99); se toma el menor. Recalibrar con preguntas reales
+    "bm25": Ranker("bm25", HashingBm25, min_snippet_score=0.10, collect_contact_below=0.10),
+}
+
+def get_ranker(name: Optional[str] = None) -> Ranker:
+    name = (name or QA_RANKER).strip().lower()
+    if name not in RANKERS:
+        raise ValueError(f"unknown ranker {name!r}; expected one of {sorted(RANKERS)}")
+    return RANKERS[name]
+
+def ranker_of(vectorizer) -> Ranker:
+    """El ranker con el que se construyó un índice (los de modo full y los viejos son tfidf)."""
+    return RANKERS.get(getattr(vectorizer, "ranker", "tfidf"), RANKERS["tfidf"])
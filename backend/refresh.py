@@ -0,0 +1,161 @@
+import os
+import threading
+import multiprocessing
+import time
+import atexit
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .qa_engine import INDEX_DIR, REGISTRY, ensure_index, gc_content, get_unified_index, index_path, index_status
+from .scraper import fetch_cycle
+
+LOCK_FILE = INDEX_DIR / ".refresh.lock"
+
+def _now_iso():
+    return datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+
+class IndexRefresher(threading.Thread):
+    """
+    Refresco de índices en segundo plano. Al arrancar precarga lo que ya hay en disco,
+    construye las versiones que no tienen índice y luego revalida todo cada `interval` segundos.
+    Cada reindex se guarda con reemplazo atómico y el registro lo intercambia sin bloquear requests.
+    Solo un proceso a la vez hace el refresco (lock file); el resto recarga por mtime.
+    """
+    def __init__(self, versions: List[str], interval: float = 24 * 3600,
+                 refresh_on_start: bool = True, lock_stale_after: float = 3600):
+        super().__init__(name="index-refresher", daemon=True)
+        self.versions = list(versions)
+        self.interval = interval
+        self.refresh_on_start = refresh_on_start
+        self.lock_stale_after = lock_stale_after
+        self.status: Dict[str, Dict[str, Any]] = {v: {} for v in self.versions}
+        self._stop_event = threading.Event()
+        self._owns_lock = False
+
+    # ---- lock entre procesos (portable: O_EXCL, sin fcntl) ----
+    def _acquire_lock(self) -> bool:
+        try:
+            if LOCK_FILE.exists() and time.time() - LOCK_FILE.stat().st_mtime > self.lock_stale_after:
+                LOCK_FILE.unlink()
+            fd = os.open(LOCK_FILE, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except OSError:
+            return False
+        with os.fdopen(fd, "w") as f:
+            f.write(str(os.getpid()))
+        self._owns_lock = True
+        atexit.register(self._release_lock)
+        return True
+
+    def _lock_pid(self) -> Optional[int]:
+        try:
+            return int(LOCK_FILE.read_text(encoding="utf-8").strip())
+        except (OSError, ValueError):
+            return None
+
+    def _touch_lock(self):
+        # heartbeat: el mtime del lock es lo que ven los otros procesos para decidir si está vencido
+        if self._owns_lock:
+            if self._lock_pid() != os.getpid():
+                print("[refresh] refresh lock taken over by another process; stopping refresh here")
+                self._owns_lock = False
+                return
+            try: os.utime(LOCK_FILE, None)
+            except OSError: pass
+
+    def _release_lock(self):
+        if self._owns_lock:
+            # solo si sigue siendo nuestro: no borrar el lock de otro dueño
+            if self._lock_pid() == os.getpid():
+                try: LOCK_FILE.unlink()
+                except OSError: pass
+            self._owns_lock = False
+
+    def _idle(self, seconds: float) -> bool:
+        """Espera `seconds` renovando el lock en tramos menores que lock_stale_after; True si hay que parar."""
+        deadline = time.monotonic() + seconds
+        step = max(0.05, self.lock_stale_after / 4)
+        while True:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                return False
+            if self._stop_event.wait(min(step, left)):
+                return True
+            self._touch_lock()
+            if not self._owns_lock:
+                return True
+
+    # ---- ciclo ----
+    def _refresh(self, version: str, force: bool):
+        st = self.status[version]
+        start = time.perf_counter()
+        try:
+            qi = ensure_index(version, force=force)
+            st.update(last_refresh=_now_iso(), seconds=round(time.perf_counter() - start, 3),
+                      sections=len(qi.sections), error=None)
+        except Exception as e:
+            st.update(last_error_at=_now_iso(), error=str(e))
+            print(f"[refresh] {version} failed: {e}")
+
+    def run_once(self, force: bool = True):
+        # una URL compartida por varias versiones se revalida una vez por ciclo
+        with fetch_cycle():
+            for v in self.versions:
+                self._touch_lock()
+                if self._stop_event.is_set() or not self._owns_lock:
+                    return
+                self._refresh(v, force=force)
+        try:
+            # el índice combinado se arma aquí y no en el primer request "todas las versiones"
+            get_unified_index(block=True)
+        except Exception as e:
+            print(f"[refresh] unified index failed: {e}")
+        try:
+            gc_content()
+        except Exception as e:
+            print(f"[refresh] content gc failed: {e}")
+
+    def run(self):
+        # 1) precarga en memoria lo que ya está en disco (siempre, en cada proceso)
+        for v in self.versions:
+            if index_path(v).exists():
+                try: REGISTRY.get(v)
+                except Exception as e: print(f"[refresh] preload {v} failed: {e}")
+        if not self._acquire_lock():
+            return
+        try:
+            # 2) versiones sin índice, 3) revalidación inicial, 4) periódica
+            for v in self.versions:
+                if not index_path(v).exists():
+                    self._touch_lock()
+                    self._refresh(v, force=False)
+            if self.refresh_on_start:
+                self.run_once(force=True)
+            while not self._idle(self.interval):
+                self.run_once(force=True)
+        finally:
+            self._release_lock()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def readiness(self) -> Dict[str, Any]:
+        versions = {}
+        for v in self.versions:
+            versions[v] = {**index_status(v), **self.status.get(v, {})}
+        return {
+            "ready": all(info["on_disk"] for info in versions.values()),
+            "refresher": self._owns_lock,
+            "versions": versions,
+        }
+
+_refresher: Optional[IndexRefresher] = None
+
+def start_refresher(versions: List[str], **kwargs) -> Optional[IndexRefresher]:
+    global _refresher
+    # los workers del pool de parseo (spawn en Windows/macOS) re-importan app.py: ahí no se refresca
+    if multiprocessing.parent_process() is not None:
+        return None
+    if _refresher is None:
+        _refresher = IndexRefresher(versions, **kwargs)
+        _refresher.start()
+    return _refresher
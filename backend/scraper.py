@@ -1,18 +1,31 @@
+import os
 import re
+import json
 import time
+import hashlib
+import threading
+import multiprocessing
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Any
-import requests
+from typing import Dict, List, Any, Optional
+from urllib.parse import urldefrag
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import yaml
 from bs4 import BeautifulSoup
+from lxml import etree, html as lxml_html
+
+from .crawler import Crawler, get_crawler
+
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+PARSE_POOL_MIN = 4  # con menos páginas el costo de arrancar procesos no compensa
 
 # Ajusta si tu proyecto usa otra carpeta
 CACHE_DIR = Path("data/cache")
 CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
-HEADERS = {
-    "User-Agent": "Relativity-Releases-FAQ/1.0 (+https://localhost)"
-}
-
 # ====== NUEVOS LINKS + base ======
 _VERSION_URLS: Dict[str, List[str]] = {
     "Server2023": [
@@ -50,43 +63,216 @@ def _dedupe(seq: List[str]) -> List[str]:
             seen.add(u); out.append(u)
     return out
 
+# ====== Manifest: data/allowed_urls.yaml ======
+MANIFEST_PATH = Path("data/allowed_urls.yaml")
+CRAWL_DISCOVER = os.getenv("CRAWL_DISCOVER", "false").lower() == "true"
+DISCOVER_MAX_PAGES = int(os.getenv("CRAWL_DISCOVER_MAX_PAGES", "40"))
+DISCOVER_DEPTH = 1
+
+_manifest_cache: Dict[str, Any] = {"mtime": None, "data": {}}
+_manifest_lock = threading.Lock()
+
+def load_manifest(path: Optional[Path] = None) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Lee el YAML de URLs permitidas. Cada versión puede ser una lista de URLs o un mapa
+    {urls: [...], discover: [prefijos]} para limitar el descubrimiento de enlaces.
+    Se relee solo cuando cambia el mtime del archivo.
+    """
+    path = path or MANIFEST_PATH
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        return {}
+    with _manifest_lock:
+        if _manifest_cache["mtime"] == mtime and _manifest_cache.get("path") == path:
+            return _manifest_cache["data"]
+        try:
+            raw = yaml.safe_load(path.read_text(encoding="utf-8")) or {}
+        except Exception as e:
+            print(f"[scraper] Manifest error {path}: {e}")
+            raw = {}
+        data = {}
+        for version, entry in raw.items():
+            if isinstance(entry, dict):
+                data[str(version)] = {"urls": list(entry.get("urls") or []), "discover": list(entry.get("discover") or [])}
+            else:
+                data[str(version)] = {"urls": list(entry or []), "discover": []}
+        _manifest_cache.update(mtime=mtime, path=path, data=data)
+        return data
+
+def all_versions() -> List[str]:
+    return _dedupe(list(_VERSION_URLS.keys()) + list(load_manifest().keys()))
+
 def get_version_urls(version: str) -> List[str]:
-    urls = _VERSION_URLS.get(version, [])
-    return _dedupe(urls)
+    # lista en código + manifest, sin repetidos y en ese orden
+    urls = _VERSION_URLS.get(version, []) + load_manifest().get(version, {}).get("urls", [])
+    return _dedupe([u.strip() for u in urls if isinstance(u, str)])
+
+def discover_prefixes(version: str) -> List[str]:
+    """Prefijos permitidos para seguir enlaces: los del manifest o, si no hay, la carpeta de cada URL semilla."""
+    explicit = load_manifest().get(version, {}).get("discover", [])
+    if explicit:
+        return _dedupe(explicit)
+    return _dedupe([u.rsplit("/", 1)[0] + "/" for u in get_version_urls(version)])
+
+def extract_links(html: str, base_url: str, prefixes: List[str]) -> List[str]:
+    """Enlaces <a href> absolutos (sin #fragmento) que empiezan con alguno de los prefijos."""
+    if not html.strip():
+        return []
+    try:
+        doc = lxml_html.document_fromstring(html)
+        doc.make_links_absolute(base_url, resolve_base_href=True)
+    except Exception:
+        return []
+    out = []
+    for el, attr, link, _ in doc.iterlinks():
+        if el.tag != "a" or attr != "href":
+            continue
+        link = urldefrag(link)[0]
+        if link.endswith((".htm", ".html")) and any(link.startswith(p) for p in prefixes):
+            out.append(link)
+    return _dedupe(out)
 
 # --------- Fetch helpers ----------
 def _cache_path(url: str) -> Path:
     safe = re.sub(r"[^a-zA-Z0-9_.-]+", "_", url)[:180]
     return CACHE_DIR / f"{safe}.html"
 
-def fetch_html(url: str, use_cache: bool = True) -> str:
+def _meta_path(url: str) -> Path:
+    return _cache_path(url).with_suffix(".meta.json")
+
+def _read_meta(url: str) -> Dict[str, Any]:
+    try:
+        return json.loads(_meta_path(url).read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+
+def _write_meta(url: str, meta: Dict[str, Any]):
+    _meta_path(url).write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+
+def content_hash(html: str) -> str:
+    return hashlib.sha256(html.encode("utf-8", errors="ignore")).hexdigest()
+
+def fetch_page(url: str, use_cache: bool = True, revalidate: bool = False,
+               crawler: Optional[Crawler] = None) -> Dict[str, Any]:
+    """
+    Devuelve {"url", "html", "hash", "changed", "status"}.
+    Con revalidate=True se envían If-None-Match / If-Modified-Since y un 304 reutiliza el cache.
+    `changed` indica si el contenido difiere del que teníamos guardado.
+    """
     p = _cache_path(url)
-    if use_cache and p.exists():
-        return p.read_text(encoding="utf-8", errors="ignore")
-    r = requests.get(url, headers=HEADERS, timeout=25)
-    r.raise_for_status()
+    cached = use_cache and p.exists()
+    meta = _read_meta(url) if cached else {}
+    if cached and not revalidate:
+        html = p.read_text(encoding="utf-8", errors="ignore")
+        return {"url": url, "html": html, "hash": meta.get("hash") or content_hash(html),
+                "changed": False, "status": "cached"}
+
+    headers = {}
+    if cached:
+        if meta.get("etag"): headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"): headers["If-Modified-Since"] = meta["last_modified"]
+    # sesión compartida + límite por host (ser amable sin dormir en cada descarga)
+    r = (crawler or get_crawler()).get(url, headers=headers or None)
+    if r.status_code == 304 and cached:
+        html = p.read_text(encoding="utf-8", errors="ignore")
+        return {"url": url, "html": html, "hash": meta.get("hash") or content_hash(html),
+                "changed": False, "status": "not_modified"}
+
     html = r.text
+    new_hash = content_hash(html)
+    old_hash = meta.get("hash")
+    if old_hash is None and p.exists():
+        old_hash = content_hash(p.read_text(encoding="utf-8", errors="ignore"))
     p.write_text(html, encoding="utf-8", errors="ignore")
-    time.sleep(0.5)  # ser amable
-    return html
+    _write_meta(url, {
+        "url": url,
+        "etag": r.headers.get("ETag"),
+        "last_modified": r.headers.get("Last-Modified"),
+        "hash": new_hash,
+        "fetched_at": datetime.utcnow().replace(microsecond=0).isoformat() + "Z",
+    })
+    return {"url": url, "html": html, "hash": new_hash,
+            "changed": new_hash != old_hash, "status": "fetched"}
+
+# Páginas compartidas entre versiones: una revalidación reciente de la misma URL se reutiliza,
+# y las secciones parseadas se guardan por (url, hash) para no parsear dos veces el mismo HTML.
+# Con revalidate=True solo cuenta lo revalidado en el ciclo actual (fetch_cycle); fuera de un
+# ciclo se pregunta siempre al servidor.
+FETCH_MEMO_SECONDS = 600
+FETCH_MEMO_MAX = int(os.getenv("FETCH_MEMO_MAX", "4096"))
+_fetch_memo: "OrderedDict[str, tuple]" = OrderedDict()   # url -> (monotonic, ciclo, page), por antigüedad
+_fetch_memo_lock = threading.Lock()
+_fetch_cycle: Optional[int] = None
+_PARSE_CACHE_MAX = 512
+_parse_cache: "OrderedDict[tuple, List[Dict[str, Any]]]" = OrderedDict()
+_parse_cache_lock = threading.Lock()
+
+@contextmanager
+def fetch_cycle():
+    """Un ciclo de revalidación (todas las versiones): cada URL se revalida una sola vez dentro."""
+    global _fetch_cycle
+    with _fetch_memo_lock:
+        cycle = _fetch_cycle = time.monotonic_ns()
+    try:
+        yield cycle
+    finally:
+        with _fetch_memo_lock:
+            if _fetch_cycle == cycle:
+                _fetch_cycle = None
+
+def _evict_fetch_memo(now: float):
+    # con _fetch_memo_lock tomado; las entradas están en orden de inserción
+    while _fetch_memo and (len(_fetch_memo) > FETCH_MEMO_MAX
+                           or now - next(iter(_fetch_memo.values()))[0] >= FETCH_MEMO_SECONDS):
+        _fetch_memo.popitem(last=False)
+
+def fetch_page_shared(url: str, revalidate: bool = False, crawler: Optional[Crawler] = None) -> Dict[str, Any]:
+    """fetch_page, pero si otra versión ya revalidó esta URL hace poco no se vuelve a pedir."""
+    with _fetch_memo_lock:
+        _evict_fetch_memo(time.monotonic())
+        hit = _fetch_memo.get(url)
+        cycle = _fetch_cycle
+    if hit is not None and (not revalidate or (cycle is not None and hit[1] == cycle)):
+        return {**hit[2], "status": "shared"}
+    page = fetch_page(url, revalidate=revalidate, crawler=crawler)
+    if revalidate or page["status"] == "fetched":
+        with _fetch_memo_lock:
+            _fetch_memo.pop(url, None)
+            _fetch_memo[url] = (time.monotonic(), cycle if revalidate else None, page)
+            _evict_fetch_memo(time.monotonic())
+    return page
+
+def _parse_cached(url: str, page_hash: str) -> Optional[List[Dict[str, Any]]]:
+    with _parse_cache_lock:
+        hit = _parse_cache.get((url, page_hash))
+        if hit is not None:
+            _parse_cache.move_to_end((url, page_hash))
+        return hit
+
+def _parse_store(url: str, page_hash: str, sections: List[Dict[str, Any]]):
+    with _parse_cache_lock:
+        _parse_cache[(url, page_hash)] = sections
+        while len(_parse_cache) > _PARSE_CACHE_MAX:
+            _parse_cache.popitem(last=False)
+
+def fetch_html(url: str, use_cache: bool = True, crawler: Optional[Crawler] = None,
+               revalidate: bool = False) -> str:
+    return fetch_page(url, use_cache=use_cache, revalidate=revalidate, crawler=crawler)["html"]
 
 # --------- Parse helpers ----------
 def clean_text(t: str) -> str:
     t = re.sub(r"\s+", " ", t or "").strip()
     return t
 
-def extract_sections(url: str) -> List[Dict[str, Any]]:
-    html = fetch_html(url)
-    soup = BeautifulSoup(html, "lxml")
-
-    # Título de la página
-    page_title = clean_text(
-        (soup.find("h1").get_text() if soup.find("h1") else soup.title.get_text() if soup.title else "")
-    )
-
-    # Contenido principal
-    main = soup.find("main") or soup.find("div", {"id": "main"}) or soup
+def extract_sections(url: str, crawler: Optional[Crawler] = None) -> List[Dict[str, Any]]:
+    return parse_sections(fetch_html(url, crawler=crawler), url)
 
+def _assemble_sections(page_title: str, events: List[tuple], paragraphs, url: str) -> List[Dict[str, Any]]:
+    """
+    events: ("h", texto) por cada h2/h3 y ("c", texto) por cada p/li, en orden de documento.
+    paragraphs: callable que devuelve el texto de cada <p> (solo se usa si no hubo secciones).
+    """
     # Reglas: dividir por h2/h3
     sections: List[Dict[str, Any]] = []
     current_heading = None
@@ -103,23 +289,21 @@ def extract_sections(url: str) -> List[Dict[str, Any]]:
             "content": content
         })
 
-    for el in main.descendants:
-        if getattr(el, "name", None) in ("h2", "h3"):
+    for kind, txt in events:
+        if kind == "h":
             # cierro sección previa
             flush_section()
-            current_heading = clean_text(el.get_text())
+            current_heading = txt
             current_chunks = []
-        elif getattr(el, "name", None) in ("p", "li"):
-            txt = clean_text(el.get_text())
-            if txt:
-                current_chunks.append(txt)
+        elif txt:
+            current_chunks.append(txt)
 
     # última sección
     flush_section()
 
     # Si no detectó secciones, crea una genérica con párrafos
     if not sections:
-        body_txt = " ".join([clean_text(p.get_text()) for p in main.find_all("p")])
+        body_txt = " ".join(paragraphs())
         if body_txt:
             sections.append({
                 "title": page_title,
@@ -143,26 +327,238 @@ def extract_sections(url: str) -> List[Dict[str, Any]]:
 
     return cleaned
 
+def _parse_sections_bs4(html: str, url: str) -> List[Dict[str, Any]]:
+    """Parser original con BeautifulSoup; referencia y respaldo del parser de una pasada."""
+    soup = BeautifulSoup(html, "lxml")
+
+    # Título de la página
+    page_title = clean_text(
+        (soup.find("h1").get_text() if soup.find("h1") else soup.title.get_text() if soup.title else "")
+    )
+
+    # Contenido principal
+    main = soup.find("main") or soup.find("div", {"id": "main"}) or soup
+
+    events = []
+    for el in main.descendants:
+        if getattr(el, "name", None) in ("h2", "h3"):
+            events.append(("h", clean_text(el.get_text())))
+        elif getattr(el, "name", None) in ("p", "li"):
+            events.append(("c", clean_text(el.get_text())))
+
+    return _assemble_sections(page_title, events,
+                              lambda: [clean_text(p.get_text()) for p in main.find_all("p")], url)
+
+_SKIP_TEXT = {"script", "style", "template"}  # BeautifulSoup.get_text() ignora su texto
+
+def _parse_sections_lxml(html: str, url: str) -> List[Dict[str, Any]]:
+    """
+    Una sola pasada con lxml.etree.iterwalk: cada nodo de texto se visita una vez.
+    El texto de un elemento es el tramo de `frags` entre su inicio y su fin, así que
+    un <li> anidado no vuelve a recorrer el subárbol (get_text() sí lo hacía).
+    Produce exactamente las mismas secciones que _parse_sections_bs4.
+    """
+    if not html.strip():
+        return []
+    root = lxml_html.document_fromstring(html)
+    frags: List[str] = []
+    open_at: Dict[Any, int] = {}   # elemento -> índice en frags al abrirse
+    texts: Dict[Any, str] = {}
+    wanted: List[tuple] = []       # (tag, elemento, en <main>, en div#main), en orden de documento
+    first: Dict[str, Any] = {}
+    main_el = divmain_el = None
+    in_main = in_divmain = False
+    skip = 0
+
+    for event, el in etree.iterwalk(root, events=("start", "end", "comment", "pi")):
+        if event in ("comment", "pi"):
+            # el texto del comentario no cuenta, pero lo que sigue (tail) sí
+            if el.tail and not skip:
+                frags.append(el.tail)
+            continue
+        tag = el.tag
+        if event == "start":
+            if tag in _SKIP_TEXT:
+                skip += 1
+            if tag in ("h1", "title") and tag not in first:
+                first[tag] = el
+            if tag in ("h1", "title", "p", "li", "h2", "h3"):
+                open_at[el] = len(frags)
+                if tag not in ("h1", "title"):
+                    wanted.append((tag, el, in_main, in_divmain))
+            if tag == "main" and main_el is None:
+                main_el, in_main = el, True
+            elif tag == "div" and divmain_el is None and el.get("id") == "main":
+                divmain_el, in_divmain = el, True
+            if el.text and not skip:
+                frags.append(el.text)
+        else:
+            if el in open_at:
+                texts[el] = "".join(frags[open_at.pop(el):])
+            if tag in _SKIP_TEXT:
+                skip -= 1
+            if el is main_el:
+                in_main = False
+            elif el is divmain_el:
+                in_divmain = False
+            if el.tail and not skip:
+                frags.append(el.tail)
+
+    page_title = clean_text(texts[first["h1"]] if "h1" in first else texts[first["title"]] if "title" in first else "")
+    if main_el is not None:
+        scope = [w for w in wanted if w[2]]
+    elif divmain_el is not None:
+        scope = [w for w in wanted if w[3]]
+    else:
+        scope = wanted
+    events = [("h" if tag in ("h2", "h3") else "c", clean_text(texts[el])) for tag, el, _, _ in scope]
+    return _assemble_sections(page_title, events,
+                              lambda: [clean_text(texts[el]) for tag, el, _, _ in scope if tag == "p"], url)
+
+def parse_sections(html: str, url: str) -> List[Dict[str, Any]]:
+    try:
+        return _parse_sections_lxml(html, url)
+    except Exception:
+        # p. ej. documentos con declaración XML de encoding que lxml no acepta como str
+        return _parse_sections_bs4(html, url)
+
+def _parse_job(job: tuple) -> List[Dict[str, Any]]:
+    html, url = job
+    return parse_sections(html, url)
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_parse_pool_size = 0
+_parse_pool_lock = threading.Lock()
+
+def _get_parse_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Un solo pool por proceso, reutilizado entre refrescos. Con spawn: parse_pages corre en el hilo
+    del refresher de un worker con más hilos, y un fork ahí puede heredar un lock tomado.
+    """
+    global _parse_pool, _parse_pool_size
+    with _parse_pool_lock:
+        if _parse_pool is None or _parse_pool_size != workers:
+            if _parse_pool is not None:
+                _parse_pool.shutdown(wait=False)
+            _parse_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _parse_pool_size = workers
+        return _parse_pool
+
+def _reset_parse_pool(pool: ProcessPoolExecutor):
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is pool:
+            _parse_pool = None
+    pool.shutdown(wait=False)
+
+def parse_pages(pages: List[tuple], workers: Optional[int] = None) -> List[Any]:
+    """
+    Parsea [(html, url), ...] en un pool de procesos (el parseo es CPU y no libera el GIL).
+    Devuelve la lista de secciones de cada página, o la excepción, en el mismo orden.
+    """
+    workers = PARSE_WORKERS if workers is None else workers
+    if workers <= 1 or len(pages) < PARSE_POOL_MIN:
+        out = []
+        for job in pages:
+            try: out.append(_parse_job(job))
+            except Exception as e: out.append(e)
+        return out
+    pool = _get_parse_pool(workers)
+    futures = [pool.submit(_parse_job, job) for job in pages]
+    out = []
+    for f in futures:
+        try: out.append(f.result())
+        except Exception as e: out.append(e)
+    if any(isinstance(r, BrokenProcessPool) for r in out):
+        _reset_parse_pool(pool)  # un proceso murió: el próximo refresco arranca un pool nuevo
+    return out
+
 # --------- Public API used by qa_engine ----------
-def build_index_for_version(version: str, force: bool = False) -> Dict[str, Any]:
+def _discover(version: str, pages: List[Any], seeds: List[str], force: bool, crawler: Crawler) -> tuple:
+    """Sigue enlaces desde las páginas ya descargadas, dentro de los prefijos permitidos."""
+    prefixes = discover_prefixes(version)
+    known = set(seeds)
+    urls, out = [], []
+    frontier = [p for p in pages if not isinstance(p, Exception)]
+    for _ in range(DISCOVER_DEPTH):
+        found = []
+        for page in frontier:
+            for link in extract_links(page["html"], page["url"], prefixes):
+                if link not in known and len(urls) + len(found) < DISCOVER_MAX_PAGES:
+                    known.add(link); found.append(link)
+        if not found:
+            break
+        fetched = crawler.map(lambda u: fetch_page_shared(u, revalidate=force, crawler=crawler), found)
+        urls += found; out += fetched
+        frontier = [p for p in fetched if not isinstance(p, Exception)]
+    return urls, out
+
+def build_index_for_version(version: str, force: bool = False, crawler: Optional[Crawler] = None,
+                            known_hashes: Optional[Dict[str, str]] = None,
+                            discover: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    URLs: lista en código + data/allowed_urls.yaml (+ enlaces descubiertos si discover / CRAWL_DISCOVER).
+    force=True revalida cada página con el servidor (GET condicional).
+    Además de las secciones devuelve el hash por URL, qué páginas cambiaron y cuáles fallaron.
+    Con known_hashes (url -> hash ya indexado) solo se parsean las páginas cuyo hash difiere,
+    y "sections" contiene únicamente las secciones de esas páginas.
+    Páginas que varias versiones comparten se descargan y parsean una sola vez.
+    """
     urls = get_version_urls(version)
+    crawler = crawler or get_crawler()
     sections: List[Dict[str, Any]] = []
-    for u in urls:
-        try:
-            sections.extend(extract_sections(u))
-        except Exception as e:
-            print(f"[scraper] Failed: {u} -> {e}")
+    hashes: Dict[str, str] = {}
+    changed: List[str] = []
+    failed: List[str] = []
+    # descargas en paralelo; el orden de las secciones se mantiene igual que `urls`
+    pages = crawler.map(lambda u: fetch_page_shared(u, revalidate=force, crawler=crawler), urls)
+    if CRAWL_DISCOVER if discover is None else discover:
+        extra_urls, extra_pages = _discover(version, pages, urls, force, crawler)
+        urls = urls + extra_urls
+        pages = pages + extra_pages
+    to_parse = []
+    by_url: Dict[str, List[Dict[str, Any]]] = {}
+    for u, page in zip(urls, pages):
+        if isinstance(page, Exception):
+            print(f"[scraper] Failed: {u} -> {page}")
+            failed.append(u)
+            continue
+        if page["changed"]:
+            changed.append(u)
+        if known_hashes is not None and known_hashes.get(u) == page["hash"]:
+            hashes[u] = page["hash"]
+            continue
+        cached = _parse_cached(u, page["hash"])
+        if cached is not None:
+            by_url[u] = cached
+        else:
+            to_parse.append(page)
+    # parseo en paralelo (procesos), resultados en el mismo orden
+    parsed = parse_pages([(p["html"], p["url"]) for p in to_parse])
+    for page, res in zip(to_parse, parsed):
+        u = page["url"]
+        if isinstance(res, Exception):
+            print(f"[scraper] Failed: {u} -> {res}")
+            failed.append(u)
+            continue
+        _parse_store(u, page["hash"], res)
+        by_url[u] = res
+    for u, page in zip(urls, pages):
+        if u in by_url:
+            sections.extend(by_url[u])
+            hashes[u] = page["hash"]
     # retorno en el formato esperado por qa_engine
-    return {"sections": sections}
+    return {"sections": sections, "hashes": hashes, "changed": changed, "failed": failed, "urls": urls}
 
 def ensure_all_indexes() -> Dict[str, int]:
     """Útil si quieres forzar todos."""
     stats = {}
-    for v in _VERSION_URLS.keys():
-        try:
-            data = build_index_for_version(v, force=True)
-            stats[v] = len(data.get("sections", []))
-        except Exception as e:
-            print(f"[scraper] ensure_all_indexes error on {v}: {e}")
-            stats[v] = 0
+    with fetch_cycle():
+        for v in all_versions():
+            try:
+                data = build_index_for_version(v, force=True)
+                stats[v] = len(data.get("sections", []))
+            except Exception as e:
+                print(f"[scraper] ensure_all_indexes error on {v}: {e}")
+                stats[v] = 0
     return stats
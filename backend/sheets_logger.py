@@ -1,16 +1,248 @@
 import os
-import datetime as dt
-from typing import Dict, Any, Optional
 import csv
+import time
+import queue
+import atexit
+import threading
+import datetime as dt
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
 
 SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+HEADER = ["timestamp","name","email","organization","question","version","mode"]
+CSV_PATH = os.path.join("logs", "contacts.csv")
 
 def _now_iso():
     # Log in UTC by default; Google Sheets will show as-is
     return dt.datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
 
+def _row(entry: Dict[str, Any]) -> List[str]:
+    return [_now_iso(), entry.get("name",""), entry.get("email",""), entry.get("organization",""), entry.get("question",""), entry.get("version",""), entry.get("mode","")]
+
+_csv_lock = threading.Lock()
+
+def _append_csv(rows: List[List[str]], path: str = CSV_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with _csv_lock:
+        file_exists = os.path.exists(path)
+        with open(path, "a", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            if not file_exists:
+                w.writerow(HEADER)
+            w.writerows(rows)
+            f.flush()
+            os.fsync(f.fileno())
+
+def _default_client_factory():
+    creds_path = os.getenv("GOOGLE_SHEETS_CREDENTIALS_JSON_PATH", "").strip()
+    creds = ServiceAccountCredentials.from_json_keyfile_name(creds_path, SCOPE)
+    return gspread.authorize(creds)
+
+def _records(data: bytes) -> Iterator[Tuple[List[str], int]]:
+    """(row, byte offset just past it) for each CSV record in `data`; quoted fields may span lines."""
+    pos = 0
+    def lines():
+        nonlocal pos
+        for line in data.splitlines(keepends=True):
+            pos += len(line)
+            yield line.decode("utf-8")
+    for row in csv.reader(lines()):
+        yield row, pos
+
+class ContactLogger:
+    """
+    Contact rows go to an in-memory queue; a background thread sends them to the sheet in
+    batches with a single append_rows call, reusing one authorized client and worksheet.
+    If the sheet is unavailable the batch is spooled to logs/contacts.csv, and spooled rows
+    are replayed (from a saved byte offset) once the sheet answers again.
+
+    `client_factory` returns something shaped like a gspread client (open/create -> .sheet1
+    with row_values/append_rows), so a fake client can be passed in for tests.
+    """
+    def __init__(self, client_factory: Optional[Callable[[], Any]] = None, doc_title: Optional[str] = None,
+                 batch_size: int = 50, flush_seconds: float = 2.0, retry_seconds: float = 60.0,
+                 spool_path: str = CSV_PATH, start: bool = True):
+        self.client_factory = client_factory or _default_client_factory
+        self.doc_title = doc_title or os.getenv("GOOGLE_SHEETS_DOC_TITLE", "Relativity Releases Chatbot Contacts")
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.retry_seconds = retry_seconds
+        self.spool_path = spool_path
+        self.offset_path = spool_path + ".sent"
+        self.replay_lock_path = spool_path + ".replay.lock"
+        self._queue: "queue.Queue[List[str]]" = queue.Queue()
+        self._send_lock = threading.Lock()
+        self._ws = None
+        self._down_until = 0.0
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self.stats = {"queued": 0, "sent": 0, "batches": 0, "spooled": 0, "replayed": 0, "errors": 0}
+        self._thread = None
+        if start:
+            self._thread = threading.Thread(target=self._run, name="contact-logger", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    # ---- remote ----
+    def _worksheet(self):
+        if self._ws is None:
+            client = self.client_factory()
+            try:
+                sh = client.open(self.doc_title)
+            except gspread.SpreadsheetNotFound:
+                sh = client.create(self.doc_title)
+            ws = sh.sheet1
+            if not ws.row_values(1):
+                ws.append_rows([HEADER])
+            self._ws = ws
+        return self._ws
+
+    def _append_remote(self, rows: List[List[str]]):
+        try:
+            self._worksheet().append_rows(rows, value_input_option="RAW")
+        except Exception:
+            self._ws = None  # re-authorize on the next attempt (expired token, deleted sheet...)
+            raise
+
+    # ---- pipeline ----
+    def log(self, entry: Dict[str, Any]):
+        self._queue.put(_row(entry))
+        self.stats["queued"] += 1
+        self._wake.set()
+
+    def _drain(self) -> List[List[str]]:
+        rows = []
+        while len(rows) < self.batch_size:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def flush(self):
+        """Send everything queued now (and replay the spool if the sheet is reachable)."""
+        with self._send_lock:
+            while True:
+                rows = self._drain()
+                if not rows:
+                    break
+                self._send(rows)
+            if time.monotonic() >= self._down_until:
+                self._replay()
+
+    def _send(self, rows: List[List[str]]):
+        if time.monotonic() < self._down_until:
+            self._spool(rows)
+            return
+        try:
+            self._append_remote(rows)
+            self.stats["sent"] += len(rows)
+            self.stats["batches"] += 1
+        except Exception as e:
+            print(f"[contacts] sheets unavailable, spooling {len(rows)} rows: {e}")
+            self.stats["errors"] += 1
+            self._down_until = time.monotonic() + self.retry_seconds
+            self._spool(rows)
+
+    def _spool(self, rows: List[List[str]]):
+        _append_csv(rows, self.spool_path)
+        self.stats["spooled"] += len(rows)
+
+    def _read_offset(self) -> int:
+        try:
+            with open(self.offset_path, "r", encoding="utf-8") as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _write_offset(self, offset: int):
+        tmp = f"{self.offset_path}.tmp{os.getpid()}"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(str(offset))
+        os.replace(tmp, self.offset_path)
+
+    def _replay_batch(self, rows: List[List[str]], end: int) -> bool:
+        try:
+            self._append_remote(rows)
+        except Exception as e:
+            print(f"[contacts] replay stopped: {e}")
+            self.stats["errors"] += 1
+            self._down_until = time.monotonic() + self.retry_seconds
+            return False
+        self.stats["replayed"] += len(rows)
+        self._write_offset(end)
+        return True
+
+    def _replay(self):
+        """Send rows spooled after the saved offset. One process at a time (O_EXCL lock file)."""
+        if not os.path.exists(self.spool_path) or os.path.getsize(self.spool_path) <= self._read_offset():
+            return
+        try:
+            if os.path.exists(self.replay_lock_path) and time.time() - os.path.getmtime(self.replay_lock_path) > 300:
+                os.unlink(self.replay_lock_path)
+            fd = os.open(self.replay_lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except OSError:
+            return
+        os.close(fd)
+        try:
+            offset = self._read_offset()
+            with _csv_lock, open(self.spool_path, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+            data = data[:data.rfind(b"\n") + 1]  # only complete lines
+            batch: List[List[str]] = []
+            for i, (row, end) in enumerate(_records(data)):
+                if not row or (offset == 0 and i == 0 and row == HEADER):
+                    continue
+                batch.append(row)
+                # the offset is saved after every batch: a failure later on never resends what went out
+                if len(batch) == self.batch_size:
+                    if not self._replay_batch(batch, offset + end):
+                        return
+                    batch = []
+            if batch and not self._replay_batch(batch, offset + len(data)):
+                return
+            self._write_offset(offset + len(data))
+        finally:
+            try: os.unlink(self.replay_lock_path)
+            except OSError: pass
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self._wake.wait(self.flush_seconds):
+                # small wait so that contacts arriving together share one append_rows
+                self._stop.wait(min(0.2, self.flush_seconds))
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[contacts] flush failed: {e}")
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"[contacts] final flush failed: {e}")
+
+_logger: Optional[ContactLogger] = None
+_logger_lock = threading.Lock()
+
+def get_contact_logger() -> ContactLogger:
+    global _logger
+    with _logger_lock:
+        if _logger is None:
+            _logger = ContactLogger()
+        return _logger
+
+def set_contact_logger(logger: Optional[ContactLogger]):
+    """Replace the process-wide logger (e.g. one built with a fake gspread client)."""
+    global _logger
+    with _logger_lock:
+        _logger = logger
+
 def log_contact(entry: Dict[str, Any]) -> Dict[str, Any]:
     """
     entry keys: name, email, organization, question, version, mode
@@ -18,33 +250,13 @@ def log_contact(entry: Dict[str, Any]) -> Dict[str, Any]:
     enabled = os.getenv("GOOGLE_SHEETS_ENABLED", "false").lower() == "true"
     if enabled:
         creds_path = os.getenv("GOOGLE_SHEETS_CREDENTIALS_JSON_PATH", "").strip()
-        doc_title = os.getenv("GOOGLE_SHEETS_DOC_TITLE", "Relativity Releases Chatbot Contacts")
-        if not creds_path or not os.path.exists(creds_path):
+        if _logger is None and (not creds_path or not os.path.exists(creds_path)):
             return _csv_fallback(entry, note="Missing Google credentials file; wrote to CSV instead.")
-        try:
-            creds = ServiceAccountCredentials.from_json_keyfile_name(creds_path, SCOPE)
-            client = gspread.authorize(creds)
-            try:
-                sh = client.open(doc_title)
-            except gspread.SpreadsheetNotFound:
-                sh = client.create(doc_title)
-            ws = sh.sheet1
-            if ws.row_count < 1 or ws.cell(1,1).value is None:
-                ws.append_row(["timestamp","name","email","organization","question","version","mode"])
-            ws.append_row([_now_iso(), entry.get("name",""), entry.get("email",""), entry.get("organization",""), entry.get("question",""), entry.get("version",""), entry.get("mode","")])
-            return {"ok": True, "where": "sheets"}
-        except Exception as e:
-            return _csv_fallback(entry, note=f"Sheets error: {e}")
+        get_contact_logger().log(entry)
+        return {"ok": True, "where": "sheets", "queued": True}
     else:
         return _csv_fallback(entry, note="Sheets disabled; wrote to CSV.")
 
 def _csv_fallback(entry: Dict[str, Any], note: str):
-    os.makedirs("logs", exist_ok=True)
-    path = os.path.join("logs", "contacts.csv")
-    file_exists = os.path.exists(path)
-    with open(path, "a", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        if not file_exists:
-            w.writerow(["timestamp","name","email","organization","question","version","mode"])
-        w.writerow([_now_iso(), entry.get("name",""), entry.get("email",""), entry.get("organization",""), entry.get("question",""), entry.get("version",""), entry.get("mode","")])
+    _append_csv([_row(entry)])
     return {"ok": True, "where": "csv", "note": note}
@@ -0,0 +1,353 @@
+"""
+Speech-to-text en segundo plano.
+
+submit() se queda con el archivo de la subida tal como lo dejó Werkzeug (en memoria o en un
+temporal anónimo que el SO borra solo), sin copiarlo, valida tamaño y duración y encola la
+transcripción en un pool de hilos acotado: los hilos de Flask no esperan al backend. El audio se
+cierra (y con eso se borra) cuando el job termina, falla o se cancela. Con la cola llena se
+rechaza en lugar de acumular.
+
+Backends (STT_BACKEND):
+    openai  Whisper vía la API de OpenAI (o un servidor compatible con STT_BASE_URL)
+    stub    no transcribe: espera STT_STUB_DELAY segundos, para pruebas de carga locales
+"""
+import os
+import struct
+import tempfile
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, BinaryIO, Callable, Dict, Optional
+
+from .metrics import METRICS
+
+STT_BACKEND = os.getenv("STT_BACKEND", "openai").strip().lower()
+STT_MODEL = os.getenv("STT_MODEL", "whisper-1")
+STT_BASE_URL = os.getenv("STT_BASE_URL", "").strip() or None
+STT_WORKERS = int(os.getenv("STT_WORKERS", "4"))
+STT_MAX_QUEUE = int(os.getenv("STT_MAX_QUEUE", "16"))  # jobs en curso + en espera
+STT_MAX_BYTES = int(os.getenv("STT_MAX_BYTES", str(10 * 1024 * 1024)))  # la API acepta hasta 25 MB
+STT_MAX_SECONDS = float(os.getenv("STT_MAX_SECONDS", "120"))
+STT_SPOOL_BYTES = int(os.getenv("STT_SPOOL_BYTES", str(1024 * 1024)))
+STT_TIMEOUT = float(os.getenv("STT_TIMEOUT", "60"))
+STT_JOB_TTL = float(os.getenv("STT_JOB_TTL", "600"))
+STT_STUB_DELAY = float(os.getenv("STT_STUB_DELAY", "0.5"))
+
+_CHUNK = 64 * 1024
+
+class SttRejected(Exception):
+    """El pedido no se encola; `status` es el código HTTP a devolver."""
+    def __init__(self, message: str, status: int):
+        super().__init__(message)
+        self.status = status
+
+# ---------------- backends ----------------
+class SttBackend(ABC):
+    name = "base"
+
+    def available(self) -> Optional[str]:
+        """None si está listo; si no, el motivo (se muestra al usuario)."""
+        return None
+
+    @abstractmethod
+    def transcribe(self, audio: BinaryIO, filename: str, mimetype: str) -> str:
+        """Texto del audio; se llama desde un hilo del pool con el archivo ya posicionado al inicio."""
+
+class OpenAIBackend(SttBackend):
+    name = "openai"
+
+    def __init__(self):
+        self.api_key = os.getenv("OPENAI_API_KEY", "").strip()
+        self._client = None
+
+    def available(self) -> Optional[str]:
+        if not self.api_key and not STT_BASE_URL:
+            return "Speech-to-text requires OPENAI_API_KEY configured on the server."
+        return None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI(api_key=self.api_key or "none", base_url=STT_BASE_URL,
+                                  timeout=STT_TIMEOUT, max_retries=1)
+        return self._client
+
+    def transcribe(self, audio: BinaryIO, filename: str, mimetype: str) -> str:
+        # (nombre, archivo, tipo): el cliente sube el archivo abierto, sin copiarlo a disco
+        resp = self.client.audio.transcriptions.create(model=STT_MODEL, file=(filename, audio, mimetype))
+        return (getattr(resp, "text", None) or "").strip()
+
+class StubBackend(SttBackend):
+    name = "stub"
+
+    def transcribe(self, audio: BinaryIO, filename: str, mimetype: str) -> str:
+        size = 0
+        while True:
+            chunk = audio.read(_CHUNK)
+            if not chunk:
+                break
+            size += len(chunk)
+        time.sleep(STT_STUB_DELAY)
+        return f"stub transcription of {size} bytes"
+
+BACKENDS: Dict[str, Callable[[], SttBackend]] = {
+    "openai": OpenAIBackend,
+    "stub": StubBackend,
+}
+
+def get_backend(name: Optional[str] = None) -> SttBackend:
+    name = (name or STT_BACKEND).strip().lower()
+    if name not in BACKENDS:
+        raise ValueError(f"unknown STT backend {name!r}; expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name]()
+
+# ---------------- duración ----------------
+def _wav_duration(head: bytes) -> Optional[float]:
+    pos, byte_rate = 12, None
+    while pos + 8 <= len(head):
+        cid, size = head[pos:pos + 4], struct.unpack_from("<I", head, pos + 4)[0]
+        if cid == b"fmt " and pos + 16 <= len(head):
+            byte_rate = struct.unpack_from("<I", head, pos + 16)[0]
+        elif cid == b"data":
+            return size / byte_rate if byte_rate else None
+        pos += 8 + size + (size & 1)
+    return None
+
+def _ogg_duration(head: bytes, tail: bytes) -> Optional[float]:
+    last = tail.rfind(b"OggS")
+    if last < 0 or last + 14 > len(tail):
+        return None
+    granule = struct.unpack_from("<q", tail, last + 6)[0]
+    i = head.find(b"OpusHead")
+    if i >= 0 and i + 12 <= len(head):
+        pre_skip = struct.unpack_from("<H", head, i + 10)[0]
+        return max(0, granule - pre_skip) / 48000  # Opus siempre cuenta muestras a 48 kHz
+    i = head.find(b"\x01vorbis")
+    if i >= 0 and i + 16 <= len(head):
+        rate = struct.unpack_from("<I", head, i + 12)[0]
+        return granule / rate if rate else None
+    return None
+
+def _webm_duration(head: bytes) -> Optional[float]:
+    # Segment/Info/Duration (0x4489, float) en unidades de TimecodeScale (0x2AD7B1, por defecto 1 ms);
+    # solo antes del primer Cluster, para no confundirlo con bytes de audio
+    cluster = head.find(b"\x1f\x43\xb6\x75")
+    head = head[:cluster] if cluster >= 0 else head
+    i = head.find(b"\x44\x89")
+    if i < 0 or i + 3 > len(head) or head[i + 2] not in (0x84, 0x88):
+        return None
+    size = head[i + 2] & 0x0F
+    raw = head[i + 3:i + 3 + size]
+    if len(raw) != size:
+        return None
+    value = struct.unpack(">f" if size == 4 else ">d", raw)[0]
+    scale = 1_000_000
+    j = head.find(b"\x2a\xd7\xb1")
+    if 0 <= j and j + 4 <= len(head) and 0x81 <= head[j + 3] <= 0x88:
+        n = head[j + 3] & 0x0F
+        scale = int.from_bytes(head[j + 4:j + 4 + n], "big") or scale
+    return value * scale / 1e9
+
+def audio_duration(f: BinaryIO) -> Optional[float]:
+    """
+    Segundos de audio según el encabezado (WAV, Ogg Opus/Vorbis, WebM con Duration), o None si
+    no se puede saber sin decodificar (MediaRecorder no escribe la duración en WebM): en ese caso
+    el tope es STT_MAX_BYTES.
+    """
+    f.seek(0)
+    head = f.read(_CHUNK)
+    duration = None
+    try:
+        if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+            duration = _wav_duration(head)
+        elif head[:4] == b"OggS":
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - _CHUNK))
+            duration = _ogg_duration(head, f.read(_CHUNK))
+        elif head[:4] == b"\x1a\x45\xdf\xa3":
+            duration = _webm_duration(head)
+    except struct.error:
+        duration = None
+    f.seek(0)
+    return duration
+
+# ---------------- jobs ----------------
+class SttJob:
+    def __init__(self, owner: str):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.future: Optional[Future] = None
+
+    @property
+    def status(self) -> str:
+        if not self.future.done():
+            return "running" if self.started is not None else "queued"
+        if self.future.cancelled():
+            return "failed"
+        return "failed" if self.future.exception() is not None else "done"
+
+    def info(self) -> Dict[str, Any]:
+        out = {"job_id": self.id, "status": self.status}
+        if out["status"] == "done":
+            out["text"] = self.future.result()
+        elif out["status"] == "failed":
+            out["error"] = "cancelled" if self.future.cancelled() else str(self.future.exception())
+        return out
+
+class SpeechToText:
+    def __init__(self, backend: Optional[SttBackend] = None, workers: int = STT_WORKERS,
+                 max_queue: int = STT_MAX_QUEUE, max_bytes: int = STT_MAX_BYTES,
+                 max_seconds: float = STT_MAX_SECONDS, ttl: float = STT_JOB_TTL):
+        self.backend = backend if backend is not None else get_backend()
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.ttl = ttl
+        self._pool = None
+        self._jobs: Dict[str, SttJob] = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+
+    def _executor(self) -> ThreadPoolExecutor:
+        # perezoso: con gunicorn + preload no se crean hilos antes del fork
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="stt")
+        return self._pool
+
+    def available(self) -> Optional[str]:
+        return self.backend.available()
+
+    def _take(self, stream: BinaryIO) -> BinaryIO:
+        """
+        El audio listo para el backend: el mismo archivo si admite seek (sin copiarlo); si no,
+        copiado por bloques a un SpooledTemporaryFile, cortando apenas pasa max_bytes.
+        """
+        audio = stream
+        try:
+            try:
+                stream.seek(0, os.SEEK_END)
+            except (AttributeError, OSError, ValueError):
+                audio = tempfile.SpooledTemporaryFile(max_size=STT_SPOOL_BYTES)
+                while audio.tell() <= self.max_bytes:
+                    chunk = stream.read(_CHUNK)
+                    if not chunk:
+                        break
+                    audio.write(chunk)
+                stream.close()
+            size = audio.seek(0, os.SEEK_END)
+            if size > self.max_bytes:
+                raise SttRejected(f"Audio is larger than {self.max_bytes // (1024 * 1024)} MB.", 413)
+            if not size:
+                raise SttRejected("Empty audio upload.", 400)
+            duration = audio_duration(audio)
+            if duration is not None and duration > self.max_seconds:
+                raise SttRejected(f"Audio is longer than {int(self.max_seconds)} seconds.", 413)
+            return audio
+        except BaseException:
+            audio.close()
+            raise
+
+    def submit(self, owner: str, stream: BinaryIO, filename: str, mimetype: str) -> SttJob:
+        """
+        Encola la transcripción de `stream` y se queda con él: se cierra cuando el job termina,
+        o enseguida si se rechaza (SttRejected).
+        """
+        try:
+            return self._submit(owner, stream, filename, mimetype)
+        except BaseException as e:
+            stream.close()
+            if isinstance(e, SttRejected):
+                METRICS.inc("qa_stt_rejected_total", status=str(e.status))
+            raise
+
+    def _submit(self, owner: str, stream: BinaryIO, filename: str, mimetype: str) -> SttJob:
+        reason = self.available()
+        if reason:
+            raise SttRejected(reason, 400)
+        with self._lock:
+            self._cleanup()
+            if self._pending >= self.max_queue:
+                raise SttRejected("Speech-to-text is busy, try again in a few seconds.", 503)
+            self._pending += 1  # se reserva el lugar antes de leer la subida
+        try:
+            audio = self._take(stream)
+        except BaseException:
+            self._done()
+            raise
+        job = SttJob(owner)
+        try:
+            job.future = self._executor().submit(self._run, job, audio, filename, mimetype)
+        except BaseException:
+            audio.close()
+            self._done()
+            raise
+        # también corre si el job se cancela sin haber empezado: el audio siempre se cierra
+        job.future.add_done_callback(lambda _f: self._finish(audio))
+        with self._lock:
+            self._jobs[job.id] = job
+        return job
+
+    def _run(self, job: SttJob, audio: BinaryIO, filename: str, mimetype: str) -> str:
+        job.started = time.time()
+        METRICS.observe("qa_stt_queue_seconds", job.started - job.created)
+        audio.seek(0)
+        with METRICS.time("stt"):
+            return self.backend.transcribe(audio, filename, mimetype)
+
+    def _finish(self, audio: BinaryIO):
+        audio.close()
+        self._done()
+
+    def _done(self):
+        with self._lock:
+            self._pending -= 1
+
+    def get(self, job_id: str, owner: str) -> Optional[SttJob]:
+        job = self._jobs.get(job_id)
+        return job if job is not None and job.owner == owner else None
+
+    def wait(self, job: SttJob, timeout: Optional[float] = None) -> str:
+        return job.future.result(timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"backend": self.backend.name, "pending": self._pending, "jobs": len(self._jobs)}
+
+    def _cleanup(self):
+        now = time.time()
+        if now - self._last_cleanup < 60:
+            return
+        self._last_cleanup = now
+        for jid in [j for j, job in self._jobs.items() if job.future.done() and now - job.created > self.ttl]:
+            del self._jobs[jid]
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+_stt: Optional[SpeechToText] = None
+_stt_lock = threading.Lock()
+
+def get_stt() -> SpeechToText:
+    global _stt
+    with _stt_lock:
+        if _stt is None:
+            _stt = SpeechToText()
+        return _stt
+
+def _metrics_collector():
+    if _stt is not None:
+        yield "qa_stt_pending", "gauge", {}, _stt.stats()["pending"]
+
+METRICS.add_collector(_metrics_collector)
+METRICS.describe("qa_stt_pending", "Speech-to-text jobs queued or running")
+METRICS.describe("qa_stt_rejected_total", "Speech-to-text uploads rejected (400 invalid, 413 too large/long, 503 busy)")
+METRICS.describe("qa_stt_queue_seconds", "Seconds a speech-to-text job waited for a worker")
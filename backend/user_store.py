@@ -0,0 +1,121 @@
+"""
+Usuarios en data/users.json con cache en memoria.
+
+Las lecturas (login) son una búsqueda en un dict que solo se vuelve a parsear cuando cambia
+el archivo (mtime/tamaño/inode). Las escrituras releen el archivo, aplican el cambio y lo
+reemplazan atómicamente (tmp + os.replace) dentro de un lock entre procesos (O_EXCL, como el
+del refresco de índices), así dos registros simultáneos no se pisan.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+USERS_FILE = Path("data/users.json")
+
+class UserStore:
+    def __init__(self, path: Path = USERS_FILE, lock_timeout: float = 10.0, lock_stale_after: float = 30.0):
+        self.path = path
+        self.lock_path = path.with_name(path.name + ".lock")
+        self.lock_timeout = lock_timeout
+        self.lock_stale_after = lock_stale_after
+        self._users: Dict[str, Dict[str, Any]] = {}
+        self._sig = None
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    # ---- lectura con cache ----
+    def _signature(self):
+        try:
+            st = self.path.stat()
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def _cached(self) -> Dict[str, Dict[str, Any]]:
+        sig = self._signature()
+        if sig != self._sig:
+            with self._lock:
+                sig = self._signature()
+                if sig != self._sig:
+                    self._users, self._sig = self._read(), sig
+        return self._users
+
+    def get(self, email: str) -> Optional[Dict[str, Any]]:
+        u = self._cached().get(email)
+        return dict(u) if u is not None else None
+
+    def __contains__(self, email: str) -> bool:
+        return email in self._cached()
+
+    def __len__(self) -> int:
+        return len(self._cached())
+
+    # ---- escritura ----
+    @contextmanager
+    def _locked(self):
+        deadline = time.monotonic() + self.lock_timeout
+        with self._lock:
+            while True:
+                try:
+                    fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                    break
+                except FileExistsError:
+                    try:
+                        if time.time() - self.lock_path.stat().st_mtime > self.lock_stale_after:
+                            self.lock_path.unlink()
+                            continue
+                    except OSError:
+                        continue
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"user store locked: {self.lock_path}")
+                    time.sleep(0.005)
+            os.close(fd)
+            try:
+                yield
+            finally:
+                try: self.lock_path.unlink()
+                except OSError: pass
+
+    def _write(self, users: Dict[str, Dict[str, Any]]):
+        tmp = self.path.with_name(f"{self.path.name}.tmp{os.getpid()}.{threading.get_ident()}")
+        tmp.write_text(json.dumps(users, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
+        self._users, self._sig = users, self._signature()
+
+    def create(self, email: str, record: Dict[str, Any]) -> bool:
+        """Agrega el usuario si no existe. False si el email ya estaba registrado."""
+        with self._locked():
+            users = self._read()  # siempre del disco: otro proceso pudo escribir después del cache
+            if email in users:
+                return False
+            users[email] = dict(record)
+            self._write(users)
+            return True
+
+    def delete(self, email: str) -> bool:
+        with self._locked():
+            users = self._read()
+            if users.pop(email, None) is None:
+                return False
+            self._write(users)
+            return True
+
+_store: Optional[UserStore] = None
+_store_lock = threading.Lock()
+
+def get_user_store() -> UserStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = UserStore()
+        return _store
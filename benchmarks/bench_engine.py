@@ -0,0 +1,85 @@
+"""
+Motor de QA por tamaño de corpus: fit (incremental y full), save/load, search, search_many
+y answer_question (con y sin cache). Trabaja en un directorio temporal: no toca data/index.
+
+    python benchmarks/bench_engine.py --sizes 1000 10000
+    python benchmarks/bench_engine.py --source cache --out benchmarks/results/engine.json
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.corpus import QUERIES, ROOT, load_corpus, timed, write_results  # noqa: E402
+
+def bench(n: int, source: str, repeat: int) -> dict:
+    os.chdir(ROOT)
+    corpus = load_corpus(n, source=source)
+    sections = corpus["sections"]
+    workdir = tempfile.mkdtemp(prefix="bench_engine_")
+    os.chdir(workdir)
+    try:
+        from backend import content_store, incremental, qa_engine as q
+        content_store._store = None  # el almacén compartido vive en el directorio temporal de esta vuelta
+        out = {"sections": n, "source": corpus["source"]}
+
+        for mode in ("incremental", "full"):
+            incremental._counts_cache.clear()  # sin filas reutilizadas de la vuelta anterior
+            qi = q.QAIndex(f"bench_{mode}")
+            t = time.perf_counter()
+            qi.fit(sections, mode=mode)
+            out[f"fit_{mode}_s"] = round(time.perf_counter() - t, 3)
+            t = time.perf_counter()
+            qi.save()
+            out[f"save_{mode}_s"] = round(time.perf_counter() - t, 3)
+            t = time.perf_counter()
+            loaded = q.QAIndex.load(qi.version)
+            out[f"load_{mode}_ms"] = round((time.perf_counter() - t) * 1000, 3)
+            loaded.search(QUERIES[0])  # primera búsqueda: toca las páginas del mmap
+            out[f"search_{mode}"] = timed(lambda: [loaded.search(x) for x in QUERIES], repeat)
+            out[f"search_{mode}"]["per_query_p50_ms"] = round(out[f"search_{mode}"]["p50_ms"] / len(QUERIES), 4)
+
+        version = "bench_incremental"
+        qi = q.QAIndex.load(version)
+        batch = QUERIES * 50
+        out["search_many_300"] = timed(lambda: qi.search_many(batch), max(3, repeat // 5))
+        n_unique = [0]
+
+        def uncached():
+            n_unique[0] += 1
+            q.answer_question(f"{QUERIES[n_unique[0] % len(QUERIES)]} {n_unique[0]}", version)
+
+        out["answer_uncached"] = timed(uncached, repeat)
+        out["answer_cached"] = timed(lambda: q.answer_question(QUERIES[0], version), repeat)
+        out["index_bytes"] = sum(f.stat().st_size for f in Path("data/index").rglob("*") if f.is_file())
+        q.REGISTRY.evict()
+        q.ANSWER_CACHE.clear()
+        return out
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    ap.add_argument("--source", choices=["auto", "cache", "synthetic"], default="auto")
+    ap.add_argument("--repeat", type=int, default=30)
+    ap.add_argument("--out", type=Path, help="escribe los resultados en JSON")
+    args = ap.parse_args()
+    out_path = args.out.resolve() if args.out else None
+    results = []
+    for n in args.sizes:
+        r = bench(n, args.source, args.repeat)
+        print(json.dumps(r))
+        results.append(r)
+    if out_path:
+        write_results(out_path, "engine", results, {"sizes": args.sizes, "source": args.source, "repeat": args.repeat})
+
+if __name__ == "__main__":
+    main()
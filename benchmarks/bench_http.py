@@ -0,0 +1,104 @@
+"""
+Carga sobre /api/ask, /api/history, /api/sections y /api/sections/suggest con el test client de Flask (sin red, sin servidor).
+
+Construye un índice de --sections secciones en un directorio temporal, con la app apuntando ahí,
+y lanza --threads hilos por endpoint. Las consultas mezclan repetidas (cache) y nuevas.
+
+    python benchmarks/bench_http.py
+    python benchmarks/bench_http.py --sections 20000 --threads 8 --requests 200 --out http.json
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.corpus import QUERIES, ROOT, load_corpus, summarize, write_results  # noqa: E402
+
+VERSION = "RelativityOne"
+
+def run_endpoint(app, name: str, call, threads: int, per_thread: int) -> dict:
+    samples, errors = [], []
+    lock = threading.Lock()
+
+    def worker(t: int):
+        client = app.test_client()
+        with client.session_transaction() as s:
+            s["user"] = {"email": f"bench{t}@example.com", "display_name": f"bench{t}"}
+        mine = []
+        for i in range(per_thread):
+            start = time.perf_counter()
+            r = call(client, t, i)
+            mine.append((time.perf_counter() - start) * 1000)
+            if r.status_code != 200:
+                errors.append(f"{name}: {r.status_code}")
+            r.close()
+        with lock:
+            samples.extend(mine)
+
+    start = time.perf_counter()
+    ths = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for th in ths: th.start()
+    for th in ths: th.join()
+    elapsed = time.perf_counter() - start
+    return {**summarize(samples), "rps": round(len(samples) / elapsed, 1), "errors": len(errors)}
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sections", type=int, default=5000)
+    ap.add_argument("--source", choices=["auto", "cache", "synthetic"], default="auto")
+    ap.add_argument("--threads", type=int, default=4)
+    ap.add_argument("--requests", type=int, default=100, help="requests por hilo y endpoint")
+    ap.add_argument("--out", type=Path, help="escribe los resultados en JSON")
+    args = ap.parse_args()
+    out_path = args.out.resolve() if args.out else None
+
+    os.chdir(ROOT)
+    corpus = load_corpus(args.sections, source=args.source)
+    workdir = tempfile.mkdtemp(prefix="bench_http_")
+    os.chdir(workdir)
+    os.environ["INDEX_REFRESH_ENABLED"] = "false"
+    try:
+        from backend.qa_engine import QAIndex
+        qi = QAIndex(VERSION)
+        qi.fit(corpus["sections"])
+        qi.save()
+        import app as app_module  # después del chdir: la app usa rutas relativas
+        app = app_module.create_app()
+
+        def ask(client, t, i):
+            # 1 de cada 4 consultas es nueva; el resto se repite entre hilos (cache de respuestas)
+            q = QUERIES[i % len(QUERIES)] if i % 4 else f"{QUERIES[i % len(QUERIES)]} {t}-{i}"
+            return client.post("/api/ask", json={"message": q, "version": VERSION})
+
+        results = {"sections": args.sections, "source": corpus["source"], "threads": args.threads}
+        results["ask"] = run_endpoint(app, "ask", ask, args.threads, args.requests)
+        results["history"] = run_endpoint(
+            app, "history", lambda c, t, i: c.get(f"/api/history?version={VERSION}&limit=60"),
+            args.threads, args.requests)
+        results["sections_list"] = run_endpoint(
+            app, "sections", lambda c, t, i: c.get(f"/api/sections?version={VERSION}"),
+            args.threads, args.requests)
+        prefixes = [q[:n] for q in QUERIES for n in (2, 4, 7)]
+        results["suggest"] = run_endpoint(
+            app, "suggest",
+            lambda c, t, i: c.get(f"/api/sections/suggest?version={VERSION}&q={prefixes[(t + i) % len(prefixes)]}"),
+            args.threads, args.requests)
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps(results, indent=2))
+    if out_path:
+        write_results(out_path, "http", results, vars(args) | {"out": str(out_path)})
+    failed = sum(results[k]["errors"] for k in ("ask", "history", "sections_list", "suggest"))
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
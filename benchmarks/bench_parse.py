@@ -0,0 +1,94 @@
+"""
+Tiempo de parseo: BeautifulSoup (parser original) vs lxml de una pasada + pool de procesos.
+
+Usa las páginas de data/cache/*.html; si no hay (o con --synthetic N) genera páginas
+con la estructura de las release notes (h2/h3, párrafos, listas anidadas).
+Verifica que ambos parsers produzcan exactamente las mismas secciones.
+
+    python benchmarks/bench_parse.py
+    python benchmarks/bench_parse.py --synthetic 40 --workers 4
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from backend.scraper import CACHE_DIR, PARSE_WORKERS, _parse_sections_bs4, parse_pages, parse_sections  # noqa: E402
+
+def synthetic_page(i: int, rng: random.Random, sections: int = 60) -> str:
+    words = "release notes known issues workspace analytics upgrade agent server processing".split()
+    def sentence(n=18):
+        return " ".join(rng.choice(words) for _ in range(n)).capitalize() + "."
+    parts = [f"<html><head><title>Page {i}</title><script>var x = 1;</script></head><body>",
+             "<nav><ul><li>Home</li><li>Docs</li></ul></nav><main>", f"<h1>Release notes {i}</h1>"]
+    for s in range(sections):
+        parts.append(f"<h2>Section {i}.{s}</h2>")
+        for _ in range(rng.randint(1, 4)):
+            parts.append(f"<p>{sentence()} <b>{sentence(4)}</b></p>")
+        parts.append("<ul>")
+        for _ in range(rng.randint(1, 4)):
+            nested = "".join(f"<li><p>{sentence(8)}</p><ul><li>{sentence(6)}</li></ul></li>" for _ in range(2))
+            parts.append(f"<li>{sentence(10)}<ul>{nested}</ul></li>")
+        parts.append("</ul><!-- fin de sección -->")
+    parts.append("</main></body></html>")
+    return "".join(parts)
+
+def load_pages(synthetic: int):
+    if not synthetic:
+        pages = [(p.read_text(encoding="utf-8", errors="ignore"), p.stem) for p in sorted(CACHE_DIR.glob("*.html"))]
+        if pages:
+            return pages, "cache"
+        synthetic = 25
+    rng = random.Random(0)
+    return [(synthetic_page(i, rng), f"https://example.invalid/page{i}.htm") for i in range(synthetic)], "synthetic"
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--synthetic", type=int, default=0, help="número de páginas sintéticas")
+    ap.add_argument("--workers", type=int, default=PARSE_WORKERS)
+    ap.add_argument("--out", type=Path, help="escribe los resultados en JSON")
+    args = ap.parse_args()
+
+    pages, source = load_pages(args.synthetic)
+    t = time.perf_counter()
+    old = [_parse_sections_bs4(h, u) for h, u in pages]
+    t_old = time.perf_counter() - t
+
+    t = time.perf_counter()
+    new_serial = [parse_sections(h, u) for h, u in pages]
+    t_new = time.perf_counter() - t
+
+    # el pool se crea una vez por proceso (spawn) y se reutiliza: la primera llamada incluye el arranque
+    t = time.perf_counter()
+    parse_pages(pages, workers=args.workers)
+    t_first = time.perf_counter() - t
+    t = time.perf_counter()
+    new_pool = parse_pages(pages, workers=args.workers)
+    t_pool = time.perf_counter() - t
+
+    mismatches = [u for (h, u), a, b, c in zip(pages, old, new_serial, new_pool) if not (a == b == c)]
+    result = {
+        "source": source,
+        "pages": len(pages),
+        "sections": sum(len(s) for s in old),
+        "bs4_seconds": round(t_old, 3),
+        "lxml_seconds": round(t_new, 3),
+        "lxml_pool_first_seconds": round(t_first, 3),
+        "lxml_pool_seconds": round(t_pool, 3),
+        "workers": args.workers,
+        "identical": not mismatches,
+    }
+    print(json.dumps(result, indent=2))
+    if mismatches:
+        print("Distintos:", mismatches[:10], file=sys.stderr)
+    if args.out:
+        args.out.write_text(json.dumps(result, indent=2), encoding="utf-8")
+    sys.exit(1 if mismatches else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Latencia de QAIndex.search vs tamaño del corpus.
+
+Compara el camino anterior (linear_kernel sobre toda la matriz + argsort completo)
+con el actual (producto con el índice invertido + argpartition).
+
+    python benchmarks/bench_search.py --sizes 1000 10000 100000
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from sklearn.metrics.pairwise import linear_kernel
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.qa_engine import QAIndex, top_k_indices  # noqa: E402
+from benchmarks.corpus import QUERIES, synthetic_sections  # noqa: E402
+
+def _time(fn, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t) * 1000)
+    samples.sort()
+    return {"p50_ms": round(samples[len(samples) // 2], 4), "min_ms": round(samples[0], 4)}
+
+def bench(n: int, repeat: int, top_k: int = 5) -> dict:
+    qi = QAIndex("bench")
+    t = time.perf_counter()
+    qi.fit(synthetic_sections(n))
+    fit_s = time.perf_counter() - t
+    qvecs = [qi.vectorizer.transform([q]).tocsr() for q in QUERIES]
+    qi.postings  # transpuesta precalculada, como tras la primera búsqueda
+
+    def old():
+        for qv in qvecs:
+            sims = linear_kernel(qv, qi.matrix).flatten()
+            sims.argsort()[::-1][:top_k]
+
+    def new():
+        for qv in qvecs:
+            top_k_indices(qi.scores(qv), top_k)
+
+    # mismos resultados por ambos caminos
+    for qv in qvecs:
+        a = linear_kernel(qv, qi.matrix).flatten()
+        b = qi.scores(qv)
+        assert np.allclose(a, b)
+    per_query = len(QUERIES)
+    o, nw = _time(old, repeat), _time(new, repeat)
+    return {
+        "sections": n,
+        "fit_seconds": round(fit_s, 3),
+        "old_ms_per_query": round(o["p50_ms"] / per_query, 4),
+        "new_ms_per_query": round(nw["p50_ms"] / per_query, 4),
+        "speedup": round(o["p50_ms"] / nw["p50_ms"], 2) if nw["p50_ms"] else None,
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--out", type=Path, help="escribe los resultados en JSON")
+    args = ap.parse_args()
+    results = []
+    for n in args.sizes:
+        r = bench(n, args.repeat)
+        print(json.dumps(r))
+        results.append(r)
+    if args.out:
+        args.out.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Carga sobre /api/stt/jobs (y el /api/stt sincrónico) con el backend stub: sin red ni OpenAI.
+
+--clients hilos suben --uploads audios WAV de --kb KB cada uno y consultan el job hasta que
+termina; un 503 (cola llena) se reintenta después de Retry-After. Reporta latencia de punta a
+punta, rechazos, el máximo de hilos de transcripción vivos (tope: STT_WORKERS) y si quedaron
+descriptores abiertos (audio sin cerrar) o jobs pendientes al final.
+
+    python benchmarks/bench_stt.py
+    python benchmarks/bench_stt.py --clients 32 --workers 4 --queue 8 --delay 0.2 --out stt.json
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.corpus import ROOT, summarize, write_results  # noqa: E402
+
+RATE = 16000  # PCM 16 bits mono: 32 KB por segundo
+
+def wav_bytes(kb: int) -> bytes:
+    data = bytes(kb * 1024)
+    fmt = struct.pack("<HHIIHH", 1, 1, RATE, RATE * 2, 2, 16)
+    return (b"RIFF" + struct.pack("<I", 36 + len(data)) + b"WAVE" + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+            + b"data" + struct.pack("<I", len(data)) + data)
+
+def _open_fds() -> int:
+    return len(os.listdir("/proc/self/fd")) if os.path.isdir("/proc/self/fd") else -1
+
+def _stt_threads() -> int:
+    return sum(t.name.startswith("stt") for t in threading.enumerate())
+
+def run(app, path: str, audio: bytes, clients: int, uploads: int) -> dict:
+    samples, rejected, errors = [], [0], []
+    lock = threading.Lock()
+
+    def client(t: int):
+        c = app.test_client()
+        with c.session_transaction() as s:
+            s["user"] = {"email": f"stt{t}@example.com", "display_name": f"stt{t}"}
+        mine = []
+        for _ in range(t, uploads, clients):
+            start = time.perf_counter()
+            while True:
+                r = c.post(path, data={"audio": (io.BytesIO(audio), "question.wav", "audio/wav")},
+                           content_type="multipart/form-data")
+                if r.status_code != 503:
+                    break
+                with lock:
+                    rejected[0] += 1
+                time.sleep(float(r.headers.get("Retry-After", "1")) / 10)
+            j = r.get_json()
+            while j.get("ok") and j.get("status") in ("queued", "running"):
+                time.sleep(0.02)
+                j = c.get(j["status_url"]).get_json()
+            mine.append((time.perf_counter() - start) * 1000)
+            if not j.get("ok") or "stub transcription" not in (j.get("text") or ""):
+                errors.append(j)
+        with lock:
+            samples.extend(mine)
+
+    peak = [0]
+    done = threading.Event()
+
+    def watch():
+        while not done.is_set():
+            peak[0] = max(peak[0], _stt_threads())
+            time.sleep(0.005)
+
+    watcher = threading.Thread(target=watch, daemon=True)
+    watcher.start()
+    start = time.perf_counter()
+    ths = [threading.Thread(target=client, args=(t,)) for t in range(clients)]
+    for th in ths: th.start()
+    for th in ths: th.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    watcher.join()
+    return {**summarize(samples), "rps": round(len(samples) / elapsed, 1), "rejected_503": rejected[0],
+            "errors": len(errors), "peak_stt_threads": peak[0]}
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--clients", type=int, default=16)
+    ap.add_argument("--uploads", type=int, default=200)
+    ap.add_argument("--kb", type=int, default=640, help="tamaño de cada audio (>500 KB: Werkzeug lo pasa a disco)")
+    ap.add_argument("--workers", type=int, default=4, help="STT_WORKERS")
+    ap.add_argument("--queue", type=int, default=8, help="STT_MAX_QUEUE")
+    ap.add_argument("--delay", type=float, default=0.1, help="segundos de cada transcripción stub")
+    ap.add_argument("--out", type=Path, help="escribe los resultados en JSON")
+    args = ap.parse_args()
+    out_path = args.out.resolve() if args.out else None
+
+    os.environ.update({"STT_BACKEND": "stub", "STT_WORKERS": str(args.workers), "STT_MAX_QUEUE": str(args.queue),
+                       "STT_STUB_DELAY": str(args.delay), "INDEX_REFRESH_ENABLED": "false"})
+    workdir = tempfile.mkdtemp(prefix="bench_stt_")
+    os.chdir(workdir)
+    try:
+        import app as app_module  # después del chdir: la app usa rutas relativas
+        from backend.stt import get_stt
+        app = app_module.create_app()
+        audio = wav_bytes(args.kb)
+        fds = _open_fds()
+        results = {"clients": args.clients, "uploads": args.uploads, "kb": args.kb, "workers": args.workers,
+                   "queue": args.queue, "delay_s": args.delay}
+        results["jobs"] = run(app, "/api/stt/jobs", audio, args.clients, args.uploads)
+        results["sync"] = run(app, "/api/stt", audio, args.clients, args.uploads // 2)
+        time.sleep(0.1)
+        gc.collect()  # las respuestas del test client guardan su cuerpo de request (temporal para >500 KB)
+        results["pending_after"] = get_stt().stats()["pending"]
+        results["leaked_fds"] = _open_fds() - fds
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps(results, indent=2))
+    if out_path:
+        write_results(out_path, "stt", results, vars(args) | {"out": str(out_path)})
+    ok = (not results["jobs"]["errors"] and not results["sync"]["errors"] and results["pending_after"] == 0
+          and results["leaked_fds"] <= 0
+          and results["jobs"]["peak_stt_threads"] <= args.workers)
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
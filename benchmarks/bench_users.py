@@ -0,0 +1,132 @@
+"""
+Carga concurrente de logins y registros contra la app (Flask test client) en un directorio temporal.
+
+Cada hilo registra sus propios usuarios y hace logins (válidos e inválidos) mezclados.
+Al final verifica que data/users.json tenga todos los usuarios registrados (ninguna escritura perdida).
+Con --processes N además registra desde N procesos a la vez directamente sobre UserStore,
+que es donde el read-modify-write anterior perdía usuarios.
+
+    python benchmarks/bench_users.py
+    python benchmarks/bench_users.py --threads 8 --users 40 --logins 200 --processes 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+def _register_direct(args):
+    path, prefix, n = args
+    from werkzeug.security import generate_password_hash
+    from backend.user_store import UserStore
+    store = UserStore(Path(path))
+    pw = generate_password_hash("secret1")
+    return sum(store.create(f"{prefix}-{i}@example.com", {"display_name": prefix, "password_hash": pw}) for i in range(n))
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--threads", type=int, default=8)
+    ap.add_argument("--users", type=int, default=10, help="registros por hilo")
+    ap.add_argument("--logins", type=int, default=50, help="logins por hilo")
+    ap.add_argument("--processes", type=int, default=0, help="procesos registrando directo sobre UserStore")
+    ap.add_argument("--out", type=Path, help="escribe los resultados en JSON")
+    args = ap.parse_args()
+    if args.out:
+        args.out = args.out.resolve()
+
+    workdir = tempfile.mkdtemp(prefix="bench_users_")
+    os.chdir(workdir)
+    os.environ["INDEX_REFRESH_ENABLED"] = "false"
+    import app as app_module  # noqa: E402  (después del chdir: la app usa rutas relativas)
+    from backend.user_store import get_user_store  # noqa: E402
+    app = app_module.create_app()
+
+    timings = {"register": [], "login": []}
+    errors = []
+    timing_lock = threading.Lock()
+
+    def worker(t: int):
+        client = app.test_client()
+        mine = []
+        try:
+            for i in range(args.users):
+                email = f"t{t}-u{i}@example.com"
+                start = time.perf_counter()
+                r = client.post("/register", data={"email": email, "display_name": f"t{t}", "password": "secret1",
+                                                   "confirm": "secret1"})
+                with timing_lock:
+                    timings["register"].append(time.perf_counter() - start)
+                if r.status_code != 302:
+                    errors.append(f"register {email}: {r.status_code}")
+                mine.append(email)
+                client.get("/logout")
+            for i in range(args.logins):
+                email = mine[i % len(mine)] if mine else "nobody@example.com"
+                password = "secret1" if i % 5 else "wrong"
+                start = time.perf_counter()
+                r = client.post("/login", data={"email": email, "password": password})
+                with timing_lock:
+                    timings["login"].append(time.perf_counter() - start)
+                if (r.status_code == 302) != (password == "secret1"):
+                    errors.append(f"login {email}: {r.status_code}")
+                client.get("/logout")
+        except Exception as e:
+            errors.append(repr(e))
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(args.threads)]
+    for th in threads: th.start()
+    for th in threads: th.join()
+    elapsed = time.perf_counter() - start
+
+    expected = {f"t{t}-u{i}@example.com" for t in range(args.threads) for i in range(args.users)}
+    on_disk = set(json.loads(Path("data/users.json").read_text(encoding="utf-8")))
+    lost = sorted(expected - on_disk)
+
+    result = {
+        "threads": args.threads,
+        "registrations": len(timings["register"]),
+        "logins": len(timings["login"]),
+        "seconds": round(elapsed, 3),
+        "register_ms_p50": round(percentile(timings["register"], 50) * 1000, 2),
+        "register_ms_p95": round(percentile(timings["register"], 95) * 1000, 2),
+        "login_ms_p50": round(percentile(timings["login"], 50) * 1000, 2),
+        "login_ms_p95": round(percentile(timings["login"], 95) * 1000, 2),
+        "users_on_disk": len(get_user_store()),
+        "lost_writes": len(lost),
+        "errors": len(errors),
+    }
+
+    if args.processes:
+        n = max(1, args.users)
+        with multiprocessing.Pool(args.processes) as pool:
+            created = sum(pool.map(_register_direct, [(str(Path("data/users.json").resolve()), f"p{p}", n)
+                                                      for p in range(args.processes)]))
+        on_disk = set(json.loads(Path("data/users.json").read_text(encoding="utf-8")))
+        missing = [f"p{p}-{i}@example.com" for p in range(args.processes) for i in range(n)
+                   if f"p{p}-{i}@example.com" not in on_disk]
+        result.update(process_registrations=created, process_lost_writes=len(missing))
+        lost += missing
+
+    print(json.dumps(result, indent=2))
+    if errors:
+        print("Errores:", errors[:10], file=sys.stderr)
+    if args.out:
+        args.out.write_text(json.dumps(result, indent=2), encoding="utf-8")
+    sys.exit(1 if lost or errors else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Memoria de los workers de gunicorn (gunicorn.conf.py) con y sin precarga en el maestro. Solo Linux.
+
+Construye índices de --sections secciones para cada versión en un directorio temporal y levanta
+gunicorn dos veces con --workers workers:
+  per-worker  GUNICORN_PRELOAD=false: cada worker importa la app y carga sus propios índices
+  preload     el maestro carga todo antes del fork; los workers lo comparten copy-on-write
+Después de --requests consultas a /api/ask (una versión y "*"), lee /proc/<pid>/smaps_rollup:
+  RSS  residente, cuenta entera cada página aunque esté compartida (lo que muestran top/ps)
+  PSS  cada página compartida se reparte entre los procesos que la usan: la suma es la memoria real
+  USS  páginas privadas del proceso (lo que se libera al matarlo)
+
+    python benchmarks/bench_workers.py
+    python benchmarks/bench_workers.py --sections 20000 --workers 4 --out workers.json
+"""
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.corpus import QUERIES, ROOT, load_corpus, summarize, write_results  # noqa: E402
+
+ADMIN = ("bench@example.com", "bench-password")
+
+def build_indexes(sections: List[Dict[str, Any]]) -> List[str]:
+    from backend.qa_engine import QAIndex
+    from backend.scraper import all_versions
+    versions = all_versions()
+    for v in versions:
+        qi = QAIndex(v)
+        qi.fit([{**s, "url": f"{s['url']}#{v}"} for s in sections])
+        qi.save()
+    return versions
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def memory(pid: int) -> Dict[str, float]:
+    """RSS, PSS y USS en MB de un proceso."""
+    kb = {}
+    with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                kb[parts[0].rstrip(":")] = int(parts[1])
+    mb = lambda k: round(k / 1024, 1)
+    return {"rss_mb": mb(kb["Rss"]), "pss_mb": mb(kb["Pss"]),
+            "uss_mb": mb(kb["Private_Clean"] + kb["Private_Dirty"])}
+
+def children(pid: int) -> List[int]:
+    with open(f"/proc/{pid}/task/{pid}/children", "r") as f:
+        return [int(p) for p in f.read().split()]
+
+def _wait_for(cond, timeout: float, what: str):
+    deadline = time.time() + timeout
+    while not cond():
+        if time.time() > deadline:
+            raise TimeoutError(f"timed out waiting for {what}")
+        time.sleep(0.2)
+
+def run_mode(preload: bool, workers: int, threads: int, requests_total: int,
+             versions: List[str], workdir: str) -> Dict[str, Any]:
+    import requests
+    port = _free_port()
+    env = {**os.environ, "BIND": f"127.0.0.1:{port}", "WEB_CONCURRENCY": str(workers),
+           "GUNICORN_PRELOAD": str(preload).lower(), "INDEX_REFRESH_ENABLED": "false",
+           "DEFAULT_ADMIN_EMAIL": ADMIN[0], "DEFAULT_ADMIN_PASSWORD": ADMIN[1],
+           "PYTHONPATH": str(ROOT), "PYTHONUNBUFFERED": "1"}
+    proc = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", str(ROOT / "gunicorn.conf.py")],
+                            cwd=workdir, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    log: List[str] = []
+    reader = threading.Thread(target=lambda: log.extend(proc.stdout), daemon=True)
+    reader.start()
+    base = f"http://127.0.0.1:{port}"
+    t0 = time.perf_counter()
+    try:
+        # cada carga imprime "[app] preloaded ...": una en el maestro o una por worker
+        loads = 1 if preload else workers
+        _wait_for(lambda: sum("[app] preloaded" in line for line in log) >= loads or proc.poll() is not None,
+                  300, "index preload")
+        _wait_for(lambda: len(children(proc.pid)) >= workers or proc.poll() is not None, 60, "workers")
+        if proc.poll() is not None:
+            raise RuntimeError("gunicorn exited:\n" + "".join(log[-30:]))
+        boot_s = time.perf_counter() - t0
+        login = requests.post(f"{base}/login", data={"email": ADMIN[0], "password": ADMIN[1]},
+                              allow_redirects=False, timeout=30)
+        cookies = login.cookies
+        if "session" not in cookies:
+            raise RuntimeError(f"login failed: {login.status_code}")
+
+        samples, errors = [], []
+        lock = threading.Lock()
+
+        def client(t: int):
+            mine = []
+            for i in range(t, requests_total, threads):
+                version = "*" if i % 3 == 0 else versions[i % len(versions)]
+                # sin keep-alive: cada request abre conexión y se reparte entre los workers
+                start = time.perf_counter()
+                r = requests.post(f"{base}/api/ask", cookies=cookies, timeout=60,
+                                  json={"message": f"{QUERIES[i % len(QUERIES)]} {i}", "version": version},
+                                  headers={"Connection": "close"})
+                mine.append((time.perf_counter() - start) * 1000)
+                if r.status_code != 200:
+                    errors.append(r.status_code)
+            with lock:
+                samples.extend(mine)
+
+        ths = [threading.Thread(target=client, args=(t,)) for t in range(threads)]
+        for th in ths: th.start()
+        for th in ths: th.join()
+
+        master = memory(proc.pid)
+        per_worker = [memory(pid) for pid in children(proc.pid)]
+        avg = lambda k: round(sum(w[k] for w in per_worker) / max(1, len(per_worker)), 1)
+        return {
+            "mode": "preload" if preload else "per-worker",
+            "workers": len(per_worker),
+            "boot_s": round(boot_s, 2),
+            "ask": {**summarize(samples), "errors": len(errors)},
+            "master": master,
+            "worker_avg": {k: avg(k) for k in ("rss_mb", "pss_mb", "uss_mb")},
+            "total_pss_mb": round(master["pss_mb"] + sum(w["pss_mb"] for w in per_worker), 1),
+            "per_worker": per_worker,
+        }
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sections", type=int, default=10000, help="secciones por versión")
+    ap.add_argument("--source", choices=["auto", "cache", "synthetic"], default="auto")
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--threads", type=int, default=8, help="clientes concurrentes")
+    ap.add_argument("--requests", type=int, default=200, help="consultas a /api/ask por modo")
+    ap.add_argument("--out", type=Path, help="escribe los resultados en JSON")
+    args = ap.parse_args()
+    out_path = args.out.resolve() if args.out else None
+    if not Path("/proc/self/smaps_rollup").exists():
+        sys.exit("bench_workers needs Linux (/proc/<pid>/smaps_rollup)")
+
+    os.chdir(ROOT)
+    corpus = load_corpus(args.sections, source=args.source)
+    workdir = tempfile.mkdtemp(prefix="bench_workers_")
+    os.chdir(workdir)
+    try:
+        versions = build_indexes(corpus["sections"])
+        results = [run_mode(p, args.workers, args.threads, args.requests, versions, workdir)
+                   for p in (False, True)]
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{args.workers} workers, {len(versions)} versions x {len(corpus['sections'])} sections ({corpus['source']})")
+    print(f"{'mode':>10}  {'boot s':>6}  {'worker RSS':>10}  {'worker PSS':>10}  {'worker USS':>10}  "
+          f"{'total PSS':>9}  {'ask p50 ms':>10}")
+    for r in results:
+        w = r["worker_avg"]
+        print(f"{r['mode']:>10}  {r['boot_s']:>6}  {w['rss_mb']:>10}  {w['pss_mb']:>10}  {w['uss_mb']:>10}  "
+              f"{r['total_pss_mb']:>9}  {r['ask'].get('p50_ms', 0):>10}")
+    if out_path:
+        write_results(out_path, "workers", results, vars(args) | {"out": str(out_path)})
+    sys.exit(1 if any(r["ask"]["errors"] for r in results) else 0)
+
+if __name__ == "__main__":
+    main()
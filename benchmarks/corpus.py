@@ -0,0 +1,110 @@
+"""
+Utilidades comunes de los benchmarks: corpus (sintético o de data/cache, sin red),
+medición de tiempos y resultados en JSON comparables entre commits.
+"""
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+VOCAB_SIZE = 5000
+QUERIES = [
+    "known issues",
+    "upgrade the agent server",
+    "analytics categorization index",
+    "release notes for processing",
+    "lockbox customer managed keys",
+    "workspace upgrade service bus",
+]
+
+def synthetic_sections(n: int, seed: int = 0, words_per_section: int = 80) -> List[Dict[str, Any]]:
+    """Secciones con el mismo esquema que scraper.extract_sections."""
+    rng = random.Random(seed)
+    base = " ".join(QUERIES).split()
+    vocab = base + [f"term{i}" for i in range(VOCAB_SIZE)]
+    weights = [1.0 / (i + 1) for i in range(len(vocab))]  # distribución tipo Zipf
+    out = []
+    for i in range(n):
+        words = rng.choices(vocab, weights=weights, k=words_per_section)
+        out.append({
+            "title": f"Page {i // 20}",
+            "heading": f"Heading {i}",
+            "url": f"https://example.invalid/page{i // 20}.htm",
+            "content": " ".join(words) + ".",
+        })
+    return out
+
+def load_corpus(n: int, source: str = "auto", seed: int = 0) -> Dict[str, Any]:
+    """
+    n secciones: "cache" usa las páginas en data/cache (repetidas con variación si no alcanzan),
+    "synthetic" las genera, "auto" usa el cache si hay algo.
+    """
+    base: List[Dict[str, Any]] = []
+    if source in ("auto", "cache"):
+        base = cache_corpus()
+        if not base and source == "cache":
+            raise SystemExit("data/cache no tiene páginas de release notes; usa --source synthetic")
+    if not base:
+        return {"source": "synthetic", "sections": synthetic_sections(n, seed=seed)}
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        s = base[i % len(base)]
+        if i < len(base):
+            out.append(dict(s))
+        else:
+            # copias con una palabra distinta: mismo tamaño de texto, contenido no idéntico
+            out.append({**s, "heading": f'{s["heading"]} ({i // len(base)})',
+                        "content": f'{s["content"]} variant{rng.randint(0, 10 ** 6)}'})
+    return {"source": "cache", "sections": out}
+
+def cache_corpus() -> List[Dict[str, Any]]:
+    from backend.scraper import _cache_path, all_versions, get_version_urls, parse_sections
+    sections = []
+    for version in all_versions():
+        for url in get_version_urls(version):
+            p = _cache_path(url)
+            if p.exists():
+                sections.extend(parse_sections(p.read_text(encoding="utf-8", errors="ignore"), url))
+    return [s for s in sections if s.get("content")]
+
+def timed(fn: Callable[[], Any], repeat: int, warmup: int = 1) -> Dict[str, float]:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t) * 1000)
+    return summarize(samples)
+
+def summarize(samples_ms: List[float]) -> Dict[str, float]:
+    s = sorted(samples_ms)
+    if not s:
+        return {"n": 0}
+    pick = lambda q: s[min(len(s) - 1, int(q * len(s)))]
+    return {"n": len(s), "p50_ms": round(pick(0.5), 4), "p95_ms": round(pick(0.95), 4),
+            "p99_ms": round(pick(0.99), 4), "min_ms": round(s[0], 4), "mean_ms": round(sum(s) / len(s), 4)}
+
+def environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "machine": platform.machine(),
+            "cpus": os.cpu_count(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+
+def write_results(path: Path, name: str, results: Any, params: Dict[str, Any]):
+    payload = {"benchmark": name, "env": environment(), "params": params, "results": results}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
@@ -0,0 +1,164 @@
+"""
+Compara rankers (calidad y latencia) sobre un conjunto de preguntas etiquetadas, sin red.
+
+Cada ranker indexa el mismo corpus en un directorio temporal. Por ranker se reporta:
+  hit@1, hit@5 y MRR de la sección esperada; exactitud de "pedir contacto" con sus umbrales;
+  latencia de search (p50/p95); y umbrales calibrados sobre este conjunto (collect_below que
+  maximiza la exactitud balanceada, min_snippet = percentil 5 de los aciertos).
+
+Preguntas (--questions, JSONL), una por línea:
+    {"question": "how do I rotate lockbox keys", "url": "https://...", "heading": "Lockbox"}
+    {"question": "what is the cafeteria menu", "answerable": false}
+url y heading son opcionales (basta uno; heading es subcadena sin mayúsculas). Sin --questions
+se generan preguntas del propio corpus (palabras de una sección) y otras sin respuesta.
+
+    python benchmarks/eval_rankers.py
+    python benchmarks/eval_rankers.py --source cache --questions my_questions.jsonl --out eval.json
+"""
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.corpus import ROOT, load_corpus, summarize, write_results  # noqa: E402
+
+_WORD = re.compile(r"[a-z][a-z0-9]{2,}")
+
+def synthetic_questions(sections: List[Dict[str, Any]], n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Preguntas con 3 palabras de una sección más una palabra común; un 20% sin respuesta."""
+    rng = random.Random(seed)
+    docs = [set(_WORD.findall(s["content"].lower())) for s in sections]
+    df = Counter(w for d in docs for w in d)
+    common = [w for w, _ in df.most_common(50)]
+    out = []
+    for i in range(n):
+        if i % 5 == 4:
+            words = [f"qzx{rng.randint(0, 10 ** 6)}", f"vlorp{rng.randint(0, 10 ** 6)}", rng.choice(common)]
+            out.append({"question": " ".join(words), "answerable": False})
+            continue
+        j = rng.randrange(len(sections))
+        vocab = sorted(docs[j])
+        if len(vocab) < 3:
+            continue
+        words = rng.sample(vocab, 3) + [rng.choice(common)]
+        rng.shuffle(words)
+        out.append({"question": " ".join(words), "url": sections[j]["url"], "heading": sections[j]["heading"]})
+    return out
+
+def load_questions(path: Path) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def _answerable(q: Dict[str, Any]) -> bool:
+    return q.get("answerable", bool(q.get("url") or q.get("heading")))
+
+def _is_expected(sec: Dict[str, Any], q: Dict[str, Any]) -> bool:
+    if q.get("url") and sec.get("url") != q["url"]:
+        return False
+    if q.get("heading") and q["heading"].lower() not in (sec.get("heading") or "").lower():
+        return False
+    return True
+
+def calibrate(pos: List[float], neg: List[float], hits: List[float]) -> Dict[str, float]:
+    """collect_below que mejor separa preguntas con y sin respuesta; min_snippet por debajo de casi todos los aciertos."""
+    best_t, best_acc = 0.0, -1.0
+    for t in sorted(set(pos + neg)):
+        acc = (sum(p >= t for p in pos) / max(1, len(pos)) + sum(n < t for n in neg) / max(1, len(neg))) / 2
+        if acc > best_acc:
+            best_t, best_acc = t, acc
+    hits = sorted(hits)
+    p5 = hits[int(0.05 * (len(hits) - 1))] if hits else best_t
+    return {"collect_below": round(best_t, 4), "min_snippet": round(min(p5, best_t), 4),
+            "balanced_accuracy": round(best_acc, 4)}
+
+def evaluate(ranker: str, sections: List[Dict[str, Any]], questions: List[Dict[str, Any]], top_k: int) -> Dict[str, Any]:
+    from backend import incremental, qa_engine as q
+    from backend.rankers import get_ranker
+    incremental._counts_cache.clear()
+    rk = get_ranker(ranker)
+    qi = q.QAIndex(f"eval_{ranker}")
+    t = time.perf_counter()
+    qi.fit(sections, ranker=ranker)
+    fit_s = time.perf_counter() - t
+    qi.search(questions[0]["question"], top_k)  # calentamiento
+
+    latencies, ranks, pos, neg, hit_scores = [], [], [], [], []
+    contact_ok = 0
+    for item in questions:
+        t = time.perf_counter()
+        results = qi.search(item["question"], top_k)
+        latencies.append((time.perf_counter() - t) * 1000)
+        best = results[0][0] if results else 0.0
+        answerable = _answerable(item)
+        (pos if answerable else neg).append(best)
+        shown = [r for r in results if r[0] >= rk.min_snippet_score]
+        collect = not shown or best < rk.collect_contact_below
+        contact_ok += collect != answerable
+        if answerable:
+            rank = next((i + 1 for i, (_, sec) in enumerate(results) if _is_expected(sec, item)), None)
+            ranks.append(rank)
+            if rank is not None:
+                hit_scores.append(results[rank - 1][0])
+    n = max(1, len(ranks))
+    return {
+        "ranker": ranker,
+        "thresholds": {"min_snippet": rk.min_snippet_score, "collect_below": rk.collect_contact_below},
+        "fit_s": round(fit_s, 3),
+        "postings_nnz": int(qi.postings.nnz),
+        "hit@1": round(sum(r == 1 for r in ranks) / n, 4),
+        f"hit@{top_k}": round(sum(r is not None for r in ranks) / n, 4),
+        "mrr": round(sum(1.0 / r for r in ranks if r) / n, 4),
+        "contact_accuracy": round(contact_ok / max(1, len(questions)), 4),
+        "search": summarize(latencies),
+        "calibrated": calibrate(pos, neg, hit_scores),
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rankers", nargs="+", default=["tfidf", "bm25"])
+    ap.add_argument("--sections", type=int, default=3000)
+    ap.add_argument("--source", choices=["auto", "cache", "synthetic"], default="auto")
+    ap.add_argument("--questions", type=Path, help="JSONL etiquetado; por defecto se generan del corpus")
+    ap.add_argument("--n-questions", type=int, default=300)
+    ap.add_argument("--top-k", type=int, default=5)
+    ap.add_argument("--out", type=Path, help="escribe los resultados en JSON")
+    args = ap.parse_args()
+    out_path = args.out.resolve() if args.out else None
+    questions_path = args.questions.resolve() if args.questions else None
+
+    os.chdir(ROOT)
+    corpus = load_corpus(args.sections, source=args.source)
+    sections = corpus["sections"]
+    questions = load_questions(questions_path) if questions_path else synthetic_questions(sections, args.n_questions)
+    workdir = tempfile.mkdtemp(prefix="eval_rankers_")
+    os.chdir(workdir)
+    try:
+        results = [evaluate(r, sections, questions, args.top_k) for r in args.rankers]
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{len(sections)} sections ({corpus['source']}), {len(questions)} questions "
+          f"({sum(map(_answerable, questions))} answerable)")
+    for r in results:
+        print(f"{r['ranker']:>6}  hit@1 {r['hit@1']:.3f}  hit@{args.top_k} {r[f'hit@{args.top_k}']:.3f}  "
+              f"mrr {r['mrr']:.3f}  contact acc {r['contact_accuracy']:.3f}  "
+              f"p50 {r['search']['p50_ms']:.3f} ms  p95 {r['search']['p95_ms']:.3f} ms  "
+              f"calibrated {r['calibrated']}")
+    if out_path:
+        write_results(out_path, "rankers", results,
+                      {**{k: v for k, v in vars(args).items() if k not in ("out", "questions")},
+                       "questions": str(questions_path) if questions_path else "synthetic"})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Corre la suite completa (motor, HTTP, parseo, búsqueda, rankers) y guarda un JSON por commit en
+benchmarks/results/<commit>.json. Con --compare muestra la razón nuevo/viejo de cada métrica
+de tiempo y marca las que empeoraron más que --threshold.
+
+    python benchmarks/run_all.py
+    python benchmarks/run_all.py --quick
+    python benchmarks/run_all.py --compare benchmarks/results/abc1234.json
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.corpus import ROOT, environment  # noqa: E402
+
+HERE = Path(__file__).resolve().parent
+RESULTS_DIR = HERE / "results"
+
+def _suite(quick: bool):
+    sizes = ["1000"] if quick else ["1000", "10000"]
+    return {
+        "engine": ["bench_engine.py", "--sizes", *sizes, "--repeat", "10" if quick else "30"],
+        "http": ["bench_http.py", "--sections", "2000" if quick else "10000", "--requests", "25" if quick else "100"],
+        "parse": ["bench_parse.py"],
+        "search": ["bench_search.py", "--sizes", *sizes, "--repeat", "5" if quick else "20"],
+        "rankers": ["eval_rankers.py", "--sections", "1000" if quick else "5000"],
+    }
+
+def _flatten(obj, prefix=""):
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            yield from _flatten(v, f"{prefix}.{k}" if prefix else str(k))
+    elif isinstance(obj, list):
+        for i, v in enumerate(obj):
+            key = v.get("sections", i) if isinstance(v, dict) else i
+            yield from _flatten(v, f"{prefix}[{key}]")
+    elif isinstance(obj, (int, float)) and not isinstance(obj, bool):
+        yield prefix, float(obj)
+
+def _is_time(key: str) -> bool:
+    leaf = key.rsplit(".", 1)[-1]
+    return leaf.endswith(("_ms", "_s", "_seconds")) and "min_ms" not in leaf
+
+def compare(new: dict, old: dict, threshold: float) -> int:
+    worse = 0
+    for bench, payload in new["suites"].items():
+        before = dict(_flatten(old.get("suites", {}).get(bench, {})))
+        for key, value in _flatten(payload):
+            if not _is_time(key) or key not in before or before[key] <= 0:
+                continue
+            ratio = value / before[key]
+            flag = "  <-- regression" if ratio > 1 + threshold else ""
+            worse += bool(flag)
+            print(f"{bench}.{key}: {before[key]:.4g} -> {value:.4g} (x{ratio:.2f}){flag}")
+    return worse
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--quick", action="store_true", help="tamaños chicos, para CI o un chequeo rápido")
+    ap.add_argument("--only", nargs="+", help="subconjunto: engine http parse search rankers")
+    ap.add_argument("--out", type=Path, help="por defecto benchmarks/results/<commit>.json")
+    ap.add_argument("--compare", type=Path, help="JSON de una corrida anterior")
+    ap.add_argument("--threshold", type=float, default=0.2, help="empeoramiento tolerado (0.2 = 20%%)")
+    args = ap.parse_args()
+
+    env = environment()
+    suites = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, cmd in _suite(args.quick).items():
+            if args.only and name not in args.only:
+                continue
+            out = Path(tmp) / f"{name}.json"
+            print(f"[bench] {name} ...", flush=True)
+            r = subprocess.run([sys.executable, str(HERE / cmd[0]), *cmd[1:], "--out", str(out)], cwd=ROOT,
+                               stdout=subprocess.DEVNULL)
+            if not out.exists():
+                print(f"[bench] {name} failed (exit {r.returncode})")
+                continue
+            data = json.loads(out.read_text(encoding="utf-8"))
+            suites[name] = data.get("results", data) if isinstance(data, dict) else data
+            if r.returncode:
+                suites[name] = {"results": suites[name], "exit_code": r.returncode}
+
+    result = {"env": env, "quick": args.quick, "suites": suites}
+    out_path = args.out or RESULTS_DIR / f"{env['commit'] or 'local'}.json"
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_text(json.dumps(result, indent=2), encoding="utf-8")
+    print(f"[bench] results: {out_path}")
+
+    if args.compare:
+        old = json.loads(args.compare.read_text(encoding="utf-8"))
+        sys.exit(1 if compare(result, old, args.threshold) else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+Servidor de producción (Linux/macOS):  gunicorn -c gunicorn.conf.py
+
+Con preload_app el maestro importa la app y carga todos los índices una sola vez
+(create_app(preload=True)); los workers se forkean después y comparten esas páginas
+copy-on-write en lugar de cargar cada uno su copia. Los hilos de la app (refresco de índices)
+no sobreviven a un fork: se arrancan en cada worker ya inicializado (post_worker_init).
+
+Medición de memoria por worker con y sin preload: python benchmarks/bench_workers.py
+"""
+import os
+
+wsgi_app = "app:create_app(preload=True, start_background=False)"
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '5055')}")
+
+# GUNICORN_PRELOAD=false: cada worker importa la app y carga sus índices (para comparar)
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+# hilos: /api/ask/stream (SSE) ocupa un hilo mientras dura la respuesta
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+# el export PDF sincrónico (legacy) espera hasta EXPORT_WAIT_SECONDS
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+# reciclar workers cada N requests (0 = nunca); con preload el nuevo worker nace con los índices
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+
+def post_worker_init(worker):
+    import app
+    app.start_background_tasks()
@@ -148,29 +148,33 @@ function addMessage(role, text, citations=[]) {
   bubble.querySelector(".text").innerHTML = text.replace(/\n/g, "<br/>");
 
   // Citations
-  if (role === "bot" && citations && citations.length) {
-    const ctn = bubble.querySelector(".citations");
-    ctn.innerHTML = "";
-    citations.forEach(c => {
-      const a = document.createElement("a");
-      a.href = c.url; a.target = "_blank"; a.rel = "noopener";
-      a.textContent = "Source";
-      ctn.appendChild(a);
-    });
-  }
+  if (role === "bot") renderCitations(bubble, citations);
 
-  // ✅ Bocina TTS en cada mensaje del bot
+  // ✅ Bocina TTS en cada mensaje del bot (lee el texto actual: con streaming se completa después)
   if (role === "bot") {
     const btn = document.createElement("button");
     btn.className = "speak-btn";
     btn.title = "Read aloud";
     btn.innerHTML = `<img src="/static/img/speaker.svg" alt="Read aloud">`;
-    btn.addEventListener("click", () => speakText(stripTags(text)));
+    btn.addEventListener("click", () => speakText(stripTags(bubble.querySelector(".text").innerHTML)));
     bubble.appendChild(btn);
   }
 
   chatWindow.appendChild(node);
   chatWindow.scrollTop = chatWindow.scrollHeight;
+  return bubble;
+}
+
+function renderCitations(bubble, citations) {
+  if (!citations || !citations.length) return;
+  const ctn = bubble.querySelector(".citations");
+  ctn.innerHTML = "";
+  citations.forEach(c => {
+    const a = document.createElement("a");
+    a.href = c.url; a.target = "_blank"; a.rel = "noopener";
+    a.textContent = (c.versions && c.versions.length) ? `Source (${c.versions.join(", ")})` : "Source";
+    ctn.appendChild(a);
+  });
 }
 
 function startTyping() {
@@ -195,27 +199,77 @@ async function sendMessage() {
   startTyping();
 
   try {
-    const res = await fetch("/api/ask", {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ message: text, version: CURRENT_VERSION, mode: CURRENT_MODE })
-    });
-    const data = await res.json();
-    stopTyping();
-    if (data.error) { addMessage("bot", "Sorry, something went wrong. Please try again."); return; }
-    LAST_ANSWER = data.answer || "";
-    addMessage("bot", sanitize(data.answer || ""), data.citations || []);
-    CONVERSATION.push({ role:"assistant", content:data.answer || "", citations:data.citations || [], confidence:data.confidence });
-    if (data.should_collect_contact) {
-      addMessage("bot", `If you'd like deeper help, share your contact info (name, email, organization). We'll follow up.`, []);
-    }
-    fetchHistory();
+    const data = await askStream(text);
+    finishAnswer(data);
   } catch (e) {
     stopTyping();
     addMessage("bot", "Network error. Please try again.");
   }
 }
 
+function finishAnswer(data) {
+  if (data.error) { addMessage("bot", "Sorry, something went wrong. Please try again."); return; }
+  LAST_ANSWER = data.answer || "";
+  CONVERSATION.push({ role:"assistant", content:data.answer || "", citations:data.citations || [], confidence:data.confidence });
+  if (data.should_collect_contact) {
+    addMessage("bot", `If you'd like deeper help, share your contact info (name, email, organization). We'll follow up.`, []);
+  }
+  fetchHistory();
+}
+
+// Respuesta por Server-Sent Events: el mensaje aparece con las citas y crece con cada fragmento.
+// Si el navegador no expone el body como stream, se usa /api/ask.
+async function askStream(text) {
+  const body = JSON.stringify({ message: text, version: CURRENT_VERSION, mode: CURRENT_MODE });
+  const res = await fetch("/api/ask/stream", {
+    method: "POST",
+    headers: { "Content-Type": "application/json", "Accept": "text/event-stream" },
+    body
+  });
+  if (!res.ok || !res.body || !(res.headers.get("Content-Type") || "").includes("text/event-stream")) {
+    const r = await fetch("/api/ask", { method: "POST", headers: { "Content-Type": "application/json" }, body });
+    const data = await r.json();
+    stopTyping();
+    if (!data.error) addMessage("bot", sanitize(data.answer || ""), data.citations || []);
+    return data;
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buf = "", bubble = null, answer = "", done = null;
+  const ensureBubble = (citations) => {
+    if (!bubble) { stopTyping(); bubble = addMessage("bot", "", citations || []); }
+    return bubble;
+  };
+  while (!done) {
+    const { value, done: eof } = await reader.read();
+    if (eof) break;
+    buf += decoder.decode(value, { stream: true });
+    let sep;
+    while ((sep = buf.indexOf("\n\n")) >= 0) {
+      const frame = buf.slice(0, sep); buf = buf.slice(sep + 2);
+      let event = "message", payload = "";
+      frame.split("\n").forEach(line => {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) payload += line.slice(5).trim();
+      });
+      const data = payload ? JSON.parse(payload) : {};
+      if (event === "meta") {
+        ensureBubble(data.citations);
+      } else if (event === "chunk") {
+        answer += data.text || "";
+        ensureBubble().querySelector(".text").innerHTML = sanitize(answer).replace(/\n/g, "<br/>");
+        chatWindow.scrollTop = chatWindow.scrollHeight;
+      } else if (event === "done") {
+        done = data;
+      }
+    }
+  }
+  if (!done) throw new Error("stream ended early");
+  renderCitations(ensureBubble(), done.citations || []);
+  return done;
+}
+
 function sanitize(s){
   return s.replaceAll("<","&lt;").replaceAll(">","&gt;").replaceAll("&lt;br/&gt;","<br/>");
 }
@@ -248,10 +302,24 @@ async function preloadSections() {
     ALL_SECTIONS = j.sections || [];
   } catch { ALL_SECTIONS = []; }
 }
-function renderSuggestions(filterText) {
+// El filtro corre en el servidor (índice de prefijos); solo la última consulta pinta resultados
+let SUGGEST_CTRL = null;
+async function renderSuggestions(filterText) {
   const q = (filterText || "").toLowerCase();
-  const list = q ? ALL_SECTIONS.filter(s => (s.heading || "").toLowerCase().includes(q)) : ALL_SECTIONS.slice();
-  const limited = list.slice(0, 60);
+  if (SUGGEST_CTRL) SUGGEST_CTRL.abort();
+  if (!q) { showSuggestions(ALL_SECTIONS.slice(0, 60)); return; }
+  SUGGEST_CTRL = new AbortController();
+  try {
+    const r = await fetch(`/api/sections/suggest?version=${encodeURIComponent(CURRENT_VERSION)}&q=${encodeURIComponent(q)}&limit=60`,
+                          { signal: SUGGEST_CTRL.signal });
+    const j = await r.json();
+    showSuggestions(j.suggestions || []);
+  } catch (e) {
+    if (e.name === "AbortError") return;
+    showSuggestions(ALL_SECTIONS.filter(s => (s.heading || "").toLowerCase().includes(q)).slice(0, 60));
+  }
+}
+function showSuggestions(limited) {
   guidedSuggestions.innerHTML = limited.map(s => `
     <button class="sugg-item" role="option" data-h="${escapeAttr(s.heading)}" title="${escapeAttr(s.heading)}">
       <span class="sugg-dot"></span>${escapeHtml(s.heading)}
@@ -284,18 +352,22 @@ downloadConvoBtn && downloadConvoBtn.addEventListener("click", async () => {
   URL.revokeObjectURL(url);
 });
 downloadPDFBtn && downloadPDFBtn.addEventListener("click", async () => {
+  // el PDF se genera en segundo plano: se crea el job, se consulta su estado y se descarga
   try {
-    const r = await fetch("/api/save_conversation_pdf", {
+    const r = await fetch("/api/export_pdf", {
       method: "POST", headers: { "Content-Type": "application/json" },
       body: JSON.stringify({ conversation: CONVERSATION, version: CURRENT_VERSION })
     });
-    if (!r.ok) { addMessage("bot", "Could not generate PDF."); return; }
-    const blob = await r.blob();
-    const url = URL.createObjectURL(blob);
+    let job = await r.json();
+    if (!r.ok || job.error) { addMessage("bot", "Could not generate PDF."); return; }
+    while (job.status === "running") {
+      await new Promise(res => setTimeout(res, 500));
+      job = await (await fetch(`/api/export_pdf/${job.job_id}`)).json();
+    }
+    if (job.status !== "done") { addMessage("bot", "Could not generate PDF."); return; }
     const a = document.createElement("a");
-    a.href = url; a.download = `conversation_${CURRENT_VERSION}.pdf`;
+    a.href = job.download_url;
     document.body.appendChild(a); a.click(); a.remove();
-    URL.revokeObjectURL(url);
   } catch { addMessage("bot", "PDF export failed."); }
 });
 
@@ -320,7 +392,7 @@ async function fetchHistory(fromButton=false) {
   if (!historyList) return;
   historyList.innerHTML = fromButton ? `<div class="tiny">Refreshing…</div>` : `<div class="tiny">Loading…</div>`;
   try {
-    const r = await fetch(`/api/history?version=${encodeURIComponent(CURRENT_VERSION)}`);
+    const r = await fetch(`/api/history?version=${encodeURIComponent(CURRENT_VERSION)}&limit=60`);
     const j = await r.json();
     const items = j.items || [];
     if (!items.length) {
@@ -355,6 +427,7 @@ refreshHistoryBtn && refreshHistoryBtn.addEventListener("click", (e) => {
 // ===== Voice (record) =====
 let recognition, isListening = false;
 let mediaStream = null, mediaRecorder = null, audioChunks = [];
+const MAX_RECORDING_MS = 120000;
 const isSecure = () => window.isSecureContext || ["localhost","127.0.0.1"].includes(location.hostname);
 
 // Web Speech Recognition (si está disponible)
@@ -417,8 +490,13 @@ if ("webkitSpeechRecognition" in window || "SpeechRecognition" in window) {
       fd.append("audio", blob, `question.${ext}`);
       voiceStatusInline.textContent = "Transcribing...";
       try {
-        const r = await fetch("/api/stt", { method: "POST", body: fd });
-        const j = await r.json();
+        // la transcripción corre en segundo plano: se crea el job y se consulta su estado
+        const r = await fetch("/api/stt/jobs", { method: "POST", body: fd });
+        let j = await r.json();
+        while (j.ok && (j.status === "queued" || j.status === "running")) {
+          await new Promise(res => setTimeout(res, 500));
+          j = await (await fetch(j.status_url)).json();
+        }
         if (j.ok) {
           msgInput.value = j.text || "";
           voiceStatusInline.textContent = "Recognized. Sending…";
@@ -435,6 +513,9 @@ if ("webkitSpeechRecognition" in window || "SpeechRecognition" in window) {
       }
     };
     mediaRecorder.start();
+    // mismo tope que STT_MAX_SECONDS en el servidor
+    const rec = mediaRecorder;
+    setTimeout(() => { if (rec.state === "recording") rec.stop(); }, MAX_RECORDING_MS);
     micBtn.classList.add("on");
     voiceStatusInline.textContent = "Recording… click again to stop";
   });
@@ -0,0 +1,41 @@
+import pytest
+
+from backend import content_store, qa_engine
+from backend.qa_engine import AnswerCache, IndexRegistry, QAIndex
+
+SECTIONS = [
+    {"url": "https://docs.example.com/lockbox", "title": "Lockbox", "heading": "Lockbox",
+     "content": "Lockbox keys rotate every ninety days. Administrators can rotate lockbox keys from the security console."},
+    {"url": "https://docs.example.com/export", "title": "Export", "heading": "Export",
+     "content": "Export jobs write load files and natives to the staging area once processing completes."},
+]
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    # índice y almacén de contenido en un directorio temporal (las rutas de la app son relativas)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(content_store, "_store", None)
+    monkeypatch.setattr(qa_engine, "REGISTRY", IndexRegistry())
+    cache = AnswerCache()
+    monkeypatch.setattr(qa_engine, "ANSWER_CACHE", cache)
+    qi = QAIndex("v1")
+    qi.fit(SECTIONS)
+    qi.save()
+    return cache
+
+def test_answer_question_counts_cache_misses_and_hits(cache):
+    first = qa_engine.answer_question("how do I rotate lockbox keys", "v1")
+    assert not first.get("warming_up")
+    assert first["citations"][0]["url"] == "https://docs.example.com/lockbox"
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    assert qa_engine.answer_question("How do I rotate  lockbox keys?", "v1") == first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_batch_and_stream_share_the_cache(cache):
+    results = qa_engine.answer_questions(["rotate lockbox keys", "export load files"], "v1")
+    assert (cache.hits, cache.misses) == (0, 2)
+
+    events = list(qa_engine.answer_stream("export load files", "v1"))
+    assert events[-1] == ("done", results[1])
+    assert (cache.hits, cache.misses) == (1, 2)
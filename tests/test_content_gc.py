@@ -0,0 +1,46 @@
+from backend.content_store import ContentStore
+from backend.incremental import HashingTfidf
+from backend.index_store import SectionStore, generation_refs, write_index
+
+def _write(version_dir, store, texts):
+    sections = [{"url": f"https://docs.example.com/{i}", "title": f"t{i}", "content": t} for i, t in enumerate(texts)]
+    vec = HashingTfidf()
+    counts = vec.counts(texts)
+    vec.add_docs(counts)
+    pointer = write_index(version_dir, version="v1", sections=sections, postings=vec.weight(counts),
+                          vectorizer=vec, counts=counts, page_hashes={}, content=store)
+    return version_dir / pointer.read_text(encoding="utf-8").strip()
+
+def _gc(store, version_dir):
+    cids, gens = generation_refs(version_dir)
+    return store.gc(cids, min_garbage=0.1, pinned=None if None in gens else gens)
+
+def test_gc_keeps_content_of_kept_generations(tmp_path):
+    store = ContentStore(root=tmp_path / "_content")
+    vdir = tmp_path / "index" / "v1"
+    old = ["alpha section text " * 20, "beta section text " * 20]
+    first = _write(vdir, store, old)
+    _write(vdir, store, ["gamma section text " * 20])
+
+    # la generación anterior sigue en disco (KEEP_GENERATIONS): su contenido no es basura
+    assert not _gc(store, vdir)
+    assert [s["content"] for s in SectionStore(first, ContentStore(root=store.root))] == old
+
+def test_gc_defers_deleting_referenced_content_generation(tmp_path):
+    store = ContentStore(root=tmp_path / "_content")
+    vdir = tmp_path / "index" / "v1"
+    _write(vdir, store, ["alpha section text " * 20, "beta section text " * 20])
+    _write(vdir, store, ["gamma section text " * 20])
+    kept = _write(vdir, store, ["gamma section text " * 20])  # la primera generación ya se podó
+    content_gen = store.generation()
+
+    assert _gc(store, vdir)
+    assert store.generation() != content_gen
+    # las generaciones de índice conservadas todavía nombran la generación vieja del almacén
+    assert (store.root / content_gen).is_dir()
+    assert SectionStore(kept, ContentStore(root=store.root))[0]["content"].startswith("gamma")
+
+    _write(vdir, store, ["delta section text " * 20])
+    _write(vdir, store, ["delta section text " * 20])
+    _gc(store, vdir)
+    assert not (store.root / content_gen).exists()
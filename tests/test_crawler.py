@@ -0,0 +1,89 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from backend import crawler as crawler_module, scraper
+from backend.crawler import Crawler
+
+class StandIn(BaseHTTPRequestHandler):
+    """Servidor de documentación local: /page/* con ETag, /flaky/<n> falla n veces, /down siempre 500."""
+    def do_GET(self):
+        srv = self.server
+        with srv.lock:
+            srv.log.append((time.monotonic(), self.path, self.headers.get("If-None-Match")))
+            hits = srv.hits[self.path] = srv.hits.get(self.path, 0) + 1
+        if self.path.startswith("/flaky/"):
+            if hits <= int(self.path.rsplit("/", 1)[1]):
+                # alterna 429 (con Retry-After) y 503
+                return self._send(429 if hits % 2 else 503, b"busy", {"Retry-After": "0"})
+            return self._send(200, b"<h1>ok</h1>")
+        if self.path == "/down":
+            return self._send(500, b"boom")
+        etag = '"v1"'
+        if self.headers.get("If-None-Match") == etag:
+            return self._send(304, b"", {"ETag": etag})
+        self._send(200, f"<h1>{self.path}</h1><p>release notes</p>".encode(), {"ETag": etag})
+
+    def _send(self, status, body, headers=None):
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    srv.lock, srv.log, srv.hits = threading.Lock(), [], {}
+    th = threading.Thread(target=srv.serve_forever, daemon=True)
+    th.start()
+    srv.base = f"http://127.0.0.1:{srv.server_address[1]}"
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+def test_requests_to_one_host_are_spaced(server):
+    c = Crawler(max_workers=4, per_host_interval=0.15, retries=0)
+    urls = [f"{server.base}/page/{i}" for i in range(5)]
+    pages = c.map(lambda u: c.get(u).text, urls)
+    assert [p for p in pages if isinstance(p, Exception)] == []
+    times = sorted(t for t, _, _ in server.log)
+    gaps = [b - a for a, b in zip(times, times[1:])]
+    assert min(gaps) >= 0.13  # margen para el reloj del servidor
+    assert c.timing_summary()["errors"] == 0
+
+def test_retries_with_backoff_on_429_and_5xx(server):
+    c = Crawler(per_host_interval=0, retries=3, backoff=0.05)
+    start = time.monotonic()
+    r = c.get(f"{server.base}/flaky/2")
+    assert r.status_code == 200
+    assert c.stats[f"{server.base}/flaky/2"]["attempts"] == 3
+    assert time.monotonic() - start >= 0.05 + 0.1  # backoff 0.05, 0.1
+
+    with pytest.raises(requests.HTTPError):
+        c.get(f"{server.base}/down")
+    assert server.hits["/down"] == 4  # intento original + 3 reintentos
+    assert c.stats[f"{server.base}/down"]["status"] == 500
+
+def test_etag_revalidation_reuses_cached_body(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(scraper, "CACHE_DIR", tmp_path)
+    crawler_module.set_crawler(Crawler(per_host_interval=0, retries=0))
+    try:
+        url = f"{server.base}/page/notes"
+        first = scraper.fetch_page(url)
+        assert first["status"] == "fetched" and "release notes" in first["html"]
+
+        again = scraper.fetch_page(url, revalidate=True)
+        assert again["status"] == "not_modified"
+        assert again["html"] == first["html"] and not again["changed"]
+        assert [etag for _, path, etag in server.log if path == "/page/notes"] == [None, '"v1"']
+    finally:
+        crawler_module.set_crawler(None)
@@ -0,0 +1,41 @@
+from backend import scraper
+
+def _fake_fetch(calls):
+    def fetch_page(url, revalidate=False, crawler=None, use_cache=True):
+        calls.append((url, revalidate))
+        return {"url": url, "html": "<p>x</p>", "hash": "h", "changed": False, "status": "fetched"}
+    return fetch_page
+
+def test_forced_fetch_skips_memo_outside_a_cycle(monkeypatch):
+    calls = []
+    monkeypatch.setattr(scraper, "fetch_page", _fake_fetch(calls))
+    monkeypatch.setattr(scraper, "_fetch_memo", scraper.OrderedDict())
+    scraper.fetch_page_shared("https://docs.example.com/a")
+    assert scraper.fetch_page_shared("https://docs.example.com/a")["status"] == "shared"
+
+    scraper.fetch_page_shared("https://docs.example.com/a", revalidate=True)
+    scraper.fetch_page_shared("https://docs.example.com/a", revalidate=True)
+    assert calls == [("https://docs.example.com/a", False)] + [("https://docs.example.com/a", True)] * 2
+
+def test_forced_fetch_is_shared_within_one_cycle(monkeypatch):
+    calls = []
+    monkeypatch.setattr(scraper, "fetch_page", _fake_fetch(calls))
+    monkeypatch.setattr(scraper, "_fetch_memo", scraper.OrderedDict())
+    for _ in range(2):
+        with scraper.fetch_cycle():
+            scraper.fetch_page_shared("https://docs.example.com/a", revalidate=True)
+            assert scraper.fetch_page_shared("https://docs.example.com/a", revalidate=True)["status"] == "shared"
+    assert len(calls) == 2  # una revalidación por ciclo
+
+def test_memo_evicts_expired_and_caps_size(monkeypatch):
+    calls = []
+    monkeypatch.setattr(scraper, "fetch_page", _fake_fetch(calls))
+    monkeypatch.setattr(scraper, "_fetch_memo", scraper.OrderedDict())
+    monkeypatch.setattr(scraper, "FETCH_MEMO_MAX", 3)
+    for i in range(5):
+        scraper.fetch_page_shared(f"https://docs.example.com/{i}")
+    assert list(scraper._fetch_memo) == [f"https://docs.example.com/{i}" for i in (2, 3, 4)]
+
+    monkeypatch.setattr(scraper, "FETCH_MEMO_SECONDS", 0)
+    scraper.fetch_page_shared("https://docs.example.com/new")
+    assert not scraper._fetch_memo
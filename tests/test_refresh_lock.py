@@ -0,0 +1,40 @@
+import time
+
+import pytest
+
+from backend import refresh
+from backend.refresh import IndexRefresher
+
+@pytest.fixture
+def lock_file(tmp_path, monkeypatch):
+    path = tmp_path / ".refresh.lock"
+    monkeypatch.setattr(refresh, "LOCK_FILE", path)
+    return path
+
+def test_idle_owner_keeps_the_lock_past_stale_after(lock_file):
+    owner = IndexRefresher([], interval=3600, refresh_on_start=False, lock_stale_after=0.3)
+    owner.start()
+    try:
+        deadline = time.time() + 5
+        while not owner._owns_lock and time.time() < deadline:
+            time.sleep(0.01)
+        assert owner._owns_lock
+        time.sleep(1.0)  # más de tres veces lock_stale_after sin ningún ciclo de refresco
+
+        second = IndexRefresher([], refresh_on_start=False, lock_stale_after=0.3)
+        assert not second._acquire_lock()
+        assert time.time() - lock_file.stat().st_mtime < 0.3
+    finally:
+        owner.stop()
+        owner.join(timeout=5)
+    assert not lock_file.exists()
+
+def test_release_keeps_a_lock_taken_over_by_another_process(lock_file):
+    owner = IndexRefresher([], refresh_on_start=False)
+    assert owner._acquire_lock()
+    lock_file.write_text("999999999", encoding="utf-8")  # otro proceso lo tomó al verlo vencido
+
+    owner._touch_lock()
+    assert not owner._owns_lock
+    owner._release_lock()
+    assert lock_file.read_text(encoding="utf-8") == "999999999"
@@ -0,0 +1,42 @@
+from backend.sheets_logger import ContactLogger, _append_csv
+
+class FakeSheet:
+    """gspread-shaped client whose append_rows fails on the calls listed in `fail_on` (1-based)."""
+    def __init__(self, fail_on=()):
+        self.sheet1 = self
+        self.rows = []
+        self.calls = 0
+        self.fail_on = set(fail_on)
+
+    def open(self, _title):
+        return self
+
+    def row_values(self, _i):
+        return ["timestamp"]
+
+    def append_rows(self, rows, value_input_option=None):
+        self.calls += 1
+        if self.calls in self.fail_on:
+            raise RuntimeError("sheet unavailable")
+        self.rows.extend(rows)
+
+def _spooled_rows(n):
+    return [["2024-01-01T00:00:00Z", f"name{i}", f"user{i}@example.com", "org",
+             f"question {i}\nsecond line", "RelativityOne", "guided"] for i in range(n)]
+
+def test_replay_failure_does_not_resend_sent_batches(tmp_path):
+    sheet = FakeSheet(fail_on={2})
+    logger = ContactLogger(client_factory=lambda: sheet, batch_size=2, retry_seconds=0,
+                           spool_path=str(tmp_path / "contacts.csv"), start=False)
+    rows = _spooled_rows(5)
+    _append_csv(rows, logger.spool_path)
+
+    logger._replay()  # first batch goes out, the second fails
+    assert sheet.rows == rows[:2]
+
+    logger._replay()
+    assert sheet.rows == rows  # every row exactly once, in order
+    assert logger.stats["replayed"] == 5
+
+    logger._replay()  # nothing left after the saved offset
+    assert sheet.rows == rows